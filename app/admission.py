@@ -0,0 +1,136 @@
+"""
+Admission control for expensive API endpoints
+
+Each endpoint gets a concurrency limit and a bounded wait queue. Requests
+that cannot be admitted before the queue timeout (or that find the queue
+full) are shed so the server can answer 503 with Retry-After instead of
+piling up full-table scans.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .config import Config
+from . import metrics
+
+
+ADMITTED = metrics.counter(
+    'creel_admission_admitted_total', 'Requests admitted by admission control', ['endpoint'])
+REJECTED = metrics.counter(
+    'creel_admission_rejected_total', 'Requests shed by admission control', ['endpoint', 'reason'])
+QUEUED = metrics.counter(
+    'creel_admission_queued_total', 'Requests that had to wait for a slot', ['endpoint'])
+QUEUE_WAIT = metrics.histogram(
+    'creel_admission_queue_wait_seconds', 'Time spent waiting in the admission queue', ['endpoint'])
+IN_FLIGHT = metrics.gauge(
+    'creel_admission_in_flight', 'Requests currently executing', ['endpoint'])
+QUEUE_DEPTH = metrics.gauge(
+    'creel_admission_queue_depth', 'Requests currently waiting for a slot', ['endpoint'])
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, endpoint, reason, retry_after):
+        super().__init__(f"{endpoint} overloaded ({reason})")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(self, endpoint, max_concurrent, max_queue, queue_timeout):
+        self.endpoint = endpoint
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        # Tickets of queued requests, oldest first
+        self._queue = deque()
+
+    def acquire(self):
+        """Take an execution slot, waiting in the queue if necessary
+
+        Raises:
+            Overloaded: if the queue is full or the wait times out
+        """
+        with self._cond:
+            # Arrivals only skip the queue when it is empty
+            if self._active < self.max_concurrent and not self._queue:
+                self._admit()
+                return
+
+            if len(self._queue) >= self.max_queue:
+                self._reject('queue_full')
+
+            # A waiter is admitted only once its ticket is at the head of
+            # the queue, so requests are served in arrival order
+            ticket = object()
+            self._queue.append(ticket)
+            QUEUED.inc(endpoint=self.endpoint)
+            QUEUE_DEPTH.inc(endpoint=self.endpoint)
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            try:
+                while self._queue[0] is not ticket or self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject('timeout')
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                # The next ticket may now be at the head with a slot free
+                self._cond.notify_all()
+                QUEUE_DEPTH.dec(endpoint=self.endpoint)
+                QUEUE_WAIT.observe(time.monotonic() - start, endpoint=self.endpoint)
+
+            self._admit()
+
+    def release(self):
+        """Return an execution slot and wake the waiters (the head one proceeds)"""
+        with self._cond:
+            self._active -= 1
+            IN_FLIGHT.dec(endpoint=self.endpoint)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold an execution slot for the duration of a with-block"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _admit(self):
+        self._active += 1
+        ADMITTED.inc(endpoint=self.endpoint)
+        IN_FLIGHT.inc(endpoint=self.endpoint)
+
+    def _reject(self, reason):
+        REJECTED.inc(endpoint=self.endpoint, reason=reason)
+        raise Overloaded(self.endpoint, reason, Config.API_RETRY_AFTER_SECONDS)
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(endpoint):
+    """Get (or lazily create) the admission controller for an endpoint"""
+    controller = _controllers.get(endpoint)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(endpoint)
+            if controller is None:
+                controller = _controllers[endpoint] = AdmissionController(
+                    endpoint,
+                    Config.API_ENDPOINT_MAX_CONCURRENT.get(endpoint, Config.API_MAX_CONCURRENT),
+                    Config.API_MAX_QUEUE,
+                    Config.API_QUEUE_TIMEOUT_SECONDS,
+                )
+    return controller
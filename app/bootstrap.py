@@ -0,0 +1,99 @@
+"""
+Index page with the first load's data inlined
+
+Without it, the page waits for /api/filter_options before it fires the
+dashboard requests. The server instead embeds the filter options and
+the default view's responses in index.html as a JSON block that app.js
+reads on first load, so the first paint needs no API calls. The rendered
+page is cached (plain and gzipped) per dataset version and template.
+"""
+import gzip
+import json
+import os
+from urllib.parse import urlencode
+
+from . import cache, database, singleflight, snapshots
+
+
+TEMPLATE = os.path.join('static', 'index.html')
+
+# The payload goes in right before app.js (or at the end of the body)
+SCRIPT_MARKER = '<script src="/static/js/app.js">'
+
+# Rendered pages: (html, gzipped html) keyed by template mtime
+page_cache = cache.ResultCache('index', 4)
+page_flights = singleflight.SingleFlight('index')
+
+
+def get_payload(version):
+    """
+    Build the inlined JSON: filter options plus the default view's data
+
+    The default view's responses come from its snapshot when one is built
+    for this version (see app/snapshots.py) and are computed otherwise.
+
+    Returns:
+        str: JSON text {'version', 'query', 'filter_options', 'data'}
+            where data maps each API path to its response
+    """
+    bodies = []
+    for path, fetch, extra in snapshots.ENDPOINTS:
+        if path == '/api/map_data':
+            # The map gets its totals along with its geometry
+            continue
+        params = dict(snapshots.DEFAULT_PARAMS, **extra)
+        stored = snapshots.lookup((path, database.canonical_params(params)), version)
+        body = gzip.decompress(stored).decode() if stored is not None else json.dumps(fetch(params))
+        bodies.append(f"{json.dumps(path)}: {body}")
+
+    # Bodies are spliced in as-is rather than parsed and serialized again
+    return (
+        f'{{"version": {json.dumps(version)}, '
+        f'"query": {json.dumps(urlencode(snapshots.DEFAULT_PARAMS, doseq=True))}, '
+        f'"filter_options": {json.dumps(database.get_filter_options())}, '
+        f'"data": {{{", ".join(bodies)}}}}}'
+    )
+
+
+def render_index(version):
+    """
+    Render index.html with the bootstrap payload for a dataset version
+
+    Returns:
+        str: HTML page
+    """
+    with open(TEMPLATE, encoding='utf-8') as f:
+        html = f.read()
+
+    # '<' is escaped so no value can close the script element early
+    payload = get_payload(version).replace('<', '\\u003c')
+    script = f'<script id="bootstrap-data" type="application/json">{payload}</script>\n    '
+
+    position = html.find(SCRIPT_MARKER)
+    if position < 0:
+        position = html.rfind('</body>')
+    if position < 0:
+        return html
+    return html[:position] + script + html[position:]
+
+
+def get_index_page():
+    """
+    Get the current index page, rendering it once per version
+
+    Returns:
+        tuple: (html bytes, gzipped html bytes)
+    """
+    version = database.get_dataset_version()
+    key = os.stat(TEMPLATE).st_mtime_ns
+    page = page_cache.get(key, version)
+    if page is not None:
+        return page
+
+    def render():
+        html = render_index(version).encode()
+        return html, gzip.compress(html, 9)
+
+    page, _ = page_flights.do((key, version), render)
+    page_cache.put(key, version, page)
+    return page
@@ -0,0 +1,62 @@
+"""
+Result caches keyed by dataset version
+
+Cached results are only valid for the dataset version they were computed
+from. When a newer version is seen the whole cache is dropped, so a data
+refresh never serves stale results and never needs explicit
+invalidation.
+"""
+import threading
+from collections import OrderedDict
+
+from . import metrics
+
+
+CACHE_HITS = metrics.counter(
+    'creel_cache_hits_total', 'Responses served without executing their query', ['cache'])
+CACHE_MISSES = metrics.counter(
+    'creel_cache_misses_total', 'Cache lookups that had to execute their query', ['cache'])
+CACHE_ENTRIES = metrics.gauge(
+    'creel_cache_entries', 'Entries held by each result cache', ['cache'])
+
+
+class ResultCache:
+    """Thread-safe LRU cache of results for the current dataset version"""
+
+    def __init__(self, name, max_entries=256):
+        self.name = name
+        self.max_entries = max_entries
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Get a cached value for key at version, or None"""
+        with self._lock:
+            value = self._entries.get(key) if version == self.version else None
+            if value is not None:
+                self._entries.move_to_end(key)
+        if value is None:
+            CACHE_MISSES.inc(cache=self.name)
+        else:
+            CACHE_HITS.inc(cache=self.name)
+        return value
+
+    def put(self, key, version, value):
+        """Store a value computed from dataset version"""
+        with self._lock:
+            if self.version is not None and version < self.version:
+                return  # computed before a refresh that has since been seen
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            CACHE_ENTRIES.set(len(self._entries), cache=self.name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            CACHE_ENTRIES.set(0, cache=self.name)
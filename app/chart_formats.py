@@ -0,0 +1,88 @@
+"""
+Column-oriented responses for the chart endpoints
+
+/api/trend, /api/yearly and /api/monthly return a list of objects that
+repeat every key on every row. With format=columns they return the same
+values as one array per key instead:
+
+    {"period": ["2013-01", ...], "chinook": [12.0, ...], ...}
+
+and with format=binary the column arrays are packed for typed-array
+views (all little-endian):
+
+    uint32          length of the JSON header, including its padding
+    JSON header     {"length": rows, "columns": [...]}, space-padded so
+                    the data that follows starts at a multiple of 8
+    float64 data    one array per numeric column, back to back
+
+Each header column is {"name", "type": "float64", "offset"} for numeric
+columns, offset in bytes from the start of the data (a Float64Array of
+length rows; missing values are NaN), or {"name", "values"} for the rest,
+such as trend periods.
+"""
+import json
+import struct
+import sys
+from array import array
+
+
+FORMATS = ('rows', 'columns', 'binary')
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+
+NAN = float('nan')
+
+
+def get_format(params):
+    """Requested format of a chart endpoint ('rows' unless given)"""
+    return params.get('format', ['rows'])[0] if params else 'rows'
+
+
+def reshape(rows, params, columns):
+    """
+    Return chart rows in the shape the request asked for
+
+    Args:
+        rows: List of row dicts
+        params: Query parameters dict with optional 'format' key
+        columns: Keys of the rows, in order (so empty results keep them)
+
+    Returns:
+        list or dict: rows as they are, or {column: [values...]} for the
+        columns and binary formats
+    """
+    if get_format(params) == 'rows':
+        return rows
+    return {column: [row[column] for row in rows] for column in columns}
+
+
+def _is_numeric(values):
+    return all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+               for value in values)
+
+
+def encode_binary(columns):
+    """
+    Pack a {column: [values...]} dict in the binary format
+
+    Returns:
+        bytes: Response body
+    """
+    length = len(next(iter(columns.values()), []))
+    header = {'length': length, 'columns': []}
+    data = []
+    offset = 0
+    for name, values in columns.items():
+        if not _is_numeric(values):
+            header['columns'].append({'name': name, 'values': values})
+            continue
+        packed = array('d', [NAN if value is None else value for value in values])
+        if sys.byteorder == 'big':
+            packed.byteswap()
+        header['columns'].append({'name': name, 'type': 'float64', 'offset': offset})
+        data.append(packed.tobytes())
+        offset += len(values) * 8
+
+    text = json.dumps(header).encode()
+    text += b' ' * (-(4 + len(text)) % 8)
+    return struct.pack('<I', len(text)) + text + b''.join(data)
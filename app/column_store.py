@@ -0,0 +1,405 @@
+"""
+Aggregations served from a memory-mapped columnar copy of creel_records
+
+The server only ever reads creel data, but every aggregation pays for
+SQLite's B-tree walk and row decoding. After each ingest the collector
+also writes the records as a columnar snapshot (see app/columnar.py):
+
+    <database dir>/creel_records.col
+
+Server processes map it read-only and aggregate its fixed-width arrays
+with numpy, without copying them, so every worker shares the same page
+cache pages. The file is replaced atomically (os.replace) with each new
+data version; the next request maps the new file, and requests still
+using the old mapping keep it until they finish.
+
+numpy is optional: without it, or when the snapshot is missing, from
+another data version, or has rows without a parseable sample_date, the
+data functions run their SQL as before. Results are the same as the SQL
+paths', summed in the same (id) order.
+
+Filters resolve through bitmap indexes built when the file is mapped: a
+packed bitset of rows per catch area, year and month. Any combination of
+multi-select filters is an OR within each filter and an AND across them.
+"""
+import os
+import re
+import sqlite3
+import threading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from .config import Config
+from . import columnar, database
+
+
+# Numeric columns the API can aggregate
+SPECIES_COLUMNS = ('chinook', 'coho', 'chum', 'pink', 'sockeye', 'lingcod', 'halibut')
+SALMON = ['chinook', 'coho', 'chum', 'pink', 'sockeye']
+
+YEAR_PATTERN = re.compile(r'\d{4}')
+
+# Period labels per time unit, from the integer period codes
+PERIOD_LABELS = {
+    'daily': lambda code: f"{code // 10000:04d}-{code // 100 % 100:02d}-{code % 100:02d}",
+    'weekly': lambda code: f"{code // 100:04d}-W{code % 100:02d}",
+    'monthly': lambda code: f"{code // 100:04d}-{code % 100:02d}",
+    'yearly': lambda code: f"{code:04d}",
+}
+
+
+class _Unsupported(Exception):
+    """The query has to run in SQLite (e.g. a year filter that isn't YYYY)"""
+
+
+def write_store(db_path, path, version):
+    """
+    Write the columnar snapshot of creel_records for a dataset version
+
+    Args:
+        db_path: Database to copy the records from
+        path: Snapshot file of that database
+        version: Dataset version the database is at
+
+    Returns:
+        int: Number of rows written
+    """
+    fields = [f"{database.DATE_STRING_SQL} as sample_day" if f == 'sample_day' else f for f in columnar.FIELDS]
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(fields)} FROM creel_records ORDER BY id")
+        writer = columnar.SnapshotWriter(path, version)
+        for chunk in iter(lambda: cursor.fetchmany(10000), []):
+            for row in chunk:
+                writer.append(row)
+        return writer.close()
+    finally:
+        conn.close()
+
+
+def stored_version():
+    """Data version of the columnar snapshot on disk, or None"""
+    try:
+        snapshot = columnar.Snapshot(Config.COLUMN_STORE_PATH)
+    except (OSError, ValueError):
+        return None
+    try:
+        return snapshot.version
+    finally:
+        snapshot.close()
+
+
+def ensure_built(version):
+    """Write the columnar snapshot in the background if it is missing or outdated"""
+    if not NUMPY_AVAILABLE or stored_version() == version:
+        return
+
+    def build():
+        try:
+            rows = write_store(Config.DB_PATH, Config.COLUMN_STORE_PATH, version)
+            print(f"🧱 Wrote columnar snapshot of {rows:,} records for data version {version}")
+        except Exception as e:
+            print(f"Warning: Could not write columnar snapshot: {e}")
+
+    threading.Thread(target=build, name='column-store-build', daemon=True).start()
+
+
+class BitmapIndex:
+    """
+    Packed bitset of the rows holding each value of a column
+
+    Rows are in id (ingest) order, so a value's rows are scattered and
+    bitsets stay at one bit per row whatever the value's selectivity.
+    """
+
+    def __init__(self, values):
+        self.rows = len(values)
+        self.bitmaps = {int(value): np.packbits(values == value) for value in np.unique(values)}
+
+    def any_of(self, keys):
+        """Bitset of the rows holding any of keys"""
+        bits = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        for key in keys:
+            bitmap = self.bitmaps.get(key)
+            if bitmap is not None:
+                bits |= bitmap
+        return bits
+
+
+class ColumnStore:
+    """Aggregations over one mapped snapshot"""
+
+    def __init__(self, path):
+        self.snapshot = columnar.Snapshot(path)
+        self.version = self.snapshot.version
+        self.rows = self.snapshot.rows
+        self.day = self._array('sample_day')
+        self.area = self._array('catch_area')
+        self.area_names = self.snapshot.dictionary('catch_area')
+        self.area_codes = {name: code for code, name in enumerate(self.area_names)}
+
+        # Unknown days are 0; rows SQL would see with odd dates need SQL
+        self.usable = self.rows > 0 and int(self.day.min()) >= 10000101
+        self.year = self.day // 10000
+        self.month = self.day // 100 % 100
+        self.area_index = BitmapIndex(self.area)
+        self.year_index = BitmapIndex(self.year)
+        self.month_index = BitmapIndex(self.month)
+        self._columns = {}
+        self._periods = {}
+        self._lock = threading.Lock()
+
+    def _array(self, name):
+        """Zero-copy numpy view of a column"""
+        return np.frombuffer(self.snapshot.column(name), dtype=self.snapshot.columns[name]['dtype'])
+
+    def column(self, name):
+        if name not in SPECIES_COLUMNS and name != 'anglers':
+            raise _Unsupported(name)
+        values = self._columns.get(name)
+        if values is None:
+            values = self._columns[name] = self._array(name)
+        return values
+
+    def periods(self, time_unit):
+        """
+        Integer period code of every row, ordered like the SQL period strings
+
+        daily YYYYMMDD, weekly YYYYWW (strftime %W: weeks start on Monday,
+        days before the first Monday are week 00), monthly YYYYMM, yearly YYYY
+        """
+        codes = self._periods.get(time_unit)
+        if codes is not None:
+            return codes
+        with self._lock:
+            if time_unit not in self._periods:
+                if time_unit == 'daily':
+                    codes = self.day
+                elif time_unit == 'monthly':
+                    codes = self.day // 100
+                elif time_unit == 'weekly':
+                    dates = ((self.year - 1970).astype('datetime64[Y]').astype('datetime64[M]')
+                             + (self.month - 1).astype('timedelta64[M]')).astype('datetime64[D]') \
+                        + (self.day % 100 - 1).astype('timedelta64[D]')
+                    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64)
+                    weekday = (dates.astype(np.int64) + 3) % 7  # Monday = 0
+                    codes = self.year * 100 + (day_of_year + 7 - weekday) // 7
+                else:
+                    codes = self.year
+                self._periods[time_unit] = codes
+            return self._periods[time_unit]
+
+    def select(self, params):
+        """
+        Find the rows matching the year, catch area and month filters
+
+        Returns:
+            ndarray: Row numbers, or None for every row
+        """
+        selected = []
+        bounds = {}
+        for name in ('year_start', 'year_end'):
+            if name in params:
+                value = params[name][0] if isinstance(params[name], list) else params[name]
+                if not YEAR_PATTERN.fullmatch(value or ''):
+                    raise _Unsupported(name)
+                bounds[name] = int(value)
+        if bounds:
+            years = [year for year in self.year_index.bitmaps
+                     if bounds.get('year_start', year) <= year <= bounds.get('year_end', year)]
+            selected.append(self.year_index.any_of(years))
+
+        if 'catch_area' in params:
+            areas = params['catch_area'] if isinstance(params['catch_area'], list) else [params['catch_area']]
+            if any(areas):
+                selected.append(self.area_index.any_of(
+                    self.area_codes[a] for a in areas if a and a in self.area_codes))
+
+        months = database.get_months(params)
+        if months is not None:
+            selected.append(self.month_index.any_of(months))
+
+        if not selected:
+            return None
+        bits = selected[0]
+        for other in selected[1:]:
+            bits = bits & other
+        return np.flatnonzero(np.unpackbits(bits, count=self.rows))
+
+    def _take(self, values, rows):
+        return values if rows is None else values[rows]
+
+    def _catch(self, species, rows):
+        """Per-row sum of the species (NaN if any is NULL, as in SQL)"""
+        total = self._take(self.column(species[0]), rows)
+        for name in species[1:]:
+            total = total + self._take(self.column(name), rows)
+        return total
+
+    def _area_groups(self, rows):
+        """Catch area code of the rows, without rows that have no catch area"""
+        areas = self._take(self.area, rows)
+        blank = self.area_codes.get('')
+        keep = None if blank is None else areas != blank
+        return areas, keep
+
+    def statistics(self, params, species):
+        rows = self.select(params)
+        count = self.rows if rows is None else len(rows)
+        anglers = self._take(self.column('anglers'), rows)
+        anglers = anglers[anglers != -1]
+        totals = [_total(self._take(self.column(name), rows)) for name in SALMON]
+
+        areas, keep = self._area_groups(rows)
+        distinct = np.unique(areas if keep is None else areas[keep])
+        years = self._take(self.year, rows)
+
+        return {
+            'total_catch': round(sum(total or 0 for total in totals)),
+            'surveys': count or 0,
+            'total_records': count or 0,
+            'total_anglers': round(int(anglers.sum(dtype=np.int64)) if len(anglers) else 0),
+            'total_chinook': round(totals[0] or 0),
+            'total_coho': round(totals[1] or 0),
+            'min_year': f"{int(years.min()):04d}" if count else 'N/A',
+            'max_year': f"{int(years.max()):04d}" if count else 'N/A',
+            'areas': len(distinct)
+        }
+
+    def _sum_by_area(self, params, species):
+        """(area, total or None, rows) per catch area, ordered by name"""
+        rows = self.select(params)
+        areas, keep = self._area_groups(rows)
+        catch = self._catch(species, rows)
+        if keep is not None:
+            areas, catch = areas[keep], catch[keep]
+        groups = len(self.area_names)
+        totals = _group_totals(areas, catch, groups)
+        surveys = np.bincount(areas, minlength=groups)
+        result = [(self.area_names[code], totals[code], int(surveys[code]))
+                  for code in range(groups) if surveys[code]]
+        return sorted(result, key=lambda item: item[0])
+
+    def catch_areas(self, params, species):
+        result = [(area, total) for area, total, _ in self._sum_by_area(params, species)]
+        # ORDER BY total_catch DESC: NULL totals last
+        return sorted(result, key=lambda item: (item[1] is None, -(item[1] or 0)))
+
+    def map_data(self, params, species):
+        return [{'area': area, 'total': total or 0, 'surveys': surveys}
+                for area, total, surveys in self._sum_by_area(params, species)]
+
+    def _sum_by_period(self, rows, codes, columns):
+        """(period codes, [totals per column]) grouped by sorted period"""
+        codes = self._take(codes, rows)
+        periods, groups = np.unique(codes, return_inverse=True)
+        totals = [_group_totals(groups, self._take(self.column(name), rows), len(periods))
+                  for name in columns]
+        return periods, totals
+
+    def yearly(self, params, species):
+        years, totals = self._sum_by_period(self.select(params), self.year, SALMON)
+        return [dict([('year', f"{int(year):04d}")] + [(name, totals[k][i] or 0) for k, name in enumerate(SALMON)])
+                for i, year in enumerate(years)]
+
+    def trend(self, params, species):
+        time_unit = params.get('time_unit', ['yearly'])[0]
+        if time_unit not in PERIOD_LABELS:
+            time_unit = 'yearly'
+        label = PERIOD_LABELS[time_unit]
+        periods, totals = self._sum_by_period(self.select(params), self.periods(time_unit), species)
+        return [dict([('period', label(int(period)))] + [(name, totals[k][i]) for k, name in enumerate(species)])
+                for i, period in enumerate(periods)]
+
+    def species_totals(self, params, species):
+        rows = self.select(params)
+        return {name: (_total(self._take(self.column(name), rows)) or 0) for name in species}
+
+    def monthly(self, params, species):
+        rows = self.select(params)
+        totals = _group_totals(self._take(self.month, rows), self._catch(species, rows), 13)
+        return [{'month': month, 'total': totals[month] or 0} for month in range(1, 13)]
+
+
+def _total(values):
+    """SQL SUM(): rows added in order, NULLs skipped, None if all are NULL"""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    return float(np.add.accumulate(values)[-1])
+
+
+def _group_totals(groups, values, count):
+    """SQL SUM() per group number in range(count); None for all-NULL groups"""
+    valid = ~np.isnan(values)
+    groups = groups[valid]
+    totals = np.bincount(groups, weights=values[valid], minlength=count)
+    counts = np.bincount(groups, minlength=count)
+    return [float(total) if n else None for total, n in zip(totals, counts)]
+
+
+# (snapshot file stat, ColumnStore or None) of the last load
+_store = (None, None)
+_store_lock = threading.Lock()
+
+
+def get_store(version):
+    """
+    Get the mapped store for a dataset version
+
+    The file is mapped again whenever it changes on disk. The previous
+    mapping isn't closed explicitly: it is released once no request holds
+    its arrays any more.
+
+    Returns:
+        ColumnStore: or None if it can't answer queries for this version
+    """
+    global _store
+    if not NUMPY_AVAILABLE:
+        return None
+    try:
+        st = os.stat(Config.COLUMN_STORE_PATH)
+    except OSError:
+        return None
+
+    stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached_key, store = _store
+    if cached_key != stat_key:
+        with _store_lock:
+            if _store[0] != stat_key:
+                try:
+                    store = ColumnStore(Config.COLUMN_STORE_PATH)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Could not map columnar snapshot: {e}")
+                    store = None
+                _store = (stat_key, store)
+            store = _store[1]
+
+    if store is None or not store.usable or store.version != version:
+        return None
+    return store
+
+
+def query(name, params, version):
+    """
+    Answer a data function from the store
+
+    Args:
+        name: ColumnStore method ('statistics', 'trend', ...)
+        params: Query parameters dict
+        version: Current dataset version
+
+    Returns:
+        The data function's result, or None if the query has to use SQLite
+    """
+    store = get_store(version)
+    if store is None:
+        return None
+    try:
+        return getattr(store, name)(params, database.get_species_list(params))
+    except _Unsupported:
+        return None
@@ -0,0 +1,220 @@
+"""
+Columnar binary snapshot of creel_records
+
+A snapshot is a single file that can be memory-mapped and read without
+SQLite or any parsing. Layout (integers little-endian):
+
+    8 bytes   magic b'CREELCOL'
+    4 bytes   format version (uint32)
+    4 bytes   header length N (uint32)
+    N bytes   UTF-8 JSON header: row count, data version, and for each
+              column its name, array type code, numpy dtype, byte offset,
+              byte length and (string columns) dictionary
+    ...       one fixed-width array per column, each 8-byte aligned
+
+sample_day is an int32 YYYYMMDD (0 when unknown) so it sorts and range
+filters numerically. Integer NULLs are -1 and float NULLs are NaN. String
+columns hold uint16 (or uint32) codes into their dictionary.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+
+
+MAGIC = b'CREELCOL'
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 8
+
+STRING = 'str'
+
+# (name, array type code) in file order; rows are appended in this order
+COLUMNS = [
+    ('sample_day', 'i'),
+    ('ramp_site', STRING),
+    ('catch_area', STRING),
+    ('interviews', 'i'),
+    ('anglers', 'i'),
+    ('chinook', 'd'),
+    ('chinook_per_angler', 'd'),
+    ('coho', 'd'),
+    ('chum', 'd'),
+    ('pink', 'd'),
+    ('sockeye', 'd'),
+    ('lingcod', 'd'),
+    ('halibut', 'd'),
+]
+FIELDS = [name for name, _ in COLUMNS]
+
+NUMPY_DTYPES = {'i': '<i4', 'd': '<f8', 'H': '<u2', 'I': '<u4'}
+
+NAN = float('nan')
+
+
+def day_number(sample_day):
+    """Convert an ISO 'YYYY-MM-DD' day to the int YYYYMMDD stored in snapshots"""
+    if not sample_day:
+        return 0
+    return int(sample_day[:4]) * 10000 + int(sample_day[5:7]) * 100 + int(sample_day[8:10])
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class SnapshotWriter:
+    """
+    Accumulate records column by column and write them as a snapshot
+
+    Columns are kept in compact typed arrays rather than row tuples, so a
+    full export needs tens of bytes per row. The file is written to a
+    temporary name and renamed into place, so readers never see a
+    partially written snapshot.
+    """
+
+    def __init__(self, path, version=None):
+        self.path = path
+        self.version = version
+        self.rows = 0
+        self._arrays = {}
+        self._dictionaries = {}
+        for name, typecode in COLUMNS:
+            if typecode == STRING:
+                self._arrays[name] = array('I')
+                self._dictionaries[name] = {}
+            else:
+                self._arrays[name] = array(typecode)
+
+    def append(self, record):
+        """
+        Add one record
+
+        Args:
+            record: Values in FIELDS order, with sample_day as 'YYYY-MM-DD'
+        """
+        for (name, typecode), value in zip(COLUMNS, record):
+            if typecode == STRING:
+                codes = self._dictionaries[name]
+                code = codes.get(value or '')
+                if code is None:
+                    code = codes[value or ''] = len(codes)
+                self._arrays[name].append(code)
+            elif name == 'sample_day':
+                self._arrays[name].append(day_number(value))
+            elif typecode == 'd':
+                self._arrays[name].append(NAN if value is None else value)
+            else:
+                self._arrays[name].append(-1 if value is None else value)
+        self.rows += 1
+
+    def close(self):
+        """
+        Write the snapshot file atomically
+
+        Returns:
+            int: Number of rows written
+        """
+        columns = []
+        arrays = []
+        for name, typecode in COLUMNS:
+            values = self._arrays[name]
+            entry = {'name': name}
+            if typecode == STRING:
+                dictionary = sorted(self._dictionaries[name], key=self._dictionaries[name].get)
+                entry['dictionary'] = dictionary
+                if len(dictionary) <= 0x10000:
+                    values = array('H', values)
+            entry['type'] = values.typecode
+            entry['dtype'] = NUMPY_DTYPES[values.typecode]
+            columns.append(entry)
+            arrays.append(values)
+
+        # Offsets depend on the header length, which depends on the offsets;
+        # grow the (padded) header until the layout fits
+        created_at = datetime.now().isoformat()
+        header_length = 0
+        while True:
+            offset = _align(PREAMBLE.size + header_length)
+            for entry, values in zip(columns, arrays):
+                entry['offset'] = offset
+                entry['length'] = len(values) * values.itemsize
+                offset = _align(offset + entry['length'])
+            header = {
+                'rows': self.rows,
+                'version': self.version,
+                'created_at': created_at,
+                'columns': columns,
+            }
+            encoded = json.dumps(header).encode()
+            if len(encoded) <= header_length:
+                break
+            header_length = _align(len(encoded) + 64)
+
+        encoded = encoded.ljust(header_length)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, header_length))
+            f.write(encoded)
+            for entry, values in zip(columns, arrays):
+                f.write(b'\0' * (entry['offset'] - f.tell()))
+                _little_endian(values).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return self.rows
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped snapshot
+
+    Column views are zero-copy memoryviews over the mapping, so every
+    process mapping the same file shares its pages. Release any views
+    before calling close().
+    """
+
+    def __init__(self, path):
+        if sys.byteorder == 'big':
+            raise ValueError("Columnar snapshots can only be mapped on little-endian hosts")
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        magic, version, header_length = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} creel snapshot")
+
+        header = json.loads(bytes(self._mmap[PREAMBLE.size:PREAMBLE.size + header_length]))
+        self.rows = header['rows']
+        self.version = header['version']
+        self.created_at = header['created_at']
+        self.columns = {entry['name']: entry for entry in header['columns']}
+
+    def column(self, name):
+        """Zero-copy view of a column's values (codes for string columns)"""
+        entry = self.columns[name]
+        view = memoryview(self._mmap)[entry['offset']:entry['offset'] + entry['length']]
+        return view.cast(entry['type'])
+
+    def dictionary(self, name):
+        """Strings that a string column's codes index into"""
+        return self.columns[name]['dictionary']
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
@@ -13,7 +13,7 @@ class Config:
     
     # Database configuration
     DB_DIR = "wdfw_creel_data"
-    DB_PATH = os.path.join(DB_DIR, "creel_data.db")
+    DB_PATH = os.environ.get("DB_PATH", os.path.join(DB_DIR, "creel_data.db"))
     
     # Google Cloud Storage configuration
     GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME")
@@ -21,10 +21,114 @@ class Config:
     
     # Auto-update configuration
     UPDATE_INTERVAL_HOURS = 24
-    
+
+    # Admission control for expensive API endpoints
+    API_MAX_CONCURRENT = int(os.environ.get("API_MAX_CONCURRENT", 4))
+    API_MAX_QUEUE = int(os.environ.get("API_MAX_QUEUE", 16))
+    API_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("API_QUEUE_TIMEOUT_SECONDS", 10))
+    API_RETRY_AFTER_SECONDS = int(os.environ.get("API_RETRY_AFTER_SECONDS", 5))
+    # Per-endpoint overrides (daily trend over all years is the heaviest scan)
+    API_ENDPOINT_MAX_CONCURRENT = {
+        '/api/trend': int(os.environ.get("API_TREND_MAX_CONCURRENT", 2)),
+        # Undownsampled series streamed to the client, kept apart so slow
+        # readers don't hold the aggregation slots
+        '/api/trend_stream': int(os.environ.get("API_TREND_STREAM_MAX_CONCURRENT", 2)),
+        '/api/records': int(os.environ.get("API_RECORDS_MAX_CONCURRENT", 2)),
+        '/api/matrix': int(os.environ.get("API_MATRIX_MAX_CONCURRENT", 2)),
+    }
+
+    # Time budget of an API request in seconds (0 disables): SQL still
+    # running at the deadline, or after the client disconnects, is interrupted
+    QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", 30))
+    QUERY_ENDPOINT_TIMEOUT_SECONDS = {
+        # Exports stream for as long as the client keeps reading
+        '/api/records': float(os.environ.get("API_RECORDS_TIMEOUT_SECONDS", 0)),
+    }
+
+    # Downsampled trend series kept per dataset version
+    TREND_CACHE_SIZE = int(os.environ.get("TREND_CACHE_SIZE", 256))
+    # /api/analytics results kept per dataset version
+    ANALYTICS_CACHE_SIZE = int(os.environ.get("ANALYTICS_CACHE_SIZE", 128))
+
+    # Precomputed preset view snapshots (next to the database so each
+    # database keeps its own), and how many dataset versions to keep
+    SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(os.path.dirname(DB_PATH), "snapshots"))
+    SNAPSHOT_KEEP_VERSIONS = 2
+
+    # Per-season copies of creel_records used by year-filtered queries.
+    # Wider ranges read the full database: scanning the partitions through
+    # one UNION ALL view stops paying off at around five seasons
+    PARTITION_DIR = os.environ.get("PARTITION_DIR", os.path.join(os.path.dirname(DB_PATH), "partitions"))
+    PARTITION_MAX_ATTACHED = int(os.environ.get("PARTITION_MAX_ATTACHED", 4))
+
+    # Memory-mapped columnar copy of creel_records (used when numpy is installed)
+    COLUMN_STORE_PATH = os.environ.get("COLUMN_STORE_PATH",
+                                       os.path.join(os.path.dirname(DB_PATH), "creel_records.col"))
+
+    # Most requested query results, rendered at each refresh so new
+    # instances start warm; and how many distinct queries are counted
+    WARM_CACHE_PATH = os.environ.get("WARM_CACHE_PATH",
+                                     os.path.join(os.path.dirname(DB_PATH), "warm_cache.json.gz"))
+    WARM_CACHE_ENTRIES = int(os.environ.get("WARM_CACHE_ENTRIES", 200))
+    WARM_CACHE_TRACKED = 5000
+
+    # Zoom-tiered map geometry written by build_map_geometry.py
+    MAP_GEOMETRY_DIR = os.path.join("static", "data", "map_geometry")
+
+    # Batch queries: connections kept for reuse, and request limits
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 4))
+    BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", 32))
+    BATCH_MAX_BYTES = 64 * 1024
+
+    # Raw record export: rows per keyset page (and per streamed chunk)
+    RECORDS_PAGE_SIZE = int(os.environ.get("RECORDS_PAGE_SIZE", 1000))
+    # Longest a streamed chunk may wait on a client that stopped reading
+    # (the request deadline, if sooner, applies to writes as well)
+    STREAM_WRITE_TIMEOUT_SECONDS = float(os.environ.get("STREAM_WRITE_TIMEOUT_SECONDS", 30))
+
+    # Slow-query log (opt-in): statements slower than this many milliseconds
+    # are recorded with their query plan at /debug/slow_queries
+    SLOW_QUERY_LOG_MS = float(os.environ["SLOW_QUERY_LOG_MS"]) if os.environ.get("SLOW_QUERY_LOG_MS") else None
+    SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", 100))
+
+    # Debug endpoints and profiling: /debug/* require X-Debug-Token when a
+    # token is configured, and on-demand profiling (?profile=1) always does
+    DEBUG_TOKEN = os.environ.get("DEBUG_TOKEN")
+    # Fraction of /api/* requests profiled continuously (0 disables sampling)
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_TOP_N = 25
+    PROFILE_LOG_SIZE = int(os.environ.get("PROFILE_LOG_SIZE", 50))
+
     # WDFW API configuration
     WDFW_MAPSERVER_URL = "https://geodataservices.wdfw.wa.gov/arcgis/rest/services/ApplicationServices/Marine_Areas/MapServer"
     
+    @classmethod
+    def derived_paths(cls, db_path):
+        """
+        Locations of the files derived from a database
+
+        The served database (DB_PATH) uses the configured locations; any
+        other database (e.g. a benchmark's) keeps them in its own directory.
+
+        Returns:
+            dict: snapshot_dir, partition_dir, column_store_path and
+                warm_cache_path
+        """
+        if os.path.abspath(db_path) == os.path.abspath(cls.DB_PATH):
+            return {
+                'snapshot_dir': cls.SNAPSHOT_DIR,
+                'partition_dir': cls.PARTITION_DIR,
+                'column_store_path': cls.COLUMN_STORE_PATH,
+                'warm_cache_path': cls.WARM_CACHE_PATH,
+            }
+        directory = os.path.dirname(db_path)
+        return {
+            'snapshot_dir': os.path.join(directory, "snapshots"),
+            'partition_dir': os.path.join(directory, "partitions"),
+            'column_store_path': os.path.join(directory, "creel_records.col"),
+            'warm_cache_path': os.path.join(directory, "warm_cache.json.gz"),
+        }
+
     @classmethod
     def ensure_directories(cls):
         """Ensure required directories exist"""
@@ -3,13 +3,247 @@ Database operations for WDFW Creel Dashboard
 """
 import sqlite3
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from .config import Config
+from . import chart_formats, column_store, downsample, metrics, partitions, querylog, request_context
 
 
-def get_db_connection():
-    """Get a connection to the SQLite database"""
-    return sqlite3.connect(Config.DB_PATH)
+CONNECTIONS_OPENED = metrics.counter(
+    'creel_db_connections_opened_total', 'SQLite connections opened')
+
+# SQLite VM instructions between checks of the request's deadline and client
+PROGRESS_INTERVAL = 10000
+
+
+def _progress():
+    """SQLite progress handler: a true value interrupts the running statement"""
+    context = request_context.current()
+    return context is not None and context.check_cancelled() is not None
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that adds statement and fetch time to the request's 'sql' phase
+
+    When the slow-query log is enabled it also tracks each statement's total
+    time and row count until the statement is finished. A statement
+    interrupted by the request's deadline or disconnect is logged and
+    raised as request_context.QueryCancelled.
+    """
+
+    _statement = None
+    _query = None
+
+    def execute(self, sql, parameters=()):
+        self.finish_statement()
+        start = time.perf_counter()
+        self._query = (sql, parameters, start)
+        try:
+            return super().execute(sql, parameters)
+        except sqlite3.OperationalError:
+            self._raise_if_cancelled()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            request_context.add_phase('sql', elapsed)
+            # A cancelled statement has already been logged as such
+            if querylog.enabled() and self._query is not None:
+                self._statement = querylog.Statement(sql, parameters, elapsed)
+                self.connection.last_cursor = self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            row = super().fetchone()
+        except sqlite3.OperationalError:
+            self._raise_if_cancelled()
+            raise
+        self._track(time.perf_counter() - start, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        try:
+            rows = super().fetchmany(size)
+        except sqlite3.OperationalError:
+            self._raise_if_cancelled()
+            raise
+        self._track(time.perf_counter() - start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            rows = super().fetchall()
+        except sqlite3.OperationalError:
+            self._raise_if_cancelled()
+            raise
+        self._track(time.perf_counter() - start, len(rows), True)
+        return rows
+
+    def _raise_if_cancelled(self):
+        """Turn an interrupt caused by the request into QueryCancelled"""
+        context = request_context.current()
+        if context is None or context.cancelled is None or self._query is None:
+            return
+        sql, parameters, start = self._query
+        self._query = None
+        self._statement = None
+
+        # Explaining the statement must not be interrupted in turn
+        connection = self.connection
+        connection.set_progress_handler(None, 0)
+        try:
+            querylog.cancelled(connection, sql, parameters, time.perf_counter() - start, context.cancelled)
+        finally:
+            connection.set_progress_handler(_progress, PROGRESS_INTERVAL)
+        raise request_context.QueryCancelled(context.cancelled)
+
+    def close(self):
+        self.finish_statement()
+        super().close()
+
+    def _track(self, elapsed, rows, exhausted):
+        request_context.add_phase('sql', elapsed)
+        statement = self._statement
+        if statement is not None:
+            statement.duration += elapsed
+            statement.rows += rows
+            if exhausted:
+                self.finish_statement()
+
+    def finish_statement(self):
+        """Hand the current statement to the slow-query log"""
+        statement = self._statement
+        if statement is not None:
+            self._statement = None
+            querylog.finish(self.connection, statement)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors are InstrumentedCursor instances
+
+    A progress handler lets the request being served cancel its
+    statements (see request_context.RequestContext.check_cancelled).
+    """
+
+    last_cursor = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_progress_handler(_progress, PROGRESS_INTERVAL)
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def close(self):
+        self.finish_statements()
+        super().close()
+
+    def finish_statements(self):
+        """Finish statements read with a single fetchone()"""
+        if self.last_cursor is not None:
+            self.last_cursor.finish_statement()
+            self.last_cursor = None
+
+
+def get_db_connection(db_path=None):
+    """Get a connection to the SQLite database (or another one at db_path)"""
+    CONNECTIONS_OPENED.inc()
+    return sqlite3.connect(db_path or Config.DB_PATH, factory=InstrumentedConnection)
+
+
+@contextmanager
+def connection(conn=None, params=None):
+    """
+    Use the caller's connection, or a new one that is closed afterwards
+
+    Data functions take an optional conn so several of them can run on one
+    connection (and inside one transaction). A new connection for a query
+    limited to a few seasons reads only their partitions (see
+    app/partitions.py) instead of the full database.
+
+    Args:
+        conn: Connection to use as is, or None
+        params: Query parameters of the query (for partition routing)
+    """
+    if conn is not None:
+        yield conn
+        return
+
+    seasons = partitions.seasons_for(params, get_dataset_version()) if params else None
+    if seasons is None:
+        conn = get_db_connection()
+    else:
+        CONNECTIONS_OPENED.inc()
+        conn = sqlite3.connect(':memory:', factory=InstrumentedConnection, uri=True)
+        partitions.attach(conn, seasons)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+# Idle pooled connections: (connection, inode of the database file)
+_pool = []
+_pool_lock = threading.Lock()
+
+
+def _database_inode():
+    try:
+        return os.stat(Config.DB_PATH).st_ino
+    except OSError:
+        return None
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from a small pool of reusable connections
+
+    Pooled connections can be used from any thread, one borrower at a
+    time. Any open transaction is rolled back when the connection is
+    returned, and connections to a database file that has since been
+    replaced (e.g. downloaded again from GCS) are closed instead of reused.
+    """
+    inode = _database_inode()
+    conn = None
+    with _pool_lock:
+        while _pool and conn is None:
+            candidate, candidate_inode = _pool.pop()
+            if candidate_inode == inode:
+                conn = candidate
+            else:
+                candidate.close()
+    if conn is None:
+        CONNECTIONS_OPENED.inc()
+        conn = sqlite3.connect(Config.DB_PATH, factory=InstrumentedConnection, check_same_thread=False)
+
+    try:
+        yield conn
+    finally:
+        try:
+            conn.finish_statements()
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            conn = None
+        if conn is not None:
+            with _pool_lock:
+                if len(_pool) < Config.DB_POOL_SIZE:
+                    _pool.append((conn, inode))
+                    conn = None
+        if conn is not None:
+            conn.close()
 
 
 def ensure_metadata_table(conn):
@@ -68,6 +302,44 @@ def set_last_update_time():
             conn.close()
 
 
+# (database file stat, data_version) from the last read
+_dataset_version = (None, 0)
+
+
+def get_dataset_version():
+    """
+    Get the dataset version the collector recorded in the metadata table
+
+    The value is only re-read when the database file changes (size,
+    modification time or inode, e.g. after a refresh or a download from
+    GCS), so it is cheap enough to check on every request.
+
+    Returns:
+        int: data_version, or 0 if none has been recorded
+    """
+    global _dataset_version
+    try:
+        st = os.stat(Config.DB_PATH)
+    except OSError:
+        return 0
+    stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached_key, version = _dataset_version
+    if cached_key == stat_key:
+        return version
+
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT value FROM metadata WHERE key = 'data_version'").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # no metadata table yet
+    finally:
+        conn.close()
+
+    version = int(row[0]) if row else 0
+    _dataset_version = (stat_key, version)
+    return version
+
+
 def get_species_columns(params):
     """
     Get species columns to aggregate based on filter
@@ -77,18 +349,12 @@ def get_species_columns(params):
         
     Returns:
         str: SQL expression for summing species columns
+
+    Raises:
+        ValueError: If a species isn't one of the species columns
     """
-    if 'species' not in params:
-        return "chinook + coho + chum + pink + sockeye"
-    
-    species_list = [s for s in params['species'] if s and s != 'all']
-    
-    if not species_list or 'all' in params.get('species', []):
-        # Return all salmon species
-        return "chinook + coho + chum + pink + sockeye"
-    else:
-        # Return sum of selected species
-        return ' + '.join([s.lower() for s in species_list])
+    # Same selection as the species breakdowns, as column names
+    return ' + '.join(get_species_list(params))
 
 
 def get_species_list(params):
@@ -100,6 +366,9 @@ def get_species_list(params):
         
     Returns:
         list: List of species names
+
+    Raises:
+        ValueError: If a species isn't one of the species columns
     """
     if 'species' not in params:
         return ['chinook', 'coho', 'chum', 'pink', 'sockeye']
@@ -108,8 +377,51 @@ def get_species_list(params):
     
     if not species_list or 'all' in params.get('species', []):
         return ['chinook', 'coho', 'chum', 'pink', 'sockeye']
-    else:
-        return [s.lower() for s in species_list]
+    species_list = [s.lower() for s in species_list]
+    unknown = set(species_list) - set(column_store.SPECIES_COLUMNS)
+    if unknown:
+        raise ValueError(f"unknown species '{sorted(unknown)[0]}'")
+    return species_list
+
+
+def from_column_store(name, params, conn=None):
+    """
+    Answer a data function from the memory-mapped column store
+
+    Queries that run on a caller's connection (e.g. a batch reading one
+    transaction) stay in SQLite.
+
+    Args:
+        name: column_store.ColumnStore method
+        params: Query parameters dict
+        conn: The data function's conn argument
+
+    Returns:
+        The result, or None if the query has to run in SQLite
+    """
+    if conn is not None:
+        return None
+    return column_store.query(name, params, get_dataset_version())
+
+
+def get_months(params):
+    """
+    Get the months selected by the 'month' filter
+
+    Args:
+        params: Query parameters dict with optional 'month' values ('1'-'12')
+
+    Returns:
+        list: Sorted month numbers (values that aren't numbers match no
+        rows), or None if months aren't filtered
+    """
+    if 'month' not in params:
+        return None
+    values = params['month'] if isinstance(params['month'], list) else [params['month']]
+    values = [str(v).strip() for v in values if v]
+    if not values:
+        return None
+    return sorted({int(v) for v in values if v.isdigit()})
 
 
 def build_where_clause(params):
@@ -144,6 +456,13 @@ def build_where_clause(params):
             placeholders = ','.join(['?'] * len(areas))
             conditions.append(f"catch_area IN ({placeholders})")
             query_params.extend(areas)
+
+    # Month filter (multi-select, 1-12)
+    months = get_months(params)
+    if months is not None:
+        placeholders = ','.join(['?'] * len(months))
+        conditions.append(f"{MONTH_CASE_SQL} IN ({placeholders})" if months else "0")
+        query_params.extend(f"{month:02d}" for month in months)
     
     # Build WHERE clause
     if conditions:
@@ -154,7 +473,7 @@ def build_where_clause(params):
     return where_clause, query_params
 
 
-def get_statistics(params=None):
+def get_statistics(params=None, conn=None):
     """
     Get aggregated statistics from database
     
@@ -167,62 +486,67 @@ def get_statistics(params=None):
     if params is None:
         params = {}
     
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        stats = from_column_store('statistics', params, conn)
+        if stats is not None:
+            return stats
+
+        with connection(conn, params) as conn:
+            cursor = conn.cursor()
         
-        where_clause, query_params = build_where_clause(params)
+            where_clause, query_params = build_where_clause(params)
         
-        # Get basic stats
-        query = f"""
-            SELECT 
-                COUNT(*) as total_records,
-                SUM(anglers) as total_anglers,
-                SUM(chinook) as total_chinook,
-                SUM(coho) as total_coho,
-                SUM(chum) as total_chum,
-                SUM(pink) as total_pink,
-                SUM(sockeye) as total_sockeye,
-                MIN(substr(sample_date, -4)) as min_year,
-                MAX(substr(sample_date, -4)) as max_year
-            FROM creel_records
-            {where_clause}
-        """
+            # Get basic stats
+            query = f"""
+                SELECT 
+                    COUNT(*) as total_records,
+                    SUM(anglers) as total_anglers,
+                    SUM(chinook) as total_chinook,
+                    SUM(coho) as total_coho,
+                    SUM(chum) as total_chum,
+                    SUM(pink) as total_pink,
+                    SUM(sockeye) as total_sockeye,
+                    MIN(substr(sample_date, -4)) as min_year,
+                    MAX(substr(sample_date, -4)) as max_year
+                FROM creel_records
+                {where_clause}
+            """
         
-        cursor.execute(query, query_params)
-        row = cursor.fetchone()
+            cursor.execute(query, query_params)
+            row = cursor.fetchone()
         
-        # Count distinct catch areas
-        area_query = f"""
-            SELECT COUNT(DISTINCT catch_area) 
-            FROM creel_records
-            {where_clause}
-            {"AND" if where_clause else "WHERE"} catch_area != ''
-        """
-        cursor.execute(area_query, query_params)
-        areas_count = cursor.fetchone()[0] or 0
+            # Count distinct catch areas
+            area_query = f"""
+                SELECT COUNT(DISTINCT catch_area) 
+                FROM creel_records
+                {where_clause}
+                {"AND" if where_clause else "WHERE"} catch_area != ''
+            """
+            cursor.execute(area_query, query_params)
+            areas_count = cursor.fetchone()[0] or 0
         
-        # Calculate total catch from all species
-        total_catch = sum([
-            row[2] or 0,  # chinook
-            row[3] or 0,  # coho
-            row[4] or 0,  # chum
-            row[5] or 0,  # pink
-            row[6] or 0,  # sockeye
-        ])
+            # Calculate total catch from all species
+            total_catch = sum([
+                row[2] or 0,  # chinook
+                row[3] or 0,  # coho
+                row[4] or 0,  # chum
+                row[5] or 0,  # pink
+                row[6] or 0,  # sockeye
+            ])
         
-        return {
-            'total_catch': round(total_catch),
-            'surveys': row[0] or 0,
-            'total_records': row[0] or 0,
-            'total_anglers': round(row[1] or 0),
-            'total_chinook': round(row[2] or 0),
-            'total_coho': round(row[3] or 0),
-            'min_year': row[7] or 'N/A',
-            'max_year': row[8] or 'N/A',
-            'areas': areas_count
-        }
+            return {
+                'total_catch': round(total_catch),
+                'surveys': row[0] or 0,
+                'total_records': row[0] or 0,
+                'total_anglers': round(row[1] or 0),
+                'total_chinook': round(row[2] or 0),
+                'total_coho': round(row[3] or 0),
+                'min_year': row[7] or 'N/A',
+                'max_year': row[8] or 'N/A',
+                'areas': areas_count
+            }
+    except request_context.QueryCancelled:
+        raise
     except Exception as e:
         print(f"Error getting statistics: {e}")
         import traceback
@@ -234,12 +558,9 @@ def get_statistics(params=None):
             'max_year': None,
             'areas': 0
         }
-    finally:
-        if conn:
-            conn.close()
 
 
-def get_catch_areas(params=None):
+def get_catch_areas(params=None, conn=None):
     """
     Get list of all catch areas with their total catch
     
@@ -252,39 +573,715 @@ def get_catch_areas(params=None):
     if params is None:
         params = {}
     
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        areas = from_column_store('catch_areas', params, conn)
+        if areas is not None:
+            return areas
+
+        with connection(conn, params) as conn:
+            cursor = conn.cursor()
         
-        where_clause, query_params = build_where_clause(params)
-        species_columns = get_species_columns(params)
+            where_clause, query_params = build_where_clause(params)
+            species_columns = get_species_columns(params)
         
-        query = f"""
-            SELECT 
-                catch_area,
-                SUM({species_columns}) as total_catch
-            FROM creel_records
-            {where_clause}
-            {"AND" if where_clause else "WHERE"} catch_area != ''
-            GROUP BY catch_area
-            ORDER BY total_catch DESC
-        """
+            query = f"""
+                SELECT 
+                    catch_area,
+                    SUM({species_columns}) as total_catch
+                FROM creel_records
+                {where_clause}
+                {"AND" if where_clause else "WHERE"} catch_area != ''
+                GROUP BY catch_area
+                ORDER BY total_catch DESC
+            """
         
-        cursor.execute(query, query_params)
-        areas = cursor.fetchall()
+            cursor.execute(query, query_params)
+            areas = cursor.fetchall()
         
-        return areas
+            return areas
+    except request_context.QueryCancelled:
+        raise
     except Exception as e:
         print(f"Error getting catch areas: {e}")
         import traceback
         traceback.print_exc()
         return []
+
+
+def canonical_params(params):
+    """
+    Normalize query parameters into a hashable, order-independent key
+
+    Multi-select catch areas and months are sorted and de-duplicated so that requests
+    selecting the same areas in a different order share one key. Species
+    order is kept because it determines the column order of trend results.
+
+    Args:
+        params: Query parameters dict (as produced by parse_qs)
+
+    Returns:
+        tuple: Sorted ((name, values), ...) pairs
+    """
+    items = []
+    for name in sorted(params):
+        values = params[name] if isinstance(params[name], list) else [params[name]]
+        if name in ('catch_area', 'month'):
+            values = sorted(set(v for v in values if v))
+        items.append((name, tuple(values)))
+    return tuple(items)
+
+
+def get_filter_options(params=None, conn=None):
+    """
+    Get available filter options (years and catch areas)
+
+    They are read from the dimensions table the collector maintains, or
+    scanned from creel_records if a database doesn't have it yet.
+
+    Returns:
+        dict: {'years': [...], 'areas': [...]}
+    """
+    with connection(conn) as conn:
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT kind, value FROM dimensions ORDER BY kind, value")
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # no dimensions table yet
+        if rows:
+            return {
+                'years': [value for kind, value in rows if kind == 'year'],
+                'areas': [value for kind, value in rows if kind == 'catch_area']
+            }
+
+        # Get available years
+        cursor.execute("""
+            SELECT DISTINCT substr(sample_date, -4) as year
+            FROM creel_records
+            WHERE length(sample_date) > 0
+            ORDER BY year
+        """)
+        years = [row[0] for row in cursor.fetchall() if row[0]]
+
+        # Get catch areas
+        cursor.execute("""
+            SELECT DISTINCT catch_area
+            FROM creel_records
+            WHERE catch_area != ''
+            ORDER BY catch_area
+        """)
+        areas = [row[0] for row in cursor.fetchall()]
+
+        return {
+            'years': years,
+            'areas': areas
+        }
+
+
+def get_area_totals(params=None, conn=None):
+    """
+    Get catch areas with their total catch as a list of dicts
+
+    Returns:
+        list: [{'area': ..., 'total': ...}, ...]
+    """
+    return [{'area': area, 'total': total} for area, total in get_catch_areas(params, conn)]
+
+
+# Keys of get_yearly_data() rows
+YEARLY_COLUMNS = ['year', 'chinook', 'coho', 'chum', 'pink', 'sockeye']
+
+
+def get_yearly_data(params, conn=None):
+    """
+    Get yearly catch totals per salmon species
+
+    Args:
+        params: Query parameters dict with optional 'format' key (see
+            app/chart_formats.py)
+
+    Returns:
+        list: [{'year': ..., 'chinook': ..., ...}, ...], or a dict of
+        column lists for the columns and binary formats
+    """
+    yearly = from_column_store('yearly', params, conn)
+    if yearly is not None:
+        return chart_formats.reshape(yearly, params, YEARLY_COLUMNS)
+
+    with connection(conn, params) as conn:
+        cursor = conn.cursor()
+
+        where_clause, query_params = build_where_clause(params)
+
+        query = f"""
+            SELECT 
+                substr(sample_date, -4) as year,
+                SUM(chinook) as chinook,
+                SUM(coho) as coho,
+                SUM(chum) as chum,
+                SUM(pink) as pink,
+                SUM(sockeye) as sockeye
+            FROM creel_records
+            {where_clause}
+            {"AND" if where_clause else "WHERE"} length(sample_date) > 0
+            GROUP BY year
+            ORDER BY year
+        """
+
+        cursor.execute(query, query_params)
+        rows = cursor.fetchall()
+
+    return chart_formats.reshape([{
+        'year': row[0],
+        'chinook': row[1] or 0,
+        'coho': row[2] or 0,
+        'chum': row[3] or 0,
+        'pink': row[4] or 0,
+        'sockeye': row[5] or 0
+    } for row in rows], params, YEARLY_COLUMNS)
+
+
+# sample_date format: "Apr 1, 2013" (Mon D, YYYY)
+# We need to convert month names to numbers
+MONTH_CASE_SQL = """
+    CASE substr(sample_date, 1, 3)
+        WHEN 'Jan' THEN '01'
+        WHEN 'Feb' THEN '02'
+        WHEN 'Mar' THEN '03'
+        WHEN 'Apr' THEN '04'
+        WHEN 'May' THEN '05'
+        WHEN 'Jun' THEN '06'
+        WHEN 'Jul' THEN '07'
+        WHEN 'Aug' THEN '08'
+        WHEN 'Sep' THEN '09'
+        WHEN 'Oct' THEN '10'
+        WHEN 'Nov' THEN '11'
+        WHEN 'Dec' THEN '12'
+    END
+"""
+
+# Extract day (between first space and comma)
+DAY_EXTRACT_SQL = "substr('0' || substr(sample_date, 5, instr(sample_date, ',') - 5), -2, 2)"
+
+# Extract year (last 4 characters)
+YEAR_EXTRACT_SQL = "substr(sample_date, -4)"
+
+# Build YYYY-MM-DD date string
+DATE_STRING_SQL = f"{YEAR_EXTRACT_SQL} || '-' || {MONTH_CASE_SQL} || '-' || {DAY_EXTRACT_SQL}"
+
+
+def get_period_select(time_unit):
+    """
+    Get the SQL expression selecting the period for a time granularity
+
+    Args:
+        time_unit: 'daily', 'weekly', 'monthly' or 'yearly'
+
+    Returns:
+        str: SQL expression aliased as period
+    """
+    if time_unit == 'daily':
+        return f"{DATE_STRING_SQL} as period"
+    elif time_unit == 'weekly':
+        # Format: YYYY-Www (e.g., 2024-W01)
+        return f"strftime('%Y-W%W', {DATE_STRING_SQL}) as period"
+    elif time_unit == 'monthly':
+        # Format: YYYY-MM (e.g., 2024-01)
+        return f"{YEAR_EXTRACT_SQL} || '-' || {MONTH_CASE_SQL} as period"
+    else:  # yearly (default)
+        return f"{YEAR_EXTRACT_SQL} as period"
+
+
+def trend_query(params, species_list):
+    """
+    Build the per-period species totals query behind the trend endpoint
+
+    Args:
+        params: Query parameters dict with optional 'time_unit' key
+        species_list: Species columns to sum
+
+    Returns:
+        tuple: (SQL query, query parameters)
+    """
+    time_unit = params.get('time_unit', ['yearly'])[0]
+    where_clause, query_params = build_where_clause(params)
+
+    # Build species SELECT columns
+    species_select = ', '.join([f"SUM({s}) as {s}" for s in species_list])
+
+    query = f"""
+        SELECT 
+            {get_period_select(time_unit)},
+            {species_select}
+        FROM creel_records
+        {where_clause}
+        {"AND" if where_clause else "WHERE"} length(sample_date) > 0
+        GROUP BY period
+        ORDER BY period
+    """
+    return query, query_params
+
+
+def get_trend_data(params, conn=None):
+    """
+    Get per-species catch totals with configurable time granularity
+
+    With max_points, long series are downsampled to at most that many
+    periods, keeping each species' peaks (see app/downsample.py).
+
+    Args:
+        params: Query parameters dict with optional 'time_unit',
+            'max_points' and 'format' (see app/chart_formats.py) keys
+
+    Returns:
+        list: [{'period': ..., '<species>': ..., ...}, ...], or a dict of
+        column lists for the columns and binary formats
+    """
+    # Get list of species to display
+    species_list = get_species_list(params)
+    query, query_params = trend_query(params, species_list)
+
+    rows = from_column_store('trend', params, conn)
+    if rows is None:
+        with connection(conn, params) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, query_params)
+            rows = cursor.fetchall()
+
+        # Convert to list of dicts
+        columns = ['period'] + species_list
+        rows = [dict(zip(columns, row)) for row in rows]
+    if 'max_points' in params:
+        rows = downsample.min_max_buckets(rows, species_list, int(params['max_points'][0]))
+    return chart_formats.reshape(rows, params, ['period'] + list(dict.fromkeys(species_list)))
+
+
+def iter_trend_rows(params):
+    """
+    Stream get_trend_data's rows (without downsampling) as value tuples
+
+    Rows are fetched from the cursor a page at a time, so a long daily
+    series never exists in memory as a whole. Close the iterator when
+    done to release its connection.
+
+    Args:
+        params: Query parameters dict
+
+    Returns:
+        tuple: (columns, iterator of (period, <species>...) tuples)
+    """
+    # Keys of a duplicated species collapse in the dicts get_trend_data returns
+    species_list = list(dict.fromkeys(get_species_list(params)))
+    columns = ['period'] + species_list
+
+    rows = from_column_store('trend', params)
+    if rows is not None:
+        return columns, (tuple(row.values()) for row in rows)
+
+    query, query_params = trend_query(params, species_list)
+
+    def fetch():
+        with connection(None, params) as conn:
+            cursor = conn.execute(query, query_params)
+            try:
+                for page in iter(lambda: cursor.fetchmany(Config.RECORDS_PAGE_SIZE), []):
+                    yield from page
+            finally:
+                cursor.close()
+
+    return columns, fetch()
+
+
+def get_matrix(params, conn=None):
+    """
+    Get a dense catch area x period matrix of catch per species
+
+    All cells come from one grouped pass over the filtered rows. Values
+    are flat, row-major lists: the value for areas[i] in periods[j] is at
+    index i * len(periods) + j, and cells without surveys are 0.
+
+    Args:
+        params: Query parameters dict (filters, species, time_unit)
+
+    Returns:
+        dict: {'areas': [...], 'periods': [...], 'species': [...],
+            'values': {'<species>': [...], ...}}
+    """
+    time_unit = params.get('time_unit', ['yearly'])[0]
+    where_clause, query_params = build_where_clause(params)
+    species_list = get_species_list(params)
+    species_select = ', '.join([f"SUM({s}) as {s}" for s in species_list])
+
+    query = f"""
+        SELECT
+            catch_area,
+            {get_period_select(time_unit)},
+            {species_select}
+        FROM creel_records
+        {where_clause}
+        {"AND" if where_clause else "WHERE"} length(sample_date) > 0 AND catch_area != ''
+        GROUP BY catch_area, period
+    """
+
+    with connection(conn, params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, query_params)
+        rows = cursor.fetchall()
+
+    areas = sorted({row[0] for row in rows})
+    periods = sorted({row[1] for row in rows})
+    area_index = {area: i for i, area in enumerate(areas)}
+    period_index = {period: j for j, period in enumerate(periods)}
+
+    values = {s: [0] * (len(areas) * len(periods)) for s in species_list}
+    for row in rows:
+        cell = area_index[row[0]] * len(periods) + period_index[row[1]]
+        for k, species in enumerate(species_list):
+            values[species][cell] = row[2 + k] or 0
+
+    return {
+        'areas': areas,
+        'periods': periods,
+        'species': species_list,
+        'values': values
+    }
+
+
+def get_analytics(params, conn=None):
+    """
+    Get effort-normalized catch with rolling averages and year-over-year changes
+
+    Per period (weekly by default) of the selected species' catch: catch
+    per angler (CPUE) and per interview, the average catch and CPUE over a
+    rolling window of the last N periods with surveys, and the change from
+    the same period a year earlier. Everything comes from one query, with
+    window functions over the grouped periods.
+
+    Args:
+        params: Query parameters dict (filters, species, time_unit, and
+            'window': number of periods to average over, default 4)
+
+    Returns:
+        list: [{'period', 'anglers', 'interviews', 'catch', 'catch_per_angler',
+            'catch_per_interview', 'rolling_catch', 'rolling_catch_per_angler',
+            'last_year_catch', 'yoy_change', 'yoy_percent'}, ...]
+    """
+    time_unit = params.get('time_unit', ['weekly'])[0]
+    window = int(params.get('window', ['4'])[0])
+    where_clause, query_params = build_where_clause(params)
+    species_columns = get_species_columns(params)
+
+    # Periods start with the year, so the rest ('-W05', '-03', ...) pairs
+    # each period with the same one in other years
+    query = f"""
+        WITH periods AS (
+            SELECT
+                {get_period_select(time_unit)},
+                SUM(anglers) as anglers,
+                SUM(interviews) as interviews,
+                SUM({species_columns}) as catch
+            FROM creel_records
+            {where_clause}
+            {"AND" if where_clause else "WHERE"} length(sample_date) > 0
+            GROUP BY period
+        )
+        SELECT
+            period,
+            anglers,
+            interviews,
+            catch,
+            AVG(catch) OVER rolling as rolling_catch,
+            SUM(catch) OVER rolling / NULLIF(SUM(anglers) OVER rolling, 0) as rolling_cpue,
+            LAG(catch) OVER same_period as last_catch,
+            LAG(substr(period, 1, 4)) OVER same_period as last_year
+        FROM periods
+        WINDOW rolling AS (ORDER BY period ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW),
+               same_period AS (PARTITION BY substr(period, 5) ORDER BY period)
+        ORDER BY period
+    """
+
+    with connection(conn, params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, query_params)
+        rows = cursor.fetchall()
+
+    def ratio(numerator, denominator):
+        return round(numerator / denominator, 6) if numerator is not None and denominator else None
+
+    results = []
+    for period, anglers, interviews, catch, rolling_catch, rolling_cpue, last_catch, last_year in rows:
+        # Only compare with the period exactly one year earlier
+        if last_year is None or int(last_year) != int(period[:4]) - 1:
+            last_catch = None
+        change = catch - last_catch if catch is not None and last_catch is not None else None
+        results.append({
+            'period': period,
+            'anglers': anglers or 0,
+            'interviews': interviews or 0,
+            'catch': catch or 0,
+            'catch_per_angler': ratio(catch, anglers),
+            'catch_per_interview': ratio(catch, interviews),
+            'rolling_catch': round(rolling_catch, 6) if rolling_catch is not None else None,
+            'rolling_catch_per_angler': round(rolling_cpue, 6) if rolling_cpue is not None else None,
+            'last_year_catch': last_catch,
+            'yoy_change': change,
+            'yoy_percent': round(change / last_catch * 100, 2) if change is not None and last_catch else None
+        })
+    return results
+
+
+def get_species_totals(params, conn=None):
+    """
+    Get total catch for each selected species
+
+    Returns:
+        dict: {'<species>': total, ...}
+    """
+    totals = from_column_store('species_totals', params, conn)
+    if totals is not None:
+        return totals
+
+    where_clause, query_params = build_where_clause(params)
+    species_list = get_species_list(params)
+
+    # Build query to get totals for each species
+    species_select = ', '.join([f"SUM({s}) as {s}" for s in species_list])
+
+    query = f"""
+        SELECT {species_select}
+        FROM creel_records
+        {where_clause}
+    """
+
+    with connection(conn, params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, query_params)
+        row = cursor.fetchone()
+
+    return {species: (row[i] or 0) for i, species in enumerate(species_list)}
+
+
+def get_monthly_data(params, conn=None):
+    """
+    Get total catch per calendar month across all years
+
+    Args:
+        params: Query parameters dict with optional 'format' key (see
+            app/chart_formats.py)
+
+    Returns:
+        list: 12 entries of {'month': 1-12, 'total': ...}, or a dict of
+        column lists for the columns and binary formats
+    """
+    monthly = from_column_store('monthly', params, conn)
+    if monthly is not None:
+        return chart_formats.reshape(monthly, params, ['month', 'total'])
+
+    where_clause, query_params = build_where_clause(params)
+    species_columns = get_species_columns(params)
+
+    query = f"""
+        SELECT 
+            CASE substr(sample_date, 1, 3)
+                WHEN 'Jan' THEN 1 WHEN 'Feb' THEN 2 WHEN 'Mar' THEN 3
+                WHEN 'Apr' THEN 4 WHEN 'May' THEN 5 WHEN 'Jun' THEN 6
+                WHEN 'Jul' THEN 7 WHEN 'Aug' THEN 8 WHEN 'Sep' THEN 9
+                WHEN 'Oct' THEN 10 WHEN 'Nov' THEN 11 WHEN 'Dec' THEN 12
+            END as month,
+            SUM({species_columns}) as total_catch
+        FROM creel_records
+        {where_clause}
+        {"AND" if where_clause else "WHERE"} month IS NOT NULL
+        GROUP BY month
+        ORDER BY month
+    """
+
+    with connection(conn, params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, query_params)
+        rows = cursor.fetchall()
+
+    # Fill all 12 months (some may have no data)
+    monthly_totals = [0] * 12
+    for row in rows:
+        month = row[0]
+        if month and 1 <= month <= 12:
+            monthly_totals[month - 1] = row[1] or 0
+
+    # Return all 12 months with 'month' and 'total' keys
+    return chart_formats.reshape([{'month': i + 1, 'total': monthly_totals[i]} for i in range(12)],
+                                 params, ['month', 'total'])
+
+
+def get_map_data(params, conn=None):
+    """
+    Get per-area totals and survey counts for the map
+
+    Returns:
+        list: [{'area': ..., 'total': ..., 'surveys': ...}, ...]
+    """
+    map_data = from_column_store('map_data', params, conn)
+    if map_data is not None:
+        return map_data
+
+    where_clause, query_params = build_where_clause(params)
+    species_columns = get_species_columns(params)
+
+    query = f"""
+        SELECT 
+            catch_area,
+            SUM({species_columns}) as total,
+            COUNT(*) as surveys
+        FROM creel_records
+        {where_clause}
+        {"AND" if where_clause else "WHERE"} catch_area != ''
+        GROUP BY catch_area
+    """
+
+    with connection(conn, params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, query_params)
+        rows = cursor.fetchall()
+
+    # Convert to array of objects (matching old format)
+    return [{'area': row[0], 'total': row[1] or 0, 'surveys': row[2] or 0} for row in rows]
+
+
+# Fields of each row yielded by iter_records
+RECORD_FIELDS = [
+    'id', 'sample_day', 'sample_date', 'ramp_site', 'catch_area', 'interviews', 'anglers',
+    'chinook', 'chinook_per_angler', 'coho', 'chum', 'pink', 'sockeye', 'lingcod', 'halibut'
+]
+
+
+def refresh_dimensions(conn, years=None, catch_areas=None):
+    """
+    Recompute the dimensions table of years and catch areas
+
+    Each row holds a filter value with its record count and first and
+    last sample day ('YYYY-MM-DD'). The collector refreshes the years and
+    catch areas of the rows it changed; a table that doesn't exist yet is
+    always built in full. The caller commits.
+
+    Args:
+        conn: Database connection
+        years: Years ('YYYY') to recompute, or None for all of them
+        catch_areas: Catch areas to recompute, or None for all of them
+    """
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dimensions'").fetchone():
+        conn.execute("""
+            CREATE TABLE dimensions (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                row_count INTEGER,
+                first_day TEXT,
+                last_day TEXT,
+                PRIMARY KEY (kind, value)
+            )
+        """)
+        years = catch_areas = None
+
+    for kind, column, values, condition in (
+            ('year', YEAR_EXTRACT_SQL, years, "length(sample_date) > 0"),
+            ('catch_area', 'catch_area', catch_areas, "catch_area != ''")):
+        query_params = [kind]
+        if values is None:
+            conn.execute("DELETE FROM dimensions WHERE kind = ?", (kind,))
+        else:
+            values = sorted(v for v in values if v)
+            if not values:
+                continue
+            placeholders = ','.join(['?'] * len(values))
+            conn.execute(f"DELETE FROM dimensions WHERE kind = ? AND value IN ({placeholders})",
+                         [kind] + values)
+            condition += f" AND {column} IN ({placeholders})"
+            query_params += values
+
+        conn.execute(f"""
+            INSERT INTO dimensions (kind, value, row_count, first_day, last_day)
+            SELECT ?, {column}, COUNT(*), MIN({DATE_STRING_SQL}), MAX({DATE_STRING_SQL})
+            FROM creel_records
+            WHERE {condition}
+            GROUP BY {column}
+        """, query_params)
+
+
+def ensure_schema():
+    """
+    Create indices and tables the server relies on that older databases may lack
+
+    idx_sample_day_id orders records by ISO sample day, then id, so
+    iter_records can seek straight to the next page. The dimensions table
+    is built once here for databases written before the collector
+    maintained it.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_sample_day_id ON creel_records({DATE_STRING_SQL}, id)")
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dimensions'").fetchone():
+            refresh_dimensions(conn)
+        conn.commit()
+    except Exception as e:
+        print(f"Warning: Could not create record indices: {e}")
     finally:
         if conn:
             conn.close()
 
 
+def iter_records(params, after=None, limit=None):
+    """
+    Stream raw records in (sample day, id) order
+
+    Records are read with keyset pagination: each page of
+    Config.RECORDS_PAGE_SIZE rows is a fresh index seek past the last
+    (sample_day, id) returned, so memory stays flat and no read
+    transaction is held while the caller writes rows out.
+
+    Args:
+        params: Query parameters dict (year and catch area filters)
+        after: Optional (sample_day, id) of the last record already seen
+        limit: Optional maximum number of records
+
+    Yields:
+        tuple: Values in RECORD_FIELDS order
+    """
+    where_clause, query_params = build_where_clause(params)
+    columns = ', '.join(f"{DATE_STRING_SQL} as sample_day" if field == 'sample_day' else field
+                        for field in RECORD_FIELDS)
+
+    # Spelled out rather than as a row value so SQLite seeks the index
+    query = f"""
+        SELECT {columns}
+        FROM creel_records INDEXED BY idx_sample_day_id
+        {where_clause}
+        {"AND" if where_clause else "WHERE"} {DATE_STRING_SQL} >= ?
+        AND ({DATE_STRING_SQL} > ? OR id > ?)
+        ORDER BY {DATE_STRING_SQL}, id
+        LIMIT ?
+    """
+
+    last_day, last_id = after or ('', 0)
+    remaining = limit
+    conn = get_db_connection()
+    try:
+        while remaining is None or remaining > 0:
+            page_size = Config.RECORDS_PAGE_SIZE if remaining is None else min(remaining, Config.RECORDS_PAGE_SIZE)
+            cursor = conn.execute(query, query_params + [last_day, last_day, last_id, page_size])
+            rows = cursor.fetchall()
+            cursor.close()
+
+            yield from rows
+            if len(rows) < page_size:
+                break
+            last_id, last_day = rows[-1][0], rows[-1][1]
+            if remaining is not None:
+                remaining -= len(rows)
+    finally:
+        conn.close()
+
+
 def database_exists():
     """Check if database file exists"""
     return os.path.exists(Config.DB_PATH)
@@ -0,0 +1,44 @@
+"""
+Shape-preserving downsampling of trend series
+
+Min/max bucketing: the interior of the series is split into buckets of
+consecutive points, and from each bucket the points holding each
+series' maximum and the lowest combined total are kept, along with the
+first and last points. Kept points are original rows (real periods and
+values), so every series' peaks survive exactly and troughs stay
+visible.
+"""
+
+
+def min_max_buckets(rows, series, max_points):
+    """
+    Reduce rows to at most max_points while keeping each series' peaks
+
+    Args:
+        rows: Ordered list of dicts (e.g. trend rows)
+        series: Keys of the numeric values to preserve
+        max_points: Maximum number of rows to return (at least
+            len(series) + 3)
+
+    Returns:
+        list: Subset of rows in their original order
+    """
+    if len(rows) <= max_points:
+        return rows
+
+    # Each bucket keeps up to one point per series plus one minimum
+    per_bucket = len(series) + 1
+    bucket_count = max(1, (max_points - 2) // per_bucket)
+
+    last = len(rows) - 1
+    bucket_size = (last - 1) / bucket_count
+    keep = {0, last}
+    for b in range(bucket_count):
+        bucket = range(1 + int(b * bucket_size), 1 + int((b + 1) * bucket_size))
+        if not bucket:
+            continue
+        for name in series:
+            keep.add(max(bucket, key=lambda i: rows[i][name] or 0))
+        keep.add(min(bucket, key=lambda i: sum(rows[i][name] or 0 for name in series)))
+
+    return [rows[i] for i in sorted(keep)]
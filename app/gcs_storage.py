@@ -1,8 +1,12 @@
 """
 Google Cloud Storage operations for database persistence
 """
+import gzip
+import json
 import os
 
+from .partitions import MANIFEST, file_sha256
+
 try:
     from google.cloud import storage
     GCS_AVAILABLE = True
@@ -57,3 +61,139 @@ def upload_database_to_gcs(bucket_name, db_path):
     except Exception as e:
         print(f"⚠️  Could not upload database to GCS: {e}")
         return False
+
+
+PARTITION_PREFIX = "partitions/"
+
+
+def _partition_blob_name(entry):
+    """Blob name of a season partition, unique to its contents"""
+    return f"{PARTITION_PREFIX}{entry['file']}.{entry['sha256'][:16]}.gz"
+
+
+def _partition_entries(manifest):
+    """Manifest entries of the season partitions and the base"""
+    entries = list(manifest['partitions'].values())
+    if 'base' in manifest:
+        entries.append(manifest['base'])
+    return entries
+
+
+def upload_partitions(bucket_name, directory):
+    """
+    Upload season partitions and the base (gzipped) and their manifest to
+    Google Cloud Storage
+
+    Blob names include each file's checksum, so a historical season that
+    hasn't changed is already in the bucket and isn't uploaded again.
+    """
+    if not GCS_AVAILABLE or not bucket_name:
+        return False
+
+    manifest_path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return False
+
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        storage_client = storage.Client()
+        bucket = storage_client.bucket(bucket_name)
+
+        entries = _partition_entries(manifest)
+        uploaded = 0
+        for entry in entries:
+            blob = bucket.blob(_partition_blob_name(entry))
+            if blob.exists():
+                continue
+            with open(os.path.join(directory, entry['file']), 'rb') as f:
+                blob.upload_from_string(gzip.compress(f.read()), content_type='application/gzip')
+            uploaded += 1
+
+        bucket.blob(PARTITION_PREFIX + MANIFEST).upload_from_filename(manifest_path)
+        print(f"✅ Uploaded {uploaded} partition files "
+              f"({len(entries) - uploaded} already in gs://{bucket_name})")
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not upload season partitions to GCS: {e}")
+        return False
+
+
+def download_partitions(bucket_name, directory):
+    """Download season partitions that are missing locally or differ from GCS"""
+    if not GCS_AVAILABLE or not bucket_name:
+        return False
+
+    try:
+        storage_client = storage.Client()
+        bucket = storage_client.bucket(bucket_name)
+        manifest_blob = bucket.blob(PARTITION_PREFIX + MANIFEST)
+        if not manifest_blob.exists():
+            print(f"ℹ️  No season partitions found in GCS bucket")
+            return False
+
+        manifest = json.loads(manifest_blob.download_as_bytes())
+        os.makedirs(directory, exist_ok=True)
+        downloaded = 0
+        for entry in _partition_entries(manifest):
+            path = os.path.join(directory, entry['file'])
+            if os.path.exists(path) and file_sha256(path) == entry['sha256']:
+                continue
+            data = gzip.decompress(bucket.blob(_partition_blob_name(entry)).download_as_bytes())
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+            downloaded += 1
+
+        manifest_path = os.path.join(directory, MANIFEST)
+        with open(f"{manifest_path}.tmp", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        print(f"✅ Downloaded {downloaded} partition files from gs://{bucket_name}")
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not download season partitions from GCS: {e}")
+        return False
+
+
+WARM_CACHE_BLOB = "warm_cache.json.gz"
+
+
+def upload_warm_cache(bucket_name, path):
+    """Upload the persisted popular query results (see app/warm_cache.py)"""
+    if not GCS_AVAILABLE or not bucket_name or not os.path.exists(path):
+        return False
+
+    try:
+        storage_client = storage.Client()
+        bucket = storage_client.bucket(bucket_name)
+        bucket.blob(WARM_CACHE_BLOB).upload_from_filename(path, content_type='application/gzip')
+        print(f"✅ Uploaded warm query cache to gs://{bucket_name}/{WARM_CACHE_BLOB}")
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not upload warm query cache to GCS: {e}")
+        return False
+
+
+def download_warm_cache(bucket_name, path):
+    """Download the persisted popular query results, if there are any"""
+    if not GCS_AVAILABLE or not bucket_name:
+        return False
+
+    try:
+        storage_client = storage.Client()
+        bucket = storage_client.bucket(bucket_name)
+        blob = bucket.blob(WARM_CACHE_BLOB)
+        if not blob.exists():
+            print(f"ℹ️  No warm query cache found in GCS bucket")
+            return False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        blob.download_to_filename(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        print(f"✅ Downloaded warm query cache from gs://{bucket_name}")
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not download warm query cache from GCS: {e}")
+        return False
@@ -0,0 +1,308 @@
+"""
+Zoom-tiered marine area geometry
+
+build_map_geometry.py simplifies the WDFW marine area polygons and the
+hand-traced custom areas at several tolerances (Douglas-Peucker), then
+quantizes and delta-encodes the coordinates as TopoJSON and stores each
+tier gzipped. The server picks the tier for a zoom level and splices the
+current filter's per-area totals in front of the stored geometry, reusing
+its precompressed bytes instead of compressing it again per request.
+"""
+import gzip
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+from .config import Config
+
+
+# (max zoom, tolerance in degrees): roughly half a screen pixel at max zoom
+TIERS = [
+    (8, 0.0025),
+    (10, 0.0006),
+    (12, 0.00015),
+    (None, 0.00004),
+]
+
+# Quantization grid: ~3 m steps across Puget Sound and the coast
+QUANTIZATION = 100000
+
+MANIFEST = 'index.json'
+
+
+def simplify_ring(points, tolerance):
+    """
+    Douglas-Peucker simplification of a closed ring
+
+    Returns:
+        list: Simplified ring (still closed), or None if it collapses
+    """
+    if len(points) < 4:
+        return None
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+
+    # The first and last points of a ring coincide, so split at the point
+    # farthest from the start to have two proper polylines
+    x0, y0 = points[0]
+    far = max(range(1, len(points) - 1),
+              key=lambda i: (points[i][0] - x0) ** 2 + (points[i][1] - y0) ** 2)
+    keep[far] = True
+
+    stack = [(0, far), (far, len(points) - 1)]
+    tolerance_sq = tolerance * tolerance
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        (ax, ay), (bx, by) = points[start], points[end]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        worst, worst_index = -1.0, None
+        for i in range(start + 1, end):
+            px, py = points[i]
+            if length_sq == 0:
+                distance_sq = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                cross = dx * (py - ay) - dy * (px - ax)
+                distance_sq = cross * cross / length_sq
+            if distance_sq > worst:
+                worst, worst_index = distance_sq, i
+        if worst > tolerance_sq:
+            keep[worst_index] = True
+            stack.append((start, worst_index))
+            stack.append((worst_index, end))
+
+    ring = [p for p, kept in zip(points, keep) if kept]
+    return ring if len(ring) >= 4 else None
+
+
+def simplify_polygon(rings, tolerance):
+    """Simplify a polygon's rings, dropping holes that collapse"""
+    simplified = []
+    for index, ring in enumerate(rings):
+        result = simplify_ring(ring, tolerance)
+        if result is None:
+            if index > 0:
+                continue
+            result = ring  # never lose the outer ring of a small area
+        simplified.append(result)
+    return simplified
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+def build_topology(features, tolerance):
+    """
+    Simplify features and encode them as a quantized TopoJSON topology
+
+    Every ring is its own arc, delta-encoded on the quantization grid.
+    Each geometry's properties keep the fields used to match it to catch
+    areas: 'name' and 'number' (WDFW maName/maNumber), 'custom', and WAC.
+
+    Args:
+        features: GeoJSON features with Polygon or MultiPolygon geometry
+        tolerance: Douglas-Peucker tolerance in degrees
+
+    Returns:
+        dict: TopoJSON topology with one 'areas' GeometryCollection
+    """
+    simplified = []
+    for feature in features:
+        polygons = [simplify_polygon(rings, tolerance) for rings in _polygons(feature['geometry'])]
+        simplified.append((feature, polygons))
+
+    xs = [x for _, polygons in simplified for rings in polygons for ring in rings for x, _ in ring]
+    ys = [y for _, polygons in simplified for rings in polygons for ring in rings for _, y in ring]
+    x0, y0 = min(xs), min(ys)
+    sx = (max(xs) - x0) / (QUANTIZATION - 1) or 1
+    sy = (max(ys) - y0) / (QUANTIZATION - 1) or 1
+
+    arcs = []
+    geometries = []
+    for feature, polygons in simplified:
+        encoded_polygons = []
+        for rings in polygons:
+            encoded_rings = []
+            for ring in rings:
+                arc = []
+                last_x = last_y = 0
+                for x, y in ring:
+                    qx, qy = int(round((x - x0) / sx)), int(round((y - y0) / sy))
+                    if arc and qx == last_x and qy == last_y:
+                        continue
+                    arc.append([qx - last_x, qy - last_y])
+                    last_x, last_y = qx, qy
+                encoded_rings.append([len(arcs)])
+                arcs.append(arc)
+            encoded_polygons.append(encoded_rings)
+
+        properties = feature.get('properties') or {}
+        geometry = {
+            'type': 'Polygon' if len(encoded_polygons) == 1 else 'MultiPolygon',
+            'arcs': encoded_polygons[0] if len(encoded_polygons) == 1 else encoded_polygons,
+            'properties': {
+                'name': properties.get('maName') or properties.get('name'),
+                'number': properties.get('maNumber'),
+                'custom': bool(properties.get('custom')),
+                'WAC': properties.get('WAC'),
+            },
+        }
+        geometries.append(geometry)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': [sx, sy], 'translate': [x0, y0]},
+        'objects': {'areas': {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': arcs,
+    }
+
+
+def write_tiers(features, directory):
+    """
+    Build every tier and store it gzipped, with a manifest
+
+    Returns:
+        list: Manifest entries ({'max_zoom', 'tolerance', 'file', 'bytes', 'gzip_bytes'})
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = []
+    for max_zoom, tolerance in TIERS:
+        topology = build_topology(features, tolerance)
+        raw = json.dumps(topology, separators=(',', ':')).encode()
+        filename = f"tier_{max_zoom if max_zoom is not None else 'max'}.topo.json.gz"
+        with open(os.path.join(directory, filename), 'wb') as f:
+            # mtime=0 keeps rebuilt files byte-identical
+            f.write(gzip.compress(raw, 9, mtime=0))
+        manifest.append({
+            'max_zoom': max_zoom,
+            'tolerance': tolerance,
+            'file': filename,
+            'bytes': len(raw),
+            'gzip_bytes': os.path.getsize(os.path.join(directory, filename)),
+        })
+
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class Tier:
+    """One stored tier, held raw and as a reusable raw-deflate segment"""
+
+    def __init__(self, max_zoom, raw):
+        self.max_zoom = max_zoom
+        self.raw = raw
+        self.areas = [g['properties'] for g in json.loads(raw)['objects']['areas']['geometries']]
+        # Byte-aligned, non-final deflate blocks (sync flush) can be
+        # placed between other deflate blocks in a single gzip stream
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        self.deflated = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+_tiers = None
+_tiers_mtime = None
+_tiers_lock = threading.Lock()
+
+
+def get_tiers():
+    """
+    Load the stored tiers (reloaded when the manifest changes)
+
+    Returns:
+        list: Tier objects sorted by max zoom (None last), or [] if the
+        geometry hasn't been built
+    """
+    global _tiers, _tiers_mtime
+    manifest_path = os.path.join(Config.MAP_GEOMETRY_DIR, MANIFEST)
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        return []
+
+    with _tiers_lock:
+        if _tiers is None or mtime != _tiers_mtime:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            tiers = []
+            for entry in manifest:
+                with gzip.open(os.path.join(Config.MAP_GEOMETRY_DIR, entry['file'])) as f:
+                    tiers.append(Tier(entry['max_zoom'], f.read()))
+            tiers.sort(key=lambda t: float('inf') if t.max_zoom is None else t.max_zoom)
+            _tiers, _tiers_mtime = tiers, mtime
+        return _tiers
+
+
+def tier_for_zoom(tiers, zoom):
+    """Pick the coarsest tier that is still detailed enough for zoom"""
+    for tier in tiers:
+        if tier.max_zoom is None or zoom <= tier.max_zoom:
+            return tier
+    return tiers[-1]
+
+
+def attach_totals(tier, map_data):
+    """
+    Match each of the tier's areas to its catch area totals
+
+    WDFW areas match on maName, or else on the "Area N," prefix of the
+    catch area name; custom areas match on their name.
+
+    Args:
+        tier: Tier to match
+        map_data: get_map_data() rows
+
+    Returns:
+        list: [catch_area or None, total, surveys] per area, in tier order
+    """
+    by_name = {row['area']: row for row in map_data}
+    totals = []
+    for area in tier.areas:
+        row = by_name.get(area['name'])
+        if row is None and area['number'] and not area['custom']:
+            prefix = f"Area {area['number']},"
+            row = next((r for name, r in by_name.items() if name.startswith(prefix)), None)
+        if row is None:
+            totals.append([None, 0, 0])
+        else:
+            totals.append([row['area'], row['total'], row['surveys']])
+    return totals
+
+
+def render(tier, totals, compress):
+    """
+    Build the response body: the tier's topology with totals attached
+
+    With compress, the body is a gzip stream whose middle is the tier's
+    stored deflate segment; only the small prefix and suffix are
+    compressed per request.
+
+    Returns:
+        bytes: JSON body (gzip-encoded if compress)
+    """
+    prefix = json.dumps({'max_zoom': tier.max_zoom, 'totals': totals})[:-1].encode() + b',"topology":'
+    suffix = b'}'
+    if not compress:
+        return prefix + tier.raw + suffix
+
+    head = zlib.compressobj(6, zlib.DEFLATED, -15)
+    tail = zlib.compressobj(6, zlib.DEFLATED, -15)
+    crc = zlib.crc32(suffix, zlib.crc32(tier.raw, zlib.crc32(prefix)))
+    length = len(prefix) + len(tier.raw) + len(suffix)
+    return b''.join([
+        b'\x1f\x8b\x08\x00' + struct.pack('<I', int(time.time())) + b'\x00\xff',
+        head.compress(prefix), head.flush(zlib.Z_SYNC_FLUSH),
+        tier.deflated,
+        tail.compress(suffix), tail.flush(zlib.Z_FINISH),
+        struct.pack('<II', crc & 0xffffffff, length & 0xffffffff),
+    ])
@@ -0,0 +1,87 @@
+"""
+Streaming JSON encoding of query rows
+
+json.dumps() of a list of row dicts needs every dict, the whole string
+and then its encoded bytes in memory at once, and nothing can be sent
+until all of it exists. RowEncoder instead renders each row through a
+template whose keys are encoded once, and iter_json_array() yields the
+array in chunks of a few kilobytes as rows arrive from the cursor. The
+output is byte for byte what json.dumps() produces for the same dicts.
+"""
+import json
+from json.encoder import encode_basestring_ascii
+
+
+# Bytes collected before a chunk is handed to the writer
+CHUNK_BYTES = 16 * 1024
+
+INFINITY = float('inf')
+
+
+def _encode_float(value):
+    # Same spelling as json.dumps (allow_nan=True)
+    if value != value:
+        return 'NaN'
+    if value == INFINITY:
+        return 'Infinity'
+    if value == -INFINITY:
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+_ENCODERS = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    float: _encode_float,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+}
+
+
+def encode_value(value):
+    """Encode a scalar as json.dumps would"""
+    encoder = _ENCODERS.get(type(value))
+    return encoder(value) if encoder is not None else json.dumps(value)
+
+
+class RowEncoder:
+    """Encode value tuples as JSON objects with a fixed list of keys"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        # Keys are encoded once; '%' in a key must not be taken for a placeholder
+        self.template = '{' + ', '.join(
+            json.dumps(column).replace('%', '%%') + ': %s' for column in self.columns) + '}'
+
+    def encode(self, row):
+        """Encode one row (values in column order) as a str"""
+        return self.template % tuple(map(encode_value, row))
+
+
+def iter_json_array(rows, encoder, chunk_bytes=CHUNK_BYTES):
+    """
+    Encode rows as a JSON array, in chunks
+
+    Args:
+        rows: Iterable of value tuples in the encoder's column order
+        encoder: RowEncoder
+        chunk_bytes: Approximate size of each chunk
+
+    Yields:
+        bytes: Consecutive pieces of the array
+    """
+    parts = ['[']
+    size = 1
+    separator = ''
+    for row in rows:
+        text = encoder.encode(row)
+        parts.append(separator)
+        parts.append(text)
+        separator = ', '
+        size += len(text) + 2
+        if size >= chunk_bytes:
+            yield ''.join(parts).encode()
+            parts = []
+            size = 0
+    parts.append(']')
+    yield ''.join(parts).encode()
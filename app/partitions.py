@@ -0,0 +1,350 @@
+"""
+Year-partitioned copies of creel_records
+
+Past seasons practically never change, yet every year-filtered query
+scans all of them. After each ingest the collector copies each season's
+rows into its own small SQLite file (with the usual indices):
+
+    <PARTITION_DIR>/season_<year>.db
+    <PARTITION_DIR>/base.db           everything else: the schema, the
+                                      other tables and any record without
+                                      a season
+    <PARTITION_DIR>/manifest.json     data version, and rows, file and
+                                      sha256 of each season and the base
+
+Only seasons with changed rows (and the current season) are written
+again; historical files are otherwise kept as they are, so their
+checksums stay stable and they are uploaded to GCS only once. Together
+the files hold the whole database, so it is persisted as partitions and
+rebuilt from them (restore_database) rather than uploaded in full.
+
+For a query restricted to a few seasons, connection() attaches just those
+files and puts a temporary creel_records view (UNION ALL of the attached
+seasons) in front of them, so the existing SQL runs unchanged while
+touching only the relevant partitions. Everything else, and any database
+whose partitions are missing or from another data version, is served
+from the full creel_data.db.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+
+from .config import Config
+
+
+MANIFEST = 'manifest.json'
+BASE = 'base.db'
+
+# Season of a row: the last four characters of sample_date ("Apr 1, 2013")
+SEASON_SQL = "substr(sample_date, -4)"
+
+PARTITION_INDICES = [
+    'CREATE INDEX idx_sample_date ON creel_records(sample_date)',
+    'CREATE INDEX idx_catch_area ON creel_records(catch_area)',
+]
+
+
+def partition_file(year):
+    return f"season_{year}.db"
+
+
+def read_manifest(directory=None):
+    """Read the partition manifest, or None if partitions haven't been built"""
+    try:
+        with open(os.path.join(directory or Config.PARTITION_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_build_lock = threading.Lock()
+
+
+def write_partitions(db_path, directory, version, changed_years=None):
+    """
+    Write the season partitions (and the base) for a dataset version
+
+    Args:
+        db_path: Database to partition
+        directory: Partition directory of that database
+        version: Dataset version the database is at
+        changed_years: Years ('YYYY') of inserted or updated rows, or None
+            to write every season. The current season is always written.
+
+    Returns:
+        tuple: (seasons written, seasons kept)
+    """
+    with _build_lock:
+        os.makedirs(directory, exist_ok=True)
+        previous = read_manifest(directory)
+        incremental = (previous is not None and previous.get('version') == version - 1
+                       and changed_years is not None)
+        current_year = str(datetime.now().year)
+
+        conn = sqlite3.connect(db_path)
+        try:
+            seasons = [row[0] for row in conn.execute(f"""
+                SELECT DISTINCT {SEASON_SQL} FROM creel_records
+                WHERE {SEASON_SQL} GLOB '[0-9][0-9][0-9][0-9]'
+                ORDER BY 1
+            """)]
+
+            partitions = {}
+            written = kept = 0
+            for year in seasons:
+                path = os.path.join(directory, partition_file(year))
+                entry = previous['partitions'].get(year) if incremental else None
+                if (entry is not None and year != current_year and year not in changed_years
+                        and os.path.exists(path)):
+                    partitions[year] = entry
+                    kept += 1
+                    continue
+
+                tmp_path = f"{path}.tmp"
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                conn.execute("ATTACH DATABASE ? AS season", (tmp_path,))
+                try:
+                    conn.execute(f"CREATE TABLE season.creel_records AS SELECT * FROM main.creel_records "
+                                 f"WHERE {SEASON_SQL} = ? ORDER BY id", (year,))
+                    for statement in PARTITION_INDICES:
+                        conn.execute(statement.replace('INDEX ', 'INDEX season.', 1))
+                    rows = conn.execute("SELECT COUNT(*) FROM season.creel_records").fetchone()[0]
+                    conn.commit()
+                finally:
+                    conn.execute("DETACH DATABASE season")
+                os.replace(tmp_path, path)
+
+                partitions[year] = {
+                    'file': partition_file(year),
+                    'rows': rows,
+                    'sha256': file_sha256(path),
+                    'immutable': year < current_year,
+                }
+                written += 1
+        finally:
+            conn.close()
+
+        manifest = {'version': version, 'created_at': datetime.now().isoformat(), 'partitions': partitions,
+                    'base': _write_base(db_path, directory)}
+        _write_manifest(directory, manifest)
+
+        # Seasons that no longer have rows
+        for name in os.listdir(directory):
+            match = re.fullmatch(r'season_(\d{4})\.db', name)
+            if match and match.group(1) not in partitions:
+                os.remove(os.path.join(directory, name))
+
+        return written, kept
+
+
+def _write_manifest(directory, manifest):
+    manifest_path = os.path.join(directory, MANIFEST)
+    with open(f"{manifest_path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    _forget_manifest()
+
+
+def _write_base(db_path, directory):
+    """
+    Copy everything but the seasons' records into BASE
+
+    Returns:
+        dict: Manifest entry of the base
+    """
+    path = os.path.join(directory, BASE)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (os.path.abspath(db_path),))
+        schema = conn.execute("""
+            SELECT type, name, sql FROM source.sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY type = 'index'
+        """).fetchall()
+        for _, _, sql in schema:
+            conn.execute(sql)
+        for kind, name, _ in schema:
+            if kind != 'table':
+                continue
+            where = f"WHERE NOT {SEASON_SQL} GLOB '[0-9][0-9][0-9][0-9]' OR sample_date IS NULL" \
+                if name == 'creel_records' else ''
+            conn.execute(f'INSERT INTO main."{name}" SELECT * FROM source."{name}" {where}')
+        if conn.execute("SELECT 1 FROM source.sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+            # Replaces the counters the inserts above started
+            conn.execute("DELETE FROM main.sqlite_sequence")
+            conn.execute("INSERT INTO main.sqlite_sequence SELECT * FROM source.sqlite_sequence")
+        conn.commit()
+        conn.execute("DETACH DATABASE source")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return {'file': BASE, 'sha256': file_sha256(path)}
+
+
+def refresh_base(db_path, directory):
+    """
+    Write the base again, e.g. after metadata changed since the partitions
+    were written (the last update time is recorded after the collector runs)
+
+    Returns:
+        bool: Whether partitions exist to refresh the base of
+    """
+    with _build_lock:
+        manifest = read_manifest(directory)
+        if manifest is None:
+            return False
+        manifest['base'] = _write_base(db_path, directory)
+        _write_manifest(directory, manifest)
+        return True
+
+
+def restore_database(directory, db_path):
+    """
+    Rebuild a database from its partitions and base
+
+    Args:
+        directory: Partition directory (complete, e.g. downloaded from GCS)
+        db_path: Database file to write
+
+    Returns:
+        bool: Whether it was restored (False if there is no base)
+    """
+    manifest = read_manifest(directory)
+    if manifest is None or 'base' not in manifest:
+        return False
+
+    tmp_path = f"{db_path}.restore"
+    shutil.copyfile(os.path.join(directory, manifest['base']['file']), tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # Bulk insert without the secondary indices, then index once
+        indices = conn.execute("""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND tbl_name = 'creel_records' AND sql IS NOT NULL
+        """).fetchall()
+        for name, _ in indices:
+            conn.execute(f'DROP INDEX "{name}"')
+        for year in sorted(manifest['partitions']):
+            path = os.path.join(directory, manifest['partitions'][year]['file'])
+            conn.execute("ATTACH DATABASE ? AS season", (os.path.abspath(path),))
+            try:
+                conn.execute("INSERT INTO creel_records SELECT * FROM season.creel_records ORDER BY id")
+                conn.commit()
+            finally:
+                conn.execute("DETACH DATABASE season")
+        for _, sql in indices:
+            conn.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return True
+
+
+def ensure_built(version):
+    """Write the partitions in the background if they are missing or outdated"""
+    manifest = read_manifest()
+    if manifest is not None and manifest.get('version') == version and 'base' in manifest:
+        return
+
+    def build():
+        try:
+            written, _ = write_partitions(Config.DB_PATH, Config.PARTITION_DIR, version)
+            print(f"🗂️  Wrote {written} season partitions for data version {version}")
+        except Exception as e:
+            print(f"Warning: Could not write season partitions: {e}")
+
+    threading.Thread(target=build, name='partition-build', daemon=True).start()
+
+
+# (manifest file mtime, manifest) of the last read
+_manifest = (None, None)
+_manifest_lock = threading.Lock()
+
+
+def _forget_manifest():
+    global _manifest
+    with _manifest_lock:
+        _manifest = (None, None)
+
+
+def _get_manifest():
+    global _manifest
+    try:
+        mtime = os.stat(os.path.join(Config.PARTITION_DIR, MANIFEST)).st_mtime_ns
+    except OSError:
+        return None
+    with _manifest_lock:
+        if _manifest[0] != mtime:
+            _manifest = (mtime, read_manifest())
+        return _manifest[1]
+
+
+def seasons_for(params, version):
+    """
+    Choose the partitions a query can be answered from
+
+    Args:
+        params: Query parameters dict (only the year range matters)
+        version: Current dataset version
+
+    Returns:
+        list: Partition file paths, or None if the query should use the
+        full database (no year filter, too many seasons, or partitions
+        missing or built from another data version)
+    """
+    if not params or ('year_start' not in params and 'year_end' not in params):
+        return None
+    manifest = _get_manifest()
+    if manifest is None or manifest.get('version') != version:
+        return None
+
+    def bound(name):
+        value = params.get(name)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        return value or None
+
+    year_start, year_end = bound('year_start'), bound('year_end')
+    years = [year for year in manifest['partitions']
+             if (year_start is None or year >= year_start) and (year_end is None or year <= year_end)]
+    if len(years) > Config.PARTITION_MAX_ATTACHED:
+        return None
+    return [os.path.join(Config.PARTITION_DIR, manifest['partitions'][year]['file']) for year in sorted(years)]
+
+
+def attach(conn, paths):
+    """
+    Attach season partitions read-only behind a temporary creel_records view
+
+    Args:
+        conn: Connection to an in-memory database
+        paths: Partition files from seasons_for()
+    """
+    selects = []
+    for i, path in enumerate(paths):
+        uri = 'file:' + os.path.abspath(path) + '?mode=ro'
+        conn.execute(f"ATTACH DATABASE ? AS season_{i}", (uri,))
+        selects.append(f"SELECT * FROM season_{i}.creel_records")
+    if not selects:
+        # No season in range: an empty relation with the same columns
+        conn.execute(f"ATTACH DATABASE ? AS season_0", ('file:' + os.path.abspath(Config.DB_PATH) + '?mode=ro',))
+        selects.append("SELECT * FROM season_0.creel_records WHERE 0")
+    conn.execute(f"CREATE TEMP VIEW creel_records AS {' UNION ALL '.join(selects)}")
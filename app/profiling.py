@@ -0,0 +1,122 @@
+"""
+On-demand and sampled per-request profiling
+
+A request to any /api/* route with ?profile=1 and a valid X-Debug-Token
+header runs under cProfile. A fraction of live /api/* traffic can also be
+profiled continuously via Config.PROFILE_SAMPLE_RATE. Results (top
+functions by cumulative time plus the request's SQLite time) are kept in
+a ring buffer viewable at /debug/profiles.
+"""
+import cProfile
+import hmac
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from .config import Config
+from . import metrics
+
+
+PROFILES = metrics.counter(
+    'creel_profiles_total', 'Requests run under the profiler', ['endpoint', 'trigger'])
+
+_profiles = deque(maxlen=Config.PROFILE_LOG_SIZE)
+_profiles_lock = threading.Lock()
+
+# Only one profiler can be active at a time (cProfile is process-wide on 3.12+)
+_profiler_lock = threading.Lock()
+
+
+def authorized(headers):
+    """Check the X-Debug-Token header against Config.DEBUG_TOKEN"""
+    token = headers.get('X-Debug-Token')
+    return bool(Config.DEBUG_TOKEN and token and hmac.compare_digest(token, Config.DEBUG_TOKEN))
+
+
+def trigger_for(path, params, headers):
+    """
+    Decide whether a request should be profiled
+
+    Removes the 'profile' flag from params so it does not reach handlers.
+
+    Returns:
+        str: 'on_demand', 'sampled' or None
+    """
+    if not path.startswith('/api/'):
+        return None
+
+    requested = params.pop('profile', None)
+    if requested and requested[0] not in ('0', 'false') and authorized(headers):
+        return 'on_demand'
+
+    if Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def run(context, path, trigger, handler):
+    """
+    Run handler() under cProfile and store the result
+
+    If another request is already being profiled, sampled requests run
+    unprofiled and on-demand requests wait briefly for the profiler.
+    """
+    if trigger == 'on_demand':
+        acquired = _profiler_lock.acquire(timeout=5)
+    else:
+        acquired = _profiler_lock.acquire(blocking=False)
+    if not acquired:
+        handler()
+        return
+
+    try:
+        context.profile_id = uuid.uuid4().hex[:12]
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            handler()
+        finally:
+            profiler.disable()
+            wall = time.perf_counter() - start
+            _store(context, path, trigger, profiler, wall)
+    finally:
+        _profiler_lock.release()
+
+
+def _store(context, path, trigger, profiler, wall):
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:Config.PROFILE_TOP_N]
+
+    entry = {
+        'id': context.profile_id,
+        'timestamp': datetime.now().isoformat(),
+        'endpoint': context.endpoint,
+        'path': path,
+        'trigger': trigger,
+        'wall_ms': round(wall * 1000, 3),
+        'sql_ms': round(context.phases.get('sql', 0.0) * 1000, 3),
+        'phases_ms': {phase: round(seconds * 1000, 3) for phase, seconds in context.phases.items()},
+        'top_functions': [{
+            'function': f"{filename}:{line}({name})",
+            'calls': total_calls,
+            'cumulative_ms': round(cumulative * 1000, 3),
+            'own_ms': round(own * 1000, 3),
+        } for (filename, line, name), (_, total_calls, own, cumulative, _) in top],
+    }
+    with _profiles_lock:
+        _profiles.append(entry)
+    PROFILES.inc(endpoint=context.endpoint, trigger=trigger)
+
+
+def get_profiles(profile_id=None):
+    """Get stored profiles (newest first), or the one with profile_id"""
+    with _profiles_lock:
+        profiles = list(reversed(_profiles))
+    if profile_id is None:
+        return profiles
+    return [p for p in profiles if p['id'] == profile_id]
@@ -0,0 +1,119 @@
+"""
+Opt-in slow-query log with captured query plans
+
+Statements that take longer than Config.SLOW_QUERY_LOG_MS (execution plus
+fetching) are recorded with their bound parameters, duration, row count
+and EXPLAIN QUERY PLAN output in a fixed-size ring buffer, viewable at
+/debug/slow_queries. Statements interrupted by a request timeout or
+client disconnect are always printed with their plan and counted, and
+listed there too (with 'cancelled' set to the reason) when the log is on.
+"""
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+from .config import Config
+from . import metrics, request_context
+
+
+SLOW_QUERIES = metrics.counter(
+    'creel_slow_queries_total', 'Statements recorded by the slow-query log', ['endpoint'])
+CANCELLED_QUERIES = metrics.counter(
+    'creel_queries_cancelled_total', 'Statements interrupted by a request timeout or disconnect',
+    ['endpoint', 'reason'])
+
+_entries = deque(maxlen=Config.SLOW_QUERY_LOG_SIZE)
+_lock = threading.Lock()
+
+
+class Statement:
+    """Timing of one executed statement, accumulated across fetches"""
+
+    __slots__ = ('sql', 'params', 'duration', 'rows')
+
+    def __init__(self, sql, params, duration):
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+        self.rows = 0
+
+
+def enabled():
+    """Check whether the slow-query log is switched on"""
+    return Config.SLOW_QUERY_LOG_MS is not None
+
+
+def finish(connection, statement):
+    """Record a finished statement if it exceeded the threshold"""
+    if statement.duration * 1000 < Config.SLOW_QUERY_LOG_MS:
+        return
+
+    entry = _entry(connection, statement.sql, statement.params, statement.duration, statement.rows)
+    with _lock:
+        _entries.append(entry)
+    SLOW_QUERIES.inc(endpoint=entry['endpoint'] or '')
+
+
+def cancelled(connection, sql, params, duration, reason):
+    """Record (and print) a statement interrupted by its request's timeout or disconnect"""
+    entry = _entry(connection, sql, params, duration, None, reason)
+    if enabled():
+        with _lock:
+            _entries.append(entry)
+    CANCELLED_QUERIES.inc(endpoint=entry['endpoint'] or '', reason=reason)
+    print(f"Query cancelled ({reason}) after {entry['duration_ms']:.0f}ms on {entry['endpoint']}: "
+          f"{entry['sql']} {entry['params']}")
+    for detail in entry['plan']:
+        print(f"    plan: {detail}")
+
+
+def _entry(connection, sql, params, duration, rows, cancelled_reason=None):
+    context = request_context.current()
+    plan = explain(connection, sql, params)
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'endpoint': context.endpoint if context else None,
+        'sql': _normalize_sql(sql),
+        'params': list(params) if params else [],
+        'duration_ms': round(duration * 1000, 3),
+        'rows': rows,
+        'plan': plan,
+        'full_scan': any(_is_table_scan(detail) for detail in plan),
+        'cancelled': cancelled_reason,
+    }
+
+
+def explain(connection, sql, params):
+    """
+    Get the EXPLAIN QUERY PLAN details for a statement
+
+    Returns:
+        list: Plan detail strings (empty if the statement cannot be explained)
+    """
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return []
+    try:
+        # Plain cursor so explaining is not itself timed or logged
+        cursor = sqlite3.Connection.cursor(connection)
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"EXPLAIN failed: {e}"]
+
+
+def entries():
+    """Get recorded slow statements, newest first"""
+    with _lock:
+        return list(reversed(_entries))
+
+
+def _is_table_scan(detail):
+    # "SCAN creel_records" (or "SCAN TABLE creel_records" on older SQLite)
+    # without an index is a full table scan
+    return detail.startswith('SCAN') and 'INDEX' not in detail
+
+
+def _normalize_sql(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
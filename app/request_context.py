@@ -0,0 +1,90 @@
+"""
+Per-request context shared between the HTTP handler and the database layer
+
+The handler opens a context for each request; lower layers (such as the
+instrumented SQLite cursor) add their time to named phases without having
+to be passed the request explicitly. The context also carries the
+request's deadline, so SQLite's progress handler can interrupt a query
+that outlives it or whose client has gone away.
+"""
+import threading
+import time
+
+
+_local = threading.local()
+
+# Seconds between checks of the client's socket while a query runs
+DISCONNECT_CHECK_INTERVAL = 0.25
+
+
+class QueryCancelled(Exception):
+    """Raised when a request's query is interrupted ('timeout' or 'disconnect')"""
+
+    def __init__(self, reason):
+        super().__init__(f"query cancelled ({reason})")
+        self.reason = reason
+
+
+class RequestContext:
+    """Timing state for the request being handled on this thread"""
+
+    __slots__ = ('endpoint', 'phases', 'profile_id', 'deadline', 'disconnected', 'cancelled',
+                 '_next_disconnect_check')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.phases = {}
+        # Set while the request runs under the profiler
+        self.profile_id = None
+        # time.monotonic() by which the request's queries must finish, and a
+        # callable telling whether the client has disconnected
+        self.deadline = None
+        self.disconnected = None
+        # Why the request's queries were interrupted, once they are
+        self.cancelled = None
+        self._next_disconnect_check = 0.0
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def check_cancelled(self):
+        """
+        Decide whether the request's queries should stop
+
+        Once a request is cancelled, its later queries are cancelled too.
+
+        Returns:
+            str: 'timeout' or 'disconnect', or None to keep going
+        """
+        if self.cancelled is None:
+            now = time.monotonic()
+            if self.deadline is not None and now >= self.deadline:
+                self.cancelled = 'timeout'
+            elif self.disconnected is not None and now >= self._next_disconnect_check:
+                self._next_disconnect_check = now + DISCONNECT_CHECK_INTERVAL
+                if self.disconnected():
+                    self.cancelled = 'disconnect'
+        return self.cancelled
+
+
+def begin(endpoint):
+    """Start a context for the current thread's request"""
+    context = _local.context = RequestContext(endpoint)
+    return context
+
+
+def end():
+    """Discard the current thread's context"""
+    _local.context = None
+
+
+def current():
+    """Get the current thread's context, or None outside a request"""
+    return getattr(_local, 'context', None)
+
+
+def add_phase(phase, seconds):
+    """Add time to a phase of the current request (no-op outside a request)"""
+    context = getattr(_local, 'context', None)
+    if context is not None:
+        context.add_phase(phase, seconds)
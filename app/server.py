@@ -2,13 +2,22 @@
 HTTP Server and Request Handlers for WDFW Creel Dashboard - Phase 2 Complete
 """
 from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import csv
+import gzip
 import json
 import os
-from urllib.parse import urlparse, parse_qs
+import select
+import socket
+import time
+from io import StringIO
+from itertools import islice
+from urllib.parse import urlparse, parse_qs, urlencode
 from datetime import datetime, timedelta
 
 from .config import Config
-from . import database, gcs_storage
+from . import (admission, bootstrap, cache, chart_formats, column_store, database, gcs_storage, geometry,
+               jsonstream, metrics, partitions, profiling, querylog, request_context, singleflight, snapshots,
+               warm_cache)
 
 # Import data collector
 try:
@@ -20,15 +29,214 @@ except ImportError:
     print("Warning: Could not import WDFWCreelCollector from data_collector.py")
 
 
+# Coalesces identical in-flight aggregation requests
+query_flights = singleflight.SingleFlight('query')
+
+# Downsampled trend series, valid for one dataset version
+trend_cache = cache.ResultCache('trend', Config.TREND_CACHE_SIZE)
+
+# Analytics series, valid for one dataset version
+analytics_cache = cache.ResultCache('analytics', Config.ANALYTICS_CACHE_SIZE)
+
+# Longest rolling window /api/analytics accepts (a year of weeks)
+MAX_ANALYTICS_WINDOW = 53
+
+# Filter options only change when the collector runs
+filter_options_cache = cache.ResultCache('filter_options', 1)
+
+# Smallest max_points that leaves room for every species' peaks
+MIN_MAX_POINTS = 20
+
+# Routes reported as their own endpoint label (everything else is grouped)
+ROUTES = {
+    '/api/stats', '/api/areas', '/api/filter_options', '/api/yearly', '/api/trend',
+    '/api/species', '/api/monthly', '/api/map_data', '/api/matrix', '/api/map_geometry', '/api/records',
+    '/api/analytics', '/api/batch',
+    '/api/update',
+    '/metrics',
+    '/robots.txt', '/sitemap.xml', '/', '/debug/slow_queries', '/debug/profiles',
+}
+
+REQUESTS = metrics.counter(
+    'creel_http_requests_total', 'HTTP requests handled', ['endpoint', 'code'])
+REQUEST_DURATION = metrics.histogram(
+    'creel_http_request_duration_seconds', 'Total request handling time', ['endpoint'])
+PHASE_DURATION = metrics.histogram(
+    'creel_http_request_phase_seconds',
+    'Request time split into sql, materialize, encode and write phases', ['endpoint', 'phase'])
+BYTES_SENT = metrics.counter(
+    'creel_http_response_bytes_total', 'Response body bytes sent', ['endpoint'])
+
+
+def encode_ndjson(rows):
+    """Encode record tuples as newline-delimited JSON objects"""
+    fields = database.RECORD_FIELDS
+    return ''.join(json.dumps(dict(zip(fields, row))) + '\n' for row in rows)
+
+
+def encode_csv(rows):
+    """Encode record tuples as CSV lines"""
+    out = StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue()
+
+
+# format -> (content type, header line, row encoder)
+RECORD_FORMATS = {
+    'ndjson': ('application/x-ndjson', '', encode_ndjson),
+    'csv': ('text/csv; charset=utf-8', encode_csv([database.RECORD_FIELDS]), encode_csv),
+}
+
+
+# Endpoints a batch query can ask for, and their data functions
+BATCH_ENDPOINTS = {
+    '/api/stats': database.get_statistics,
+    '/api/areas': database.get_area_totals,
+    '/api/filter_options': database.get_filter_options,
+    '/api/yearly': database.get_yearly_data,
+    '/api/trend': database.get_trend_data,
+    '/api/species': database.get_species_totals,
+    '/api/monthly': database.get_monthly_data,
+    '/api/map_data': database.get_map_data,
+    '/api/matrix': database.get_matrix,
+}
+
+# Endpoints that take a format (see app/chart_formats.py)
+CHART_ENDPOINTS = {'/api/yearly', '/api/trend', '/api/monthly'}
+
+SPECIES = {'all', 'chinook', 'coho', 'chum', 'pink', 'sockeye', 'lingcod', 'halibut'}
+TIME_UNITS = {'daily', 'weekly', 'monthly', 'yearly'}
+# Undownsampled trend series long enough to be streamed rather than cached
+STREAMED_TIME_UNITS = {'daily', 'weekly'}
+
+
+def parse_batch_query(spec):
+    """
+    Turn one batch query spec into an endpoint path and query parameters
+
+    Args:
+        spec: {'endpoint': 'trend' or '/api/trend', 'filters': {'year_start',
+            'year_end', 'catch_area', 'month'}, 'species': [...], 'time_unit': ...,
+            'max_points': ..., 'format': 'rows' or 'columns'}; everything but
+            endpoint is optional
+
+    Returns:
+        tuple: (path, params) with params shaped like parse_qs output
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("each query must be an object")
+    path = str(spec.get('endpoint', ''))
+    if not path.startswith('/api/'):
+        path = '/api/' + path
+    if path not in BATCH_ENDPOINTS:
+        raise ValueError(f"unknown endpoint '{spec.get('endpoint')}'")
+
+    params = {}
+    filters = spec.get('filters') or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    unknown = set(filters) - {'year_start', 'year_end', 'catch_area', 'month'}
+    if unknown:
+        raise ValueError(f"unknown filter '{sorted(unknown)[0]}'")
+    for name in ('year_start', 'year_end'):
+        if filters.get(name) not in (None, ''):
+            if isinstance(filters[name], bool) or not isinstance(filters[name], (str, int)):
+                raise ValueError(f"{name} must be a year")
+            params[name] = [str(filters[name])]
+    areas = filters.get('catch_area')
+    if areas:
+        areas = areas if isinstance(areas, list) else [areas]
+        if not all(isinstance(area, str) for area in areas):
+            raise ValueError("catch_area must be a string or a list of strings")
+        params['catch_area'] = areas
+    months = filters.get('month')
+    if months:
+        months = months if isinstance(months, list) else [months]
+        if not all(isinstance(m, int) and not isinstance(m, bool) and 1 <= m <= 12 for m in months):
+            raise ValueError("month must be a number from 1 to 12")
+        params['month'] = [str(m) for m in months]
+
+    species = spec.get('species')
+    if species:
+        species = species if isinstance(species, list) else [species]
+        if not set(species) <= SPECIES:
+            raise ValueError(f"unknown species in {species}")
+        params['species'] = list(species)
+    if spec.get('time_unit'):
+        if spec['time_unit'] not in TIME_UNITS:
+            raise ValueError(f"unknown time_unit '{spec['time_unit']}'")
+        params['time_unit'] = [spec['time_unit']]
+    if spec.get('max_points') is not None and path == '/api/trend':
+        if not isinstance(spec['max_points'], int) or spec['max_points'] < MIN_MAX_POINTS:
+            raise ValueError(f"max_points must be an integer of at least {MIN_MAX_POINTS}")
+        params['max_points'] = [str(spec['max_points'])]
+    if spec.get('format') is not None and path in CHART_ENDPOINTS:
+        # Results are spliced into one JSON body, so no binary
+        if spec['format'] not in ('rows', 'columns'):
+            raise ValueError("format must be 'rows' or 'columns'")
+        params['format'] = [spec['format']]
+    return path, params
+
+
+def endpoint_label(path):
+    """Map a request path to a bounded-cardinality metrics label"""
+    if path in ROUTES:
+        return path
+    if path.startswith('/static/'):
+        return '/static'
+    return 'other'
+
+
 class CreelDataHandler(SimpleHTTPRequestHandler):
     """HTTP request handler for creel data endpoints"""
     
     def do_GET(self):
         """Handle GET requests"""
+        self.handle_request(self.route_request)
+
+    def do_POST(self):
+        """Handle POST requests"""
+        self.handle_request(self.route_post)
+
+    def handle_request(self, route):
+        """Dispatch a request to route(path, params), recording metrics (and a profile if triggered)"""
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         params = parse_qs(parsed_path.query)
-        
+
+        self.endpoint = endpoint_label(path)
+        context = request_context.begin(self.endpoint)
+        timeout = Config.QUERY_ENDPOINT_TIMEOUT_SECONDS.get(path, Config.QUERY_TIMEOUT_SECONDS)
+        if timeout:
+            context.deadline = time.monotonic() + timeout
+        context.disconnected = self.client_disconnected
+        self.response_status = None
+        trigger = profiling.trigger_for(path, params, self.headers)
+        start = time.perf_counter()
+        try:
+            if trigger:
+                # Keep the filters with the profile so the request can be replayed
+                request = path + ('?' + urlencode(params, doseq=True) if params else '')
+                profiling.run(context, request, trigger, lambda: route(path, params))
+            else:
+                route(path, params)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_context.end()
+            self.record_request(context, elapsed)
+
+    def route_request(self, path, params):
+        """Dispatch a request to its handler"""
+        # Species names end up as column names in the SQL
+        if path.startswith('/api/') and 'species' in params:
+            unknown = sorted({s.lower() for s in params['species']} - SPECIES)
+            if unknown:
+                self.send_error(400, f"Invalid parameter: unknown species '{unknown[0]}'")
+                return
+
         # API endpoints
         if path == '/api/stats':
             self.serve_statistics(params)
@@ -46,8 +254,24 @@ class CreelDataHandler(SimpleHTTPRequestHandler):
             self.serve_monthly_data(params)
         elif path == '/api/map_data':
             self.serve_map_data(params)
+        elif path == '/api/analytics':
+            self.serve_analytics(params)
+        elif path == '/api/matrix':
+            self.serve_matrix(params)
+        elif path == '/api/map_geometry':
+            self.serve_map_geometry(params)
+        elif path == '/api/records':
+            self.serve_records(params)
         elif path == '/api/update':
             self.serve_update_data()
+        elif path == '/metrics':
+            self.serve_metrics()
+        elif path.startswith('/debug/') and not self.debug_authorized():
+            self.send_error(403, "Forbidden")
+        elif path == '/debug/slow_queries':
+            self.serve_slow_queries()
+        elif path == '/debug/profiles':
+            self.serve_profiles(params)
         elif path == '/robots.txt':
             self.serve_robots()
         elif path == '/sitemap.xml':
@@ -59,17 +283,32 @@ class CreelDataHandler(SimpleHTTPRequestHandler):
         else:
             self.send_error(404, "Not Found")
 
+    def route_post(self, path, params):
+        """Dispatch a POST request to its handler"""
+        if path == '/api/batch':
+            self.serve_batch()
+        else:
+            self.send_error(404, "Not Found")
+
     def serve_index(self):
-        """Serve the main HTML page"""
+        """Serve the main HTML page, with the first load's data inlined"""
         try:
+            if database.database_exists():
+                try:
+                    html, gzipped = bootstrap.get_index_page()
+                    self.send_gzipped(gzipped, 'text/html', plain=html)
+                    return
+                except Exception as e:
+                    # The page still works without it, loading from the API
+                    print(f"Error inlining bootstrap data: {e}")
+                    import traceback
+                    traceback.print_exc()
+
             file_path = os.path.join('static', 'index.html')
             with open(file_path, 'r') as f:
                 content = f.read()
 
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write(content.encode())
+            self.send_body(content.encode(), 'text/html')
         except Exception as e:
             print(f"Error serving index: {e}")
             self.send_error(500, f"Server error: {str(e)}")
@@ -108,15 +347,11 @@ class CreelDataHandler(SimpleHTTPRequestHandler):
             with open(file_path, mode) as f:
                 content = f.read()
 
-            self.send_response(200)
-            self.send_header('Content-type', content_type)
-            self.end_headers()
-
             # Write content (encode text, write binary as-is)
             if is_binary:
-                self.wfile.write(content)
+                self.send_body(content, content_type)
             else:
-                self.wfile.write(content.encode())
+                self.send_body(content.encode(), content_type)
 
         except FileNotFoundError:
             self.send_error(404, "File not found")
@@ -131,10 +366,7 @@ class CreelDataHandler(SimpleHTTPRequestHandler):
             with open(file_path, 'r') as f:
                 content = f.read()
 
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(content.encode())
+            self.send_body(content.encode(), 'text/plain')
         except FileNotFoundError:
             # Generate default robots.txt if file doesn't exist
             content = """User-agent: *
@@ -142,10 +374,7 @@ Allow: /
 
 Sitemap: https://wa-creel.jeremyveleber.com/sitemap.xml
 """
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(content.encode())
+            self.send_body(content.encode(), 'text/plain')
         except Exception as e:
             print(f"Error serving robots.txt: {e}")
             self.send_error(500, f"Server error: {str(e)}")
@@ -157,10 +386,7 @@ Sitemap: https://wa-creel.jeremyveleber.com/sitemap.xml
             with open(file_path, 'r') as f:
                 content = f.read()
 
-            self.send_response(200)
-            self.send_header('Content-type', 'application/xml')
-            self.end_headers()
-            self.wfile.write(content.encode())
+            self.send_body(content.encode(), 'application/xml')
         except FileNotFoundError:
             # Generate default sitemap.xml if file doesn't exist
             from datetime import datetime
@@ -174,309 +400,509 @@ Sitemap: https://wa-creel.jeremyveleber.com/sitemap.xml
     <priority>1.0</priority>
   </url>
 </urlset>"""
-            self.send_response(200)
-            self.send_header('Content-type', 'application/xml')
-            self.end_headers()
-            self.wfile.write(content.encode())
+            self.send_body(content.encode(), 'application/xml')
         except Exception as e:
             print(f"Error serving sitemap.xml: {e}")
             self.send_error(500, f"Server error: {str(e)}")
 
     def serve_statistics(self, params):
         """Serve overall statistics"""
-        try:
-            stats = database.get_statistics(params)
-            self.send_json(stats)
-        except Exception as e:
-            print(f"Error serving statistics: {e}")
-            import traceback
-            traceback.print_exc()
-            self.send_error(500, f"Server error: {str(e)}")
+        self.serve_query('/api/stats', params, database.get_statistics)
 
     def serve_areas(self, params):
         """Serve list of catch areas with totals"""
-        try:
-            areas = database.get_catch_areas(params)
-            # Convert to list of dicts
-            areas_list = [{'area': area, 'total': total} for area, total in areas]
-            self.send_json(areas_list)
-        except Exception as e:
-            print(f"Error serving areas: {e}")
-            import traceback
-            traceback.print_exc()
-            self.send_error(500, f"Server error: {str(e)}")
+        self.serve_query('/api/areas', params, database.get_area_totals)
 
     def serve_filter_options(self):
-        """Get available filter options (years and catch areas)"""
-        try:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
-
-            # Get available years
-            cursor.execute("""
-                SELECT DISTINCT substr(sample_date, -4) as year
-                FROM creel_records
-                WHERE length(sample_date) > 0
-                ORDER BY year
-            """)
-            years = [row[0] for row in cursor.fetchall() if row[0]]
-
-            # Get catch areas
-            cursor.execute("""
-                SELECT DISTINCT catch_area
-                FROM creel_records
-                WHERE catch_area != ''
-                ORDER BY catch_area
-            """)
-            areas = [row[0] for row in cursor.fetchall()]
-
-            conn.close()
-
-            self.send_json({
-                'years': years,
-                'areas': areas
-            })
-        except Exception as e:
-            print(f"Error serving filter options: {e}")
-            import traceback
-            traceback.print_exc()
-            self.send_error(500, f"Server error: {str(e)}")
+        """Get available filter options (years and catch areas), cached per dataset version"""
+        self.serve_query('/api/filter_options', {}, database.get_filter_options,
+                         result_cache=filter_options_cache)
 
     def serve_yearly_data(self, params):
         """Yearly catch trends"""
-        try:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
-
-            where_clause, query_params = database.build_where_clause(params)
-
-            query = f"""
-                SELECT 
-                    substr(sample_date, -4) as year,
-                    SUM(chinook) as chinook,
-                    SUM(coho) as coho,
-                    SUM(chum) as chum,
-                    SUM(pink) as pink,
-                    SUM(sockeye) as sockeye
-                FROM creel_records
-                {where_clause}
-                {"AND" if where_clause else "WHERE"} length(sample_date) > 0
-                GROUP BY year
-                ORDER BY year
-            """
-
-            cursor.execute(query, query_params)
-            rows = cursor.fetchall()
-            conn.close()
-
-            data = [{
-                'year': row[0],
-                'chinook': row[1] or 0,
-                'coho': row[2] or 0,
-                'chum': row[3] or 0,
-                'pink': row[4] or 0,
-                'sockeye': row[5] or 0
-            } for row in rows]
-
-            self.send_json(data)
-        except Exception as e:
-            print(f"Error serving yearly data: {e}")
-            import traceback
-            traceback.print_exc()
-            self.send_error(500, f"Server error: {str(e)}")
+        self.serve_chart('/api/yearly', params, database.get_yearly_data)
 
     def serve_trend_data(self, params):
-        """Trend data with configurable time granularity"""
+        """
+        Trend data with configurable time granularity
+
+        With max_points, long series (e.g. daily over every year) are
+        downsampled so each species' peaks are kept, and the result is
+        cached until the dataset version changes. Without it, daily and
+        weekly series in rows format are streamed as they are read (see
+        stream_trend_data); shorter ones are served like any other chart.
+        """
+        if 'max_points' not in params:
+            if (chart_formats.get_format(params) == 'rows'
+                    and params.get('time_unit', ['yearly'])[0] in STREAMED_TIME_UNITS):
+                self.stream_trend_data(params)
+            else:
+                self.serve_chart('/api/trend', params, database.get_trend_data)
+            return
+
         try:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
-
-            time_unit = params.get('time_unit', ['yearly'])[0]
-            where_clause, query_params = database.build_where_clause(params)
-
-            # Get list of species to display
-            species_list = database.get_species_list(params)
-
-            # Build species SELECT columns
-            species_select = ', '.join([f"SUM({s}) as {s}" for s in species_list])
-
-            # sample_date format: "Apr 1, 2013" (Mon DD, YYYY)
-            # We need to convert month names to numbers
-            month_case = """
-                CASE substr(sample_date, 1, 3)
-                    WHEN 'Jan' THEN '01'
-                    WHEN 'Feb' THEN '02'
-                    WHEN 'Mar' THEN '03'
-                    WHEN 'Apr' THEN '04'
-                    WHEN 'May' THEN '05'
-                    WHEN 'Jun' THEN '06'
-                    WHEN 'Jul' THEN '07'
-                    WHEN 'Aug' THEN '08'
-                    WHEN 'Sep' THEN '09'
-                    WHEN 'Oct' THEN '10'
-                    WHEN 'Nov' THEN '11'
-                    WHEN 'Dec' THEN '12'
-                END
-            """
-
-            # Extract day (between first space and comma)
-            day_extract = "substr('0' || substr(sample_date, 5, instr(sample_date, ',') - 5), -2, 2)"
-
-            # Extract year (last 4 characters)
-            year_extract = "substr(sample_date, -4)"
-
-            # Build YYYY-MM-DD date string
-            date_string = f"{year_extract} || '-' || {month_case} || '-' || {day_extract}"
-
-            # Determine time period extraction based on granularity
-            if time_unit == 'daily':
-                period_select = f"{date_string} as period"
-            elif time_unit == 'weekly':
-                # Format: YYYY-Www (e.g., 2024-W01)
-                period_select = f"strftime('%Y-W%W', {date_string}) as period"
-            elif time_unit == 'monthly':
-                # Format: YYYY-MM (e.g., 2024-01)
-                period_select = f"{year_extract} || '-' || {month_case} as period"
-            else:  # yearly (default)
-                period_select = f"{year_extract} as period"
-
-            query = f"""
-                SELECT 
-                    {period_select},
-                    {species_select}
-                FROM creel_records
-                {where_clause}
-                {"AND" if where_clause else "WHERE"} length(sample_date) > 0
-                GROUP BY period
-                ORDER BY period
-            """
-
-            cursor.execute(query, query_params)
-            columns = ['period'] + species_list
-            rows = cursor.fetchall()
-            conn.close()
-
-            # Convert to list of dicts
-            data = [dict(zip(columns, row)) for row in rows]
-            self.send_json(data)
+            max_points = int(params['max_points'][0])
+        except ValueError:
+            max_points = 0
+        if max_points < MIN_MAX_POINTS:
+            self.send_error(400, f"max_points must be an integer of at least {MIN_MAX_POINTS}")
+            return
+
+        self.serve_chart('/api/trend', params, database.get_trend_data, result_cache=trend_cache)
+
+    def stream_trend_data(self, params):
+        """
+        Stream an undownsampled trend series as a JSON array
+
+        Rows go from the cursor through pre-encoded row templates (see
+        app/jsonstream.py) to the socket in chunks, so a daily series over
+        every season is never held in memory as dicts, a str and bytes at
+        once, and the first bytes go out before the last rows are read.
+        The body is identical to json.dumps() of get_trend_data(). Series
+        with a snapshot or a persisted result are still answered from it.
+        Streamed responses are not coalesced with identical concurrent
+        requests, and take a slot of their own controller rather than one of
+        /api/trend's since they hold it while the client reads.
+        """
+        context = request_context.current()
+        if context.profile_id is None:
+            key = ('/api/trend', database.canonical_params(params))
+            if self.send_cached(key, database.get_dataset_version()):
+                return
 
+        def next_chunk(chunks):
+            # Time spent in the encoder that was not SQL
+            sql_before = context.phases.get('sql', 0.0)
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            sql_time = context.phases.get('sql', 0.0) - sql_before
+            context.add_phase('encode', max(0.0, time.perf_counter() - start - sql_time))
+            return chunk
+
+        try:
+            with admission.get_controller('/api/trend_stream').slot():
+                columns, rows = database.iter_trend_rows(params)
+                try:
+                    chunks = jsonstream.iter_json_array(rows, jsonstream.RowEncoder(columns))
+                    # Read the first chunk before any headers go out so a
+                    # failing query can still be answered with a 500
+                    chunk = next_chunk(chunks)
+
+                    self.begin_stream('application/json', {'Access-Control-Allow-Origin': '*'})
+                    while chunk is not None:
+                        self.write_chunk(chunk)
+                        chunk = next_chunk(chunks)
+                    self.end_stream()
+                finally:
+                    if hasattr(rows, 'close'):
+                        rows.close()
+        except admission.Overloaded as e:
+            self.send_overloaded(e)
+        except request_context.QueryCancelled as e:
+            if self.response_status is None:
+                self.send_cancelled(e)
+            else:
+                self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
         except Exception as e:
-            print(f"Error serving trend data: {e}")
+            print(f"Error streaming /api/trend: {e}")
             import traceback
             traceback.print_exc()
-            self.send_error(500, f"Server error: {str(e)}")
+            if self.response_status is None:
+                self.send_error(500, f"Server error: {str(e)}")
+            else:
+                self.close_connection = True
 
     def serve_species_totals(self, params):
         """Species breakdown totals"""
-        try:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
+        self.serve_query('/api/species', params, database.get_species_totals)
+
+    def serve_monthly_data(self, params):
+        """Monthly catch patterns"""
+        self.serve_chart('/api/monthly', params, database.get_monthly_data)
 
-            where_clause, query_params = database.build_where_clause(params)
-            species_list = database.get_species_list(params)
+    def serve_map_data(self, params):
+        """Map data with area totals"""
+        self.serve_query('/api/map_data', params, database.get_map_data)
 
-            # Build query to get totals for each species
-            species_select = ', '.join([f"SUM({s}) as {s}" for s in species_list])
+    def serve_analytics(self, params):
+        """
+        Catch per angler and per interview, rolling averages and
+        year-over-year changes per period, cached per dataset version
 
-            query = f"""
-                SELECT {species_select}
-                FROM creel_records
-                {where_clause}
-            """
+        Query parameters (besides the usual filters and species):
+            time_unit: Period granularity (default 'weekly')
+            window: Periods in the rolling averages (default 4)
+        """
+        try:
+            window = int(params.get('window', ['4'])[0])
+        except ValueError:
+            window = 0
+        if not 1 <= window <= MAX_ANALYTICS_WINDOW:
+            self.send_error(400, f"window must be an integer from 1 to {MAX_ANALYTICS_WINDOW}")
+            return
+        if params.get('time_unit', ['weekly'])[0] not in TIME_UNITS:
+            self.send_error(400, f"time_unit must be one of {', '.join(sorted(TIME_UNITS))}")
+            return
+
+        self.serve_query('/api/analytics', params, database.get_analytics, result_cache=analytics_cache)
 
-            cursor.execute(query, query_params)
-            row = cursor.fetchone()
-            conn.close()
+    def serve_matrix(self, params):
+        """Catch area x period matrix per species (same parameters as /api/trend)"""
+        self.serve_query('/api/matrix', params, database.get_matrix)
 
-            # Convert to dict
-            data = {species: (row[i] or 0) for i, species in enumerate(species_list)}
-            self.send_json(data)
+    def serve_map_geometry(self, params):
+        """
+        Marine area geometry simplified for a zoom level, with per-area
+        totals for the current filters attached (see app/geometry.py)
+        """
+        try:
+            zoom = int(params.pop('zoom', ['8'])[0])
+        except ValueError:
+            self.send_error(400, "zoom must be an integer")
+            return
 
+        try:
+            tiers = geometry.get_tiers()
+        except Exception as e:
+            print(f"Error loading map geometry: {e}")
+            import traceback
+            traceback.print_exc()
+            self.send_error(500, f"Server error: {str(e)}")
+            return
+        if not tiers:
+            self.send_error(404, "Map geometry has not been built")
+            return
+        tier = geometry.tier_for_zoom(tiers, zoom)
+
+        # Totals are the /api/map_data response for the same filters, from
+        # its snapshot or the warm cache if there is one
+        key = ('/api/map_data', database.canonical_params(params))
+        body, gzipped = None, False
+        if request_context.current().profile_id is None:
+            body, gzipped = self.cached_body(key, database.get_dataset_version())
+        try:
+            if body is None:
+                body, shared = self.execute_shared(key, '/api/map_data', params, database.get_map_data)
+                if shared:
+                    cache.CACHE_HITS.inc(cache='singleflight')
+        except admission.Overloaded as e:
+            self.send_overloaded(e)
+            return
+        except request_context.QueryCancelled as e:
+            self.send_cancelled(e)
+            return
         except Exception as e:
-            print(f"Error serving species totals: {e}")
+            print(f"Error serving /api/map_geometry: {e}")
             import traceback
             traceback.print_exc()
             self.send_error(500, f"Server error: {str(e)}")
+            return
 
-    def serve_monthly_data(self, params):
-        """Monthly catch patterns"""
+        compress = 'gzip' in self.headers.get('Accept-Encoding', '')
+        start = time.perf_counter()
+        map_data = json.loads(gzip.decompress(body) if gzipped else body)
+        body = geometry.render(tier, geometry.attach_totals(tier, map_data), compress)
+        request_context.add_phase('encode', time.perf_counter() - start)
+
+        headers = {'Vary': 'Accept-Encoding'}
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+        self.send_json_body(body, headers=headers)
+
+    def serve_records(self, params):
+        """
+        Stream raw records matching the filters as NDJSON or CSV
+
+        Query parameters (besides the usual filters):
+            format: 'ndjson' (default) or 'csv'
+            limit: Maximum number of records
+            after_day, after_id: sample_day and id of the last record
+                already received, to resume from the next one
+        """
         try:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
-
-            where_clause, query_params = database.build_where_clause(params)
-            species_columns = database.get_species_columns(params)
-
-            query = f"""
-                SELECT 
-                    CASE substr(sample_date, 1, 3)
-                        WHEN 'Jan' THEN 1 WHEN 'Feb' THEN 2 WHEN 'Mar' THEN 3
-                        WHEN 'Apr' THEN 4 WHEN 'May' THEN 5 WHEN 'Jun' THEN 6
-                        WHEN 'Jul' THEN 7 WHEN 'Aug' THEN 8 WHEN 'Sep' THEN 9
-                        WHEN 'Oct' THEN 10 WHEN 'Nov' THEN 11 WHEN 'Dec' THEN 12
-                    END as month,
-                    SUM({species_columns}) as total_catch
-                FROM creel_records
-                {where_clause}
-                {"AND" if where_clause else "WHERE"} month IS NOT NULL
-                GROUP BY month
-                ORDER BY month
-            """
-
-            cursor.execute(query, query_params)
-            rows = cursor.fetchall()
-            conn.close()
-
-            # Fill all 12 months (some may have no data)
-            monthly_totals = [0] * 12
-            for row in rows:
-                month = row[0]
-                if month and 1 <= month <= 12:
-                    monthly_totals[month - 1] = row[1] or 0
-
-            # Return all 12 months with 'month' and 'total' keys
-            data = [{'month': i + 1, 'total': monthly_totals[i]} for i in range(12)]
-            self.send_json(data)
+            output_format = params.get('format', ['ndjson'])[0]
+            if output_format not in RECORD_FORMATS:
+                raise ValueError(f"unknown format '{output_format}'")
+            limit = int(params['limit'][0]) if 'limit' in params else None
+            if limit is not None and limit < 1:
+                raise ValueError("limit must be positive")
+            after = None
+            if 'after_day' in params or 'after_id' in params:
+                after = (params['after_day'][0], int(params['after_id'][0]))
+        except KeyError as e:
+            self.send_error(400, f"Missing parameter: {e.args[0]}")
+            return
+        except ValueError as e:
+            self.send_error(400, f"Invalid parameter: {e}")
+            return
 
+        content_type, header, encode = RECORD_FORMATS[output_format]
+        headers = {'Access-Control-Allow-Origin': '*'}
+        if output_format == 'csv':
+            headers['Content-Disposition'] = 'attachment; filename="creel_records.csv"'
+
+        try:
+            with admission.get_controller('/api/records').slot():
+                records = database.iter_records(params, after, limit)
+                try:
+                    batches = iter(lambda: list(islice(records, Config.RECORDS_PAGE_SIZE)), [])
+                    # Read the first page before any headers go out so a
+                    # failing query can still be answered with a 500
+                    batch = next(batches, [])
+
+                    self.begin_stream(content_type, headers)
+                    if header:
+                        self.write_chunk(header.encode())
+                    while batch:
+                        start = time.perf_counter()
+                        data = encode(batch).encode()
+                        request_context.add_phase('encode', time.perf_counter() - start)
+                        self.write_chunk(data)
+                        batch = next(batches, [])
+                    self.end_stream()
+                finally:
+                    records.close()
+        except admission.Overloaded as e:
+            self.send_overloaded(e)
+        except request_context.QueryCancelled as e:
+            if self.response_status is None:
+                self.send_cancelled(e)
+            else:
+                self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-download
+            self.close_connection = True
         except Exception as e:
-            print(f"Error serving monthly data: {e}")
+            print(f"Error streaming records: {e}")
             import traceback
             traceback.print_exc()
-            self.send_error(500, f"Server error: {str(e)}")
+            if self.response_status is None:
+                self.send_error(500, f"Server error: {str(e)}")
+            else:
+                # Headers are gone; leave the body unterminated so the
+                # client sees a truncated response rather than a short one
+                self.close_connection = True
+
+    def serve_batch(self):
+        """
+        Run several aggregation queries and return all their results
+
+        The JSON body is {"queries": [spec, ...]} (see parse_batch_query)
+        and the response is {"results": [...]} in the same order, each
+        result exactly what the endpoint would return on its own. Identical
+        queries run once and share their result. All of them run on one
+        pooled connection inside a single read transaction, so the results
+        are consistent with each other even if the collector commits
+        meanwhile.
+        """
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.send_error(411, "Content-Length required")
+            return
+        if length < 0:
+            self.send_error(400, "Invalid Content-Length")
+            return
+        if length > Config.BATCH_MAX_BYTES:
+            self.send_error(413, f"Batch requests are limited to {Config.BATCH_MAX_BYTES} bytes")
+            return
 
-    def serve_map_data(self, params):
-        """Map data with area totals"""
         try:
-            conn = database.get_db_connection()
-            cursor = conn.cursor()
-
-            where_clause, query_params = database.build_where_clause(params)
-            species_columns = database.get_species_columns(params)
-
-            query = f"""
-                SELECT 
-                    catch_area,
-                    SUM({species_columns}) as total,
-                    COUNT(*) as surveys
-                FROM creel_records
-                {where_clause}
-                {"AND" if where_clause else "WHERE"} catch_area != ''
-                GROUP BY catch_area
-            """
-
-            cursor.execute(query, query_params)
-            rows = cursor.fetchall()
-            conn.close()
-
-            # Convert to array of objects (matching old format)
-            data = [{'area': row[0], 'total': row[1] or 0, 'surveys': row[2] or 0} for row in rows]
-            self.send_json(data)
+            specs = json.loads(self.rfile.read(length))['queries']
+            if not isinstance(specs, list) or not specs:
+                raise ValueError("queries must be a non-empty list")
+            if len(specs) > Config.BATCH_MAX_QUERIES:
+                raise ValueError(f"at most {Config.BATCH_MAX_QUERIES} queries per batch")
+            queries = [parse_batch_query(spec) for spec in specs]
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_error(400, f"Invalid batch: {e}")
+            return
 
+        keys = [(path, database.canonical_params(params)) for path, params in queries]
+        unique = dict(zip(keys, queries))
+        try:
+            with admission.get_controller('/api/batch').slot():
+                bodies = self.execute_batch(unique)
+        except admission.Overloaded as e:
+            self.send_overloaded(e)
+            return
+        except request_context.QueryCancelled as e:
+            self.send_cancelled(e)
+            return
+        except Exception as e:
+            print(f"Error serving /api/batch: {e}")
+            import traceback
+            traceback.print_exc()
+            self.send_error(500, f"Server error: {str(e)}")
+            return
+
+        self.send_json_body(b'{"results": [' + b', '.join(bodies[key] for key in keys) + b']}')
+
+    def execute_batch(self, queries):
+        """
+        Run batch queries in one read transaction
+
+        Args:
+            queries: {key: (path, params)} of distinct queries
+
+        Returns:
+            dict: {key: serialized result}
+        """
+        bodies = {}
+        context = request_context.current()
+        with database.pooled_connection() as conn:
+            conn.execute('BEGIN')
+            for key, (path, params) in queries.items():
+                sql_before = context.phases.get('sql', 0.0)
+                start = time.perf_counter()
+                data = BATCH_ENDPOINTS[path](params, conn=conn)
+                fetched = time.perf_counter()
+                bodies[key] = json.dumps(data).encode()
+
+                sql_time = context.phases.get('sql', 0.0) - sql_before
+                context.add_phase('materialize', max(0.0, fetched - start - sql_time))
+                context.add_phase('encode', time.perf_counter() - fetched)
+        # The transaction is rolled back when the connection returns to the pool
+        return bodies
+
+    def serve_chart(self, path, params, fetch, result_cache=None):
+        """
+        Serve a chart endpoint as rows, columns or binary columns (see
+        app/chart_formats.py)
+        """
+        output_format = chart_formats.get_format(params)
+        if output_format not in chart_formats.FORMATS:
+            self.send_error(400, f"Invalid parameter: unknown format '{output_format}'")
+            return
+        self.serve_query(path, params, fetch, result_cache, binary=output_format == 'binary')
+
+    def serve_query(self, path, params, fetch, result_cache=None, binary=False):
+        """
+        Serve an aggregation endpoint
+
+        Preset views (see app/snapshots.py) are answered from their stored
+        snapshot, and other popular queries from the results persisted at
+        the last refresh (see app/warm_cache.py). Identical concurrent
+        requests are coalesced so only one of them runs the query (under
+        the endpoint's admission control) and all of them share the
+        serialized response. With a result_cache, responses are also kept
+        for as long as the dataset version doesn't change. With binary,
+        fetch's column dict is sent in the binary chart format instead of
+        as JSON.
+        """
+        key = (path, database.canonical_params(params))
+        profiled = request_context.current().profile_id is not None
+        version = None
+        if not profiled:
+            version = database.get_dataset_version()
+            if self.send_cached(key, version, result_cache, binary):
+                return
+
+        try:
+            if profiled:
+                # Profiled requests always execute so the profile is meaningful
+                body, shared = self.execute_query(path, params, fetch, binary), False
+            else:
+                body, shared = self.execute_shared(key, path, params, fetch, binary)
+            if shared:
+                cache.CACHE_HITS.inc(cache='singleflight')
+        except admission.Overloaded as e:
+            self.send_overloaded(e)
+            return
+        except request_context.QueryCancelled as e:
+            self.send_cancelled(e)
+            return
         except Exception as e:
-            print(f"Error serving map data: {e}")
+            print(f"Error serving {path}: {e}")
             import traceback
             traceback.print_exc()
             self.send_error(500, f"Server error: {str(e)}")
+            return
+
+        if result_cache is not None and version is not None:
+            result_cache.put(key, version, body)
+        self.send_query_body(body, binary)
+
+    def cached_body(self, key, version, result_cache=None):
+        """
+        Look a query up in its snapshot, the warm cache and result_cache
+
+        Args:
+            key: (path, canonical params) of the query
+            version: Current dataset version
+
+        Returns:
+            tuple: (serialized result or None, whether it is gzipped)
+        """
+        snapshot = snapshots.lookup(key, version)
+        if snapshot is not None:
+            cache.CACHE_HITS.inc(cache='snapshot')
+            return snapshot, True
+        warm_cache.record_hit(key)
+        body = warm_cache.results.get(key, version)
+        if body is None and result_cache is not None:
+            body = result_cache.get(key, version)
+        return body, False
+
+    def send_cached(self, key, version, result_cache=None, binary=False):
+        """
+        Answer a query from its snapshot, the warm cache or result_cache
+
+        Returns:
+            bool: Whether a response was sent
+        """
+        body, gzipped = self.cached_body(key, version, result_cache)
+        if body is None:
+            return False
+        if gzipped:
+            self.send_gzipped_json(body)
+        else:
+            self.send_query_body(body, binary)
+        return True
+
+    def send_query_body(self, body, binary=False):
+        """Send a serialized aggregation result"""
+        if binary:
+            self.send_body(body, chart_formats.BINARY_CONTENT_TYPE, headers={'Access-Control-Allow-Origin': '*'})
+        else:
+            self.send_json_body(body)
+
+    def execute_shared(self, key, path, params, fetch, binary=False):
+        """
+        Run a query through query_flights
+
+        A follower whose leader's client disconnected runs the query again
+        rather than failing with it.
+
+        Returns:
+            tuple: (serialized result, shared)
+        """
+        context = request_context.current()
+        while True:
+            try:
+                return query_flights.do(key, lambda: self.execute_query(path, params, fetch, binary))
+            except request_context.QueryCancelled as e:
+                if e.reason != 'disconnect' or context.cancelled is not None:
+                    raise
+
+    def execute_query(self, path, params, fetch, binary=False):
+        """Run an aggregation within its admission slot and serialize it"""
+        with admission.get_controller(path).slot():
+            context = request_context.current()
+            sql_before = context.phases.get('sql', 0.0)
+            start = time.perf_counter()
+            data = fetch(params)
+            fetched = time.perf_counter()
+            body = chart_formats.encode_binary(data) if binary else json.dumps(data).encode()
+            encoded = time.perf_counter()
+
+            # Everything in fetch() that was not SQL is row materialization
+            sql_time = context.phases.get('sql', 0.0) - sql_before
+            context.add_phase('materialize', max(0.0, fetched - start - sql_time))
+            context.add_phase('encode', encoded - fetched)
+            return body
 
     def serve_update_data(self):
         """Update data from WDFW if it's been more than 24 hours"""
@@ -508,6 +934,12 @@ Sitemap: https://wa-creel.jeremyveleber.com/sitemap.xml
                 })
                 return
 
+        # The refresh (and the caches it renders) runs to completion
+        # whatever the request's time budget or client does
+        context = request_context.current()
+        context.deadline = None
+        context.disconnected = None
+
         # Perform the update
         try:
             print("=" * 70)
@@ -526,6 +958,7 @@ Sitemap: https://wa-creel.jeremyveleber.com/sitemap.xml
 
                 # Record update time
                 database.set_last_update_time()
+                database.ensure_schema()
 
                 # Get record count
                 cursor = collector.conn.cursor()
@@ -536,9 +969,17 @@ Sitemap: https://wa-creel.jeremyveleber.com/sitemap.xml
                 print(f"✅ Update completed successfully! Total records: {total_records:,}")
                 print("=" * 70)
 
-                # Upload database to GCS
+                # Persist the database to GCS: as partitions (only changed
+                # seasons are uploaded) when they are current, else in full
                 if Config.GCS_BUCKET_NAME:
-                    gcs_storage.upload_database_to_gcs(Config.GCS_BUCKET_NAME, Config.DB_PATH)
+                    manifest = partitions.read_manifest()
+                    persisted = (manifest is not None
+                                 and manifest.get('version') == database.get_dataset_version()
+                                 and partitions.refresh_base(Config.DB_PATH, Config.PARTITION_DIR)
+                                 and gcs_storage.upload_partitions(Config.GCS_BUCKET_NAME, Config.PARTITION_DIR))
+                    if not persisted:
+                        gcs_storage.upload_database_to_gcs(Config.GCS_BUCKET_NAME, Config.DB_PATH)
+                    gcs_storage.upload_warm_cache(Config.GCS_BUCKET_NAME, Config.WARM_CACHE_PATH)
                 else:
                     print("⚠️  GCS_BUCKET_NAME not set, database will not persist across deployments")
 
@@ -565,19 +1006,189 @@ Sitemap: https://wa-creel.jeremyveleber.com/sitemap.xml
                 'should_reload': False
             })
 
-    def send_json(self, data):
+    def serve_metrics(self):
+        """Serve metrics in Prometheus text format"""
+        self.send_body(metrics.render().encode(), 'text/plain; version=0.0.4')
+
+    def serve_slow_queries(self):
+        """Serve the slow-query log (404 unless it is enabled)"""
+        if not querylog.enabled():
+            self.send_error(404, "Not Found")
+            return
+
+        self.send_json({
+            'threshold_ms': Config.SLOW_QUERY_LOG_MS,
+            'entries': querylog.entries()
+        })
+
+    def serve_profiles(self, params):
+        """Serve stored request profiles (optionally a single ?id=)"""
+        profile_id = params.get('id', [None])[0]
+        profiles = profiling.get_profiles(profile_id)
+        if profile_id and not profiles:
+            self.send_error(404, "Profile not found")
+            return
+
+        self.send_json({
+            'sample_rate': Config.PROFILE_SAMPLE_RATE,
+            'profiles': profiles
+        })
+
+    def debug_authorized(self):
+        """Debug endpoints need the debug token whenever one is configured"""
+        return not Config.DEBUG_TOKEN or profiling.authorized(self.headers)
+
+    def send_overloaded(self, error):
+        """Shed a request that admission control could not admit"""
+        self.send_json({
+            'error': 'Server busy, please retry',
+            'reason': error.reason
+        }, status=503, headers={'Retry-After': str(error.retry_after)})
+
+    def send_cancelled(self, error):
+        """Answer a request whose queries were interrupted"""
+        if error.reason == 'timeout':
+            self.send_json({
+                'error': 'Query took too long, try narrower filters'
+            }, status=504)
+        else:
+            # Nobody is left to answer; 499 is only recorded in metrics
+            self.response_status = 499
+            self.close_connection = True
+
+    def client_disconnected(self):
+        """Check, without blocking, whether the client has closed its connection"""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+
+    def send_json(self, data, status=200, headers=None):
         """Send JSON response"""
+        self.send_json_body(json.dumps(data).encode(), status, headers)
+
+    def send_json_body(self, body, status=200, headers=None):
+        """Send an already serialized JSON response"""
+        headers = dict(headers or {})
+        headers['Access-Control-Allow-Origin'] = '*'
+        self.send_body(body, 'application/json', status, headers)
+
+    def send_gzipped_json(self, body):
+        """Send a gzipped JSON body"""
+        self.send_gzipped(body, 'application/json', headers={'Access-Control-Allow-Origin': '*'})
+
+    def send_gzipped(self, body, content_type, plain=None, headers=None):
+        """
+        Send a gzipped body as-is to clients that accept gzip, and the
+        plain body (decompressed unless given) to the others
+        """
+        headers = dict(headers or {})
+        headers['Vary'] = 'Accept-Encoding'
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            headers['Content-Encoding'] = 'gzip'
+        else:
+            body = plain if plain is not None else gzip.decompress(body)
+        self.send_body(body, content_type, headers=headers)
+
+    def send_body(self, body, content_type, status=200, headers=None):
+        """Send a complete response, timing the socket write"""
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_extra_headers(headers)
+
+        start = time.perf_counter()
+        self.end_headers()
+        self.wfile.write(body)
+        request_context.add_phase('write', time.perf_counter() - start)
+        BYTES_SENT.inc(len(body), endpoint=self.endpoint)
+
+    def send_extra_headers(self, headers):
+        """Send caller-supplied headers plus X-Profile-Id when profiling"""
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        context = request_context.current()
+        if context is not None and context.profile_id:
+            self.send_header('X-Profile-Id', context.profile_id)
+
+    def begin_stream(self, content_type, headers=None):
+        """
+        Start a 200 response whose length is not known up front
+
+        HTTP/1.1 clients get chunked transfer encoding; HTTP/1.0 clients
+        get a body delimited by closing the connection. Either way the
+        connection is closed after the response.
+        """
+        self.chunked = self.request_version == 'HTTP/1.1'
+        if self.chunked:
+            # The server speaks HTTP/1.0 otherwise; chunking needs a 1.1 status line
+            self.protocol_version = 'HTTP/1.1'
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-type', content_type)
+        if self.chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.send_extra_headers(headers)
+
+        start = time.perf_counter()
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        request_context.add_phase('write', time.perf_counter() - start)
+
+    def write_chunk(self, data):
+        """
+        Write part of a streamed response body
+
+        Raises:
+            QueryCancelled: If the request is past its deadline, the client
+                disconnected or did not take the chunk within
+                STREAM_WRITE_TIMEOUT_SECONDS
+        """
+        if not data:
+            return
+        context = request_context.current()
+        timeout = Config.STREAM_WRITE_TIMEOUT_SECONDS or None
+        if context is not None:
+            if context.check_cancelled():
+                raise request_context.QueryCancelled(context.cancelled)
+            if context.deadline is not None:
+                remaining = max(0.001, context.deadline - time.monotonic())
+                timeout = min(timeout, remaining) if timeout else remaining
+        start = time.perf_counter()
+        self.connection.settimeout(timeout)
+        try:
+            if self.chunked:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            else:
+                self.wfile.write(data)
+        except socket.timeout:
+            raise request_context.QueryCancelled('timeout')
+        request_context.add_phase('write', time.perf_counter() - start)
+        BYTES_SENT.inc(len(data), endpoint=self.endpoint)
+
+    def end_stream(self):
+        """Finish a streamed response"""
+        if self.chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+    def send_response(self, code, message=None):
+        """Record the status code for metrics and logging"""
+        self.response_status = int(code)
+        super().send_response(code, message)
+
+    def record_request(self, context, elapsed):
+        """Record metrics for a finished request and log it if it failed"""
+        status = self.response_status or 0
+        REQUESTS.inc(endpoint=context.endpoint, code=status)
+        REQUEST_DURATION.observe(elapsed, endpoint=context.endpoint)
+        for phase, seconds in context.phases.items():
+            PHASE_DURATION.observe(seconds, endpoint=context.endpoint, phase=phase)
 
-    def log_message(self, format, *args):
-        """Override to customize logging"""
         # Only log errors, not every request
-        if '40' in str(args[1]) or '50' in str(args[1]):
-            super().log_message(format, *args)
+        if status >= 400:
+            self.log_message('"%s" %s %.1fms', self.requestline, status, elapsed * 1000)
+
+    def log_request(self, code='-', size='-'):
+        """Requests are logged by record_request once they finish"""
 
 
 def run_server():
@@ -588,11 +1199,30 @@ def run_server():
     # Try to download database from GCS
     if Config.GCS_BUCKET_NAME:
         print(f"🪣 GCS Bucket: {Config.GCS_BUCKET_NAME}")
+        gcs_storage.download_partitions(Config.GCS_BUCKET_NAME, Config.PARTITION_DIR)
         if not database.database_exists():
-            gcs_storage.download_database_from_gcs(Config.GCS_BUCKET_NAME, Config.DB_PATH)
+            # Rebuilt from the partitions; only older buckets hold a full copy
+            if partitions.restore_database(Config.PARTITION_DIR, Config.DB_PATH):
+                print(f"✅ Database restored from season partitions")
+            else:
+                gcs_storage.download_database_from_gcs(Config.GCS_BUCKET_NAME, Config.DB_PATH)
+        gcs_storage.download_warm_cache(Config.GCS_BUCKET_NAME, Config.WARM_CACHE_PATH)
     else:
         print("⚠️  GCS_BUCKET_NAME not set, database will not persist across deployments")
 
+    # Add indices introduced after the database was first built, write
+    # the season partitions, columnar snapshot and preset view snapshots if
+    # this database version has none yet, and load the query results
+    # persisted for it
+    if database.database_exists():
+        database.ensure_schema()
+        partitions.ensure_built(database.get_dataset_version())
+        column_store.ensure_built(database.get_dataset_version())
+        snapshots.ensure_built(database.get_dataset_version())
+        loaded = warm_cache.load(database.get_dataset_version())
+        if loaded:
+            print(f"🔥 Loaded {loaded} persisted query results")
+
     # Create server
     server = ThreadingHTTPServer((Config.HOST, Config.PORT), CreelDataHandler)
 
@@ -0,0 +1,80 @@
+"""
+Request coalescing for identical in-flight queries
+
+When several threads ask for the same result at the same time, only the
+first one (the leader) executes it; the others wait and share the leader's
+result or exception.
+"""
+import threading
+
+from . import metrics
+
+
+EXECUTIONS = metrics.counter(
+    'creel_singleflight_executions_total', 'Calls executed by a flight leader', ['group'])
+SAVED = metrics.counter(
+    'creel_singleflight_saved_total', 'Executions saved by sharing an in-flight result', ['group'])
+
+
+class _Call:
+    """State of one in-flight execution"""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key
+
+        Args:
+            key: Hashable key identifying the call
+            fn: Zero-argument callable producing the result
+
+        Returns:
+            tuple: (result, shared) where shared is True for followers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            SAVED.inc(group=self.name)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            EXECUTIONS.inc(group=self.name)
+            call.event.set()
+
+        return call.result, False
+
+    def stats(self):
+        """Get executed and saved counts for this group"""
+        return {
+            'executions': EXECUTIONS.value(group=self.name),
+            'saved': SAVED.value(group=self.name),
+        }
@@ -0,0 +1,252 @@
+"""
+Precomputed snapshots of the dashboard's preset views
+
+Every dashboard load fires the same six aggregations, and most visitors
+never change the filters. After each ingest the collector renders those
+responses for the default view and for each single-year and single-catch
+area preset, and stores them gzipped under a directory per dataset
+version:
+
+    <SNAPSHOT_DIR>/latest.json                {"version": N}
+    <SNAPSHOT_DIR>/v<N>/index.json            path + query string of each file
+    <SNAPSHOT_DIR>/v<N>/<preset>/<endpoint>.json.gz
+
+The server answers matching requests from these files (they can equally
+be published behind a CDN). Only presets touched by changed rows are
+re-rendered; the rest are linked from the previous version.
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+from contextlib import closing
+from datetime import datetime
+from urllib.parse import parse_qs, urlencode
+
+from .config import Config
+from . import database
+
+
+# Filters the dashboard starts with (see currentFilters in app.js)
+DEFAULT_PARAMS = {
+    'species': ['chinook', 'coho', 'chum', 'pink', 'sockeye'],
+    'time_unit': ['yearly'],
+}
+
+# Matches TREND_MAX_POINTS in app.js
+TREND_MAX_POINTS = 1000
+
+INDEX = 'index.json'
+LATEST = 'latest.json'
+
+
+# (path, fetch, extra params): the requests made by loadData() in app.js
+ENDPOINTS = [
+    ('/api/stats', database.get_statistics, {}),
+    ('/api/trend', database.get_trend_data, {'max_points': [str(TREND_MAX_POINTS)], 'format': ['columns']}),
+    ('/api/species', database.get_species_totals, {}),
+    ('/api/areas', database.get_area_totals, {}),
+    ('/api/monthly', database.get_monthly_data, {'format': ['columns']}),
+    ('/api/map_data', database.get_map_data, {}),
+]
+
+
+def version_dir(version, directory=None):
+    """Directory holding the snapshots of a dataset version"""
+    return os.path.join(directory or Config.SNAPSHOT_DIR, f"v{version}")
+
+
+def get_presets(conn=None):
+    """
+    List the preset views of the current data
+
+    Args:
+        conn: Connection to the database to list them from (default: the
+            served one)
+
+    Returns:
+        list: (name, filters, year, catch_area) per preset; year and
+        catch_area are None unless the preset is limited to one
+    """
+    options = database.get_filter_options(conn=conn)
+    presets = [('default', {}, None, None)]
+    for year in options['years']:
+        presets.append((f"year-{year}", {'year_start': [year], 'year_end': [year]}, year, None))
+
+    names = set()
+    for area in options['areas']:
+        name = 'area-' + (re.sub(r'[^a-z0-9]+', '-', area.lower()).strip('-') or 'unnamed')
+        while name in names:
+            name += '-'
+        names.add(name)
+        presets.append((name, {'catch_area': [area]}, None, area))
+    return presets
+
+
+def latest_version(directory=None):
+    """Version of the most recently built snapshots, or None"""
+    try:
+        with open(os.path.join(directory or Config.SNAPSHOT_DIR, LATEST)) as f:
+            return json.load(f)['version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+_build_lock = threading.Lock()
+
+
+def build_snapshots(db_path, directory, version, changed_years=None, changed_areas=None):
+    """
+    Render and store the preset views for a dataset version
+
+    When the previous version's snapshots exist, only presets touched by
+    the changed rows (the default view, their years and their catch areas)
+    are rendered again; the others are hard-linked (or copied) unchanged.
+
+    Args:
+        db_path: Database to render them from
+        directory: Snapshot directory of that database
+        version: Dataset version the database is at
+        changed_years: Years ('YYYY') of inserted or updated rows, or None
+            to render every preset
+        changed_areas: Catch areas of inserted or updated rows, or None
+
+    Returns:
+        tuple: (presets rendered, presets reused)
+    """
+    with _build_lock, closing(database.get_db_connection(db_path)) as conn:
+        previous_dir = version_dir(version - 1, directory) if latest_version(directory) == version - 1 else None
+        full = previous_dir is None or changed_years is None or changed_areas is None
+
+        target = version_dir(version, directory)
+        tmp_dir = f"{target}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        files = []
+        rendered = reused = 0
+        for name, filters, year, area in get_presets(conn):
+            touched = full or (year is None and area is None) \
+                or year in changed_years or area in changed_areas
+            reuse = not touched and os.path.isdir(os.path.join(previous_dir, name))
+            os.makedirs(os.path.join(tmp_dir, name))
+
+            for path, fetch, extra in ENDPOINTS:
+                params = dict(DEFAULT_PARAMS, **filters, **extra)
+                filename = f"{name}/{path.rsplit('/', 1)[-1]}.json.gz"
+                if reuse:
+                    _link_or_copy(os.path.join(previous_dir, filename), os.path.join(tmp_dir, filename))
+                else:
+                    body = json.dumps(fetch(params, conn=conn)).encode()
+                    with open(os.path.join(tmp_dir, filename), 'wb') as f:
+                        # mtime=0 keeps unchanged views byte-identical across builds
+                        f.write(gzip.compress(body, 9, mtime=0))
+                files.append({'path': path, 'query': urlencode(params, doseq=True), 'file': filename})
+
+            if reuse:
+                reused += 1
+            else:
+                rendered += 1
+
+        with open(os.path.join(tmp_dir, INDEX), 'w') as f:
+            json.dump({'version': version, 'created_at': datetime.now().isoformat(), 'files': files}, f)
+
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(tmp_dir, target)
+        _forget_index()
+        _write_latest(version, directory)
+        _prune(version, directory)
+        return rendered, reused
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _write_latest(version, directory):
+    path = os.path.join(directory, LATEST)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump({'version': version}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _prune(version, directory):
+    """Remove versions older than the last SNAPSHOT_KEEP_VERSIONS"""
+    for entry in os.listdir(directory):
+        match = re.fullmatch(r'v(\d+)(\.tmp)?', entry)
+        if match and int(match.group(1)) <= version - Config.SNAPSHOT_KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+# (version, {(path, canonical params): file path}) of the loaded index
+_index = (None, {})
+_index_lock = threading.Lock()
+
+
+def _get_index(version):
+    global _index
+    loaded_version, files = _index
+    if loaded_version == version:
+        return files
+
+    with _index_lock:
+        if _index[0] != version:
+            files = {}
+            directory = version_dir(version)
+            try:
+                with open(os.path.join(directory, INDEX)) as f:
+                    entries = json.load(f)['files']
+            except (OSError, ValueError, KeyError):
+                return {}  # not built (yet) for this version
+            for entry in entries:
+                key = (entry['path'], database.canonical_params(parse_qs(entry['query'])))
+                files[key] = os.path.join(directory, entry['file'])
+            _index = (version, files)
+        return _index[1]
+
+
+def _forget_index():
+    global _index
+    with _index_lock:
+        _index = (None, {})
+
+
+def lookup(key, version):
+    """
+    Get the stored response for a request, if it is a preset view
+
+    Args:
+        key: (path, canonical params) of the request
+        version: Current dataset version
+
+    Returns:
+        bytes: gzipped JSON body, or None
+    """
+    filename = _get_index(version).get(key)
+    if filename is None:
+        return None
+    try:
+        with open(filename, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def ensure_built(version):
+    """Build the snapshots for version in the background if they are missing"""
+    if os.path.isdir(version_dir(version)):
+        return
+
+    def build():
+        try:
+            rendered, _ = build_snapshots(Config.DB_PATH, Config.SNAPSHOT_DIR, version)
+            print(f"📦 Built {rendered} preset view snapshots for data version {version}")
+        except Exception as e:
+            print(f"Warning: Could not build preset view snapshots: {e}")
+
+    threading.Thread(target=build, name='snapshot-build', daemon=True).start()
@@ -0,0 +1,161 @@
+"""
+Popular query results persisted across restarts
+
+A new instance starts with empty result caches, so the first visitors
+after a scale-from-zero pay for a full scan on every panel that isn't a
+preset snapshot. The server counts how often each (path, canonical
+params) misses the snapshots, and at the end of each refresh the
+collector renders the WARM_CACHE_ENTRIES most requested ones for the new
+dataset version into one gzipped file next to the database:
+
+    <database dir>/warm_cache.json.gz   {"version", "created_at",
+                                         "entries": [{"path", "query",
+                                                      "hits", "body"}]}
+
+It is uploaded to GCS with the database, and instances load it at startup
+if it was rendered for the version their database is at. The hit counts
+travel with it (halved at every refresh, so popularity follows recent
+traffic). Binary chart responses aren't persisted.
+"""
+import gzip
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import closing
+from datetime import datetime
+from urllib.parse import parse_qs, urlencode
+
+from .config import Config
+from . import cache, chart_formats, database
+
+
+# Endpoints served through serve_query, and their data functions
+ENDPOINTS = {
+    '/api/stats': database.get_statistics,
+    '/api/areas': database.get_area_totals,
+    '/api/filter_options': database.get_filter_options,
+    '/api/yearly': database.get_yearly_data,
+    '/api/trend': database.get_trend_data,
+    '/api/species': database.get_species_totals,
+    '/api/monthly': database.get_monthly_data,
+    '/api/map_data': database.get_map_data,
+    '/api/analytics': database.get_analytics,
+    '/api/matrix': database.get_matrix,
+}
+
+# Persisted responses of the current dataset version
+results = cache.ResultCache('warm', Config.WARM_CACHE_ENTRIES)
+
+# Requests per (path, canonical params)
+_hits = Counter()
+_hits_lock = threading.Lock()
+
+
+def record_hit(key):
+    """Count a request for (path, canonical params) that no snapshot answered"""
+    if key[0] not in ENDPOINTS:
+        return
+    with _hits_lock:
+        _hits[key] += 1
+        if len(_hits) > Config.WARM_CACHE_TRACKED:
+            # Forget the less requested half
+            for stale, _ in _hits.most_common()[Config.WARM_CACHE_TRACKED // 2:]:
+                del _hits[stale]
+
+
+def read_file(path=None):
+    """Read the persisted results (default: Config.WARM_CACHE_PATH), or None if there are none"""
+    try:
+        with gzip.open(path or Config.WARM_CACHE_PATH, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _entry_key(entry):
+    return (entry['path'], database.canonical_params(parse_qs(entry['query'])))
+
+
+def _seed(data):
+    """Add the hit counts of a persisted file (call with _hits_lock held)"""
+    for entry in (data or {}).get('entries', []):
+        if entry.get('hits'):
+            _hits[_entry_key(entry)] += entry['hits']
+
+
+def build(db_path, path, version):
+    """
+    Render the most requested queries for a dataset version and persist them
+
+    Responses are also served from this process right away if the database
+    is the one it serves.
+
+    Args:
+        db_path: Database to render the responses from
+        path: File to write them to
+        version: Dataset version the database is at
+
+    Returns:
+        int: Number of responses written
+    """
+    with _hits_lock:
+        if not _hits:
+            # A collector run in its own process: popularity as last persisted
+            _seed(read_file(path))
+        popular = _hits.most_common(Config.WARM_CACHE_ENTRIES)
+        for key in list(_hits):
+            _hits[key] //= 2
+            if not _hits[key]:
+                del _hits[key]
+
+    entries = []
+    bodies = {}
+    with closing(database.get_db_connection(db_path)) as conn:
+        for key, hits in popular:
+            endpoint, items = key
+            params = {name: list(values) for name, values in items}
+            if chart_formats.get_format(params) == 'binary':
+                continue
+            try:
+                body = json.dumps(ENDPOINTS[endpoint](params, conn=conn)).encode()
+            except Exception as e:
+                # e.g. parameters a newer release no longer accepts
+                print(f"Warning: Could not render {endpoint}?{urlencode(params, doseq=True)}: {e}")
+                continue
+            entries.append({'path': endpoint, 'query': urlencode(params, doseq=True),
+                            'hits': hits // 2, 'body': body.decode()})
+            bodies[key] = body
+
+    data = {'version': version, 'created_at': datetime.now().isoformat(), 'entries': entries}
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+    if os.path.abspath(db_path) == os.path.abspath(Config.DB_PATH):
+        for key, body in bodies.items():
+            results.put(key, version, body)
+    return len(entries)
+
+
+def load(version):
+    """
+    Load the persisted results at startup
+
+    Hit counts are always taken over; responses only if they were rendered
+    for the given dataset version.
+
+    Returns:
+        int: Number of responses loaded
+    """
+    data = read_file()
+    if data is None:
+        return 0
+    with _hits_lock:
+        _seed(data)
+    if data.get('version') != version:
+        return 0
+    for entry in data['entries']:
+        results.put(_entry_key(entry), version, entry['body'].encode())
+    return len(data['entries'])
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Ingest Throughput Benchmark
+Runs WDFWCreelCollector.fetch_all_data against a local stand-in for the
+WDFW export endpoint (export?sample_date=N&_format=csv), serving generated
+CSVs with the real column names, duplicate rows, corrected rows, the
+repeated-old-year bug and a 404 past the last year
+Reports rows/sec, peak RSS and time per phase for a full collection and an
+incremental re-collection over the resulting database
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
+from generate_synthetic_data import BASE_ROWS, generate_day, plan_days
+
+
+# Column names exactly as they appear in the WDFW CSV export
+CSV_HEADERS = [
+    'Sample date', 'Ramp/site', 'Catch area', '# Interviews (Boat or Shore)', 'Anglers',
+    'Chinook', 'Chinook (per angler)', 'Coho', 'Chum', 'Pink', 'Sockeye', 'Lingcod', 'Halibut',
+]
+
+# Days at the end of the current season only published by the 'update' revision
+NEW_DAYS = 14
+
+
+def _format_count(value):
+    return str(int(value)) if value == int(value) else str(value)
+
+
+def _csv_row(record):
+    """Turn a generate_day() tuple into an export row"""
+    (sample_date, ramp, area, interviews, anglers,
+     chinook, chinook_per_angler, coho, chum, pink, sockeye, lingcod, halibut, _) = record
+    return [sample_date, ramp, area or 'N/A', interviews, anglers,
+            _format_count(chinook), chinook_per_angler,
+            *(_format_count(v) for v in (coho, chum, pink, sockeye, lingcod, halibut))]
+
+
+def _corrected(record):
+    """A record as it appears after WDFW corrects its chinook count"""
+    values = list(record)
+    values[5] += 1
+    values[6] = round(values[5] / values[4], 2)
+    return tuple(values)
+
+
+def _render_csv(records, rnd, duplicate_rate):
+    """Render one year's export, repeating some rows verbatim"""
+    out = StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADERS)
+    rows = 0
+    for record in records:
+        row = _csv_row(record)
+        writer.writerow(row)
+        rows += 1
+        if rnd.random() < duplicate_rate:
+            writer.writerow(row)
+            rows += 1
+    return out.getvalue().encode(), rows
+
+
+def build_exports(rows, seed=42, start_year=2013, end_year=None,
+                  duplicate_rate=0.01, correction_rate=0.02):
+    """
+    Generate the CSV exports for two publications of the dataset
+
+    'initial' is missing the last NEW_DAYS survey days of the current
+    season. 'update' adds them and corrects the catch on a fraction of the
+    rows from the two most recent seasons, like WDFW's weekly revisions.
+
+    Returns:
+        dict: revision -> list of (csv_bytes, row_count), newest year first
+    """
+    by_year = {}
+    for day, count in plan_days(rows, start_year, end_year):
+        by_year.setdefault(day.year, []).append((day, count))
+
+    rnd = random.Random(seed)
+    exports = {'initial': [], 'update': []}
+    for rank, year in enumerate(sorted(by_year, reverse=True)):
+        days = by_year[year]
+        published = days[:-NEW_DAYS] if rank == 0 else days
+
+        initial = [r for day, count in published for r in generate_day(day, count, seed)]
+        update = [r for day, count in days for r in generate_day(day, count, seed)]
+        if rank < 2:
+            update = [_corrected(r) if rnd.random() < correction_rate else r for r in update]
+
+        exports['initial'].append(_render_csv(initial, random.Random(seed + year), duplicate_rate))
+        exports['update'].append(_render_csv(update, random.Random(seed + year), duplicate_rate))
+    return exports
+
+
+class FakeExportHandler(BaseHTTPRequestHandler):
+    """Serves export?sample_date=N&_format=csv like wdfw.wa.gov"""
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query, keep_blank_values=True)
+        if not parsed.path.endswith('/export') or params.get('_format') != ['csv']:
+            self.send_error(404, "Not found")
+            return
+        try:
+            sample_date = int(params['sample_date'][0])
+        except (KeyError, ValueError):
+            self.send_error(400, "Invalid sample_date")
+            return
+
+        export = self.server.export_for(sample_date)
+        if export is None:
+            self.send_error(404, "Not found")
+            return
+
+        body, rows = export
+        self.server.record(rows)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeExportServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the WDFW export endpoint
+
+    sample_date=1 is the current season. Past the oldest season the real
+    endpoint keeps returning the oldest season again (every row a
+    duplicate) for a while before it finally 404s; repeat_years controls
+    how many sample_dates show that bug.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, exports, repeat_years=1, port=0):
+        super().__init__(('127.0.0.1', port), FakeExportHandler)
+        self.exports = exports
+        self.revision = 'initial'
+        self.repeat_years = repeat_years
+        self.requests = 0
+        self.rows_served = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/fishing/reports/creel/puget-annual/export"
+
+    def export_for(self, sample_date):
+        with self._lock:
+            self.requests += 1
+        years = self.exports[self.revision]
+        if 1 <= sample_date <= len(years):
+            return years[sample_date - 1]
+        if len(years) < sample_date <= len(years) + self.repeat_years:
+            return years[-1]
+        return None
+
+    def record(self, rows):
+        with self._lock:
+            self.rows_served += rows
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.rows_served = 0
+
+
+def _collect(base_url, data_dir, max_years, log_path, results):
+    """Subprocess: run one collection and report its timings and peak RSS"""
+    import resource
+
+    # Everything the collector derives from the database stays in data_dir,
+    # never next to the real one
+    os.environ['DB_PATH'] = os.path.join(data_dir, 'creel_data.db')
+    os.environ['SNAPSHOT_DIR'] = os.path.join(data_dir, 'snapshots')
+    os.environ['PARTITION_DIR'] = os.path.join(data_dir, 'partitions')
+    os.environ['COLUMN_STORE_PATH'] = os.path.join(data_dir, 'creel_records.col')
+    os.environ['WARM_CACHE_PATH'] = os.path.join(data_dir, 'warm_cache.json.gz')
+    from data_collector import WDFWCreelCollector
+
+    collector_class = type('BenchmarkCollector', (WDFWCreelCollector,),
+                           {'BASE_URL': base_url, 'DATA_DIR': data_dir})
+    with open(log_path, 'a') as log, redirect_stdout(log):
+        collector = collector_class()
+        try:
+            before = collector._get_record_count()
+            start = time.perf_counter()
+            collector.fetch_all_data(max_years=max_years)
+            wall = time.perf_counter() - start
+            after = collector._get_record_count()
+        finally:
+            collector.close()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS
+    peak_rss_kb = peak_rss / 1024 if sys.platform == 'darwin' else peak_rss
+    results.put({
+        'wall_seconds': wall,
+        'records_before': before,
+        'records_after': after,
+        'records_updated': len(collector.conflicts),
+        'peak_rss_kb': peak_rss_kb,
+        'phases': collector.phase_timings,
+    })
+
+
+def run_collection(server, revision, data_dir, max_years, log_path):
+    """Run fetch_all_data in a fresh process against one revision"""
+    server.revision = revision
+    server.reset_counters()
+
+    # A spawned process so peak RSS is the collector's own, not this one's
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_collect,
+                              args=(server.base_url, data_dir, max_years, log_path, results))
+    process.start()
+    result = results.get()
+    process.join()
+
+    wall = result['wall_seconds']
+    phases = result['phases']
+    phases['other'] = max(0.0, wall - sum(phases.values()))
+    return {
+        'revision': revision,
+        'requests': server.requests,
+        'rows_fetched': server.rows_served,
+        'rows_inserted': result['records_after'] - result['records_before'],
+        'rows_updated': result['records_updated'],
+        'records_in_database': result['records_after'],
+        'wall_seconds': round(wall, 3),
+        'rows_per_second': round(server.rows_served / wall, 1) if wall else None,
+        'peak_rss_mb': round(result['peak_rss_kb'] / 1024, 1),
+        'phases_seconds': {phase: round(seconds, 3) for phase, seconds in phases.items()},
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the collector against a local fake WDFW export")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Dataset size as a multiple of production rows (default: 1)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start-year', type=int, default=2013)
+    parser.add_argument('--duplicate-rate', type=float, default=0.01,
+                        help="Fraction of export rows repeated verbatim (default: 0.01)")
+    parser.add_argument('--correction-rate', type=float, default=0.02,
+                        help="Fraction of recent rows corrected in the update (default: 0.02)")
+    parser.add_argument('--repeat-years', type=int, default=1,
+                        help="sample_dates past the oldest season that repeat it (default: 1)")
+    parser.add_argument('--output', help="Write the JSON report here (default: stdout)")
+    parser.add_argument('--keep', action='store_true', help="Keep the database and collector log")
+    args = parser.parse_args()
+
+    rows = int(BASE_ROWS * args.scale)
+    print(f"Generating exports for {rows:,} rows...", file=sys.stderr)
+    exports = build_exports(rows, args.seed, args.start_year,
+                            duplicate_rate=args.duplicate_rate, correction_rate=args.correction_rate)
+    years = len(exports['initial'])
+    # Ask for more years than exist so the repeated-year bug and 404 are reached
+    max_years = years + args.repeat_years + 1
+
+    server = FakeExportServer(exports, repeat_years=args.repeat_years)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp(prefix='creel_ingest_')
+    data_dir = os.path.join(workdir, 'wdfw_creel_data')
+    log_path = os.path.join(workdir, 'collector.log')
+    try:
+        runs = {}
+        for name, revision in (('full', 'initial'), ('incremental', 'update')):
+            print(f"Running {name} collection...", file=sys.stderr)
+            runs[name] = run_collection(server, revision, data_dir, max_years, log_path)
+    finally:
+        server.shutdown()
+        server.server_close()
+        if args.keep:
+            print(f"Kept work directory: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'rows': rows,
+            'years': years,
+            'max_years': max_years,
+            'seed': args.seed,
+            'duplicate_rate': args.duplicate_rate,
+            'correction_rate': args.correction_rate,
+            'repeat_years': args.repeat_years,
+        },
+        'runs': runs,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    for name, run in runs.items():
+        phases = ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in run['phases_seconds'].items())
+        print(f"  {name:12} {run['rows_fetched']:>9,} rows  {run['rows_per_second']:>9,.0f} rows/s  "
+              f"peak RSS {run['peak_rss_mb']:.0f} MB  ({phases})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Trend Response Encoding Benchmark
+Compares building an undownsampled /api/trend body the buffered way
+(get_trend_data dicts, then json.dumps().encode()) with the streamed way
+(iter_trend_rows through app/jsonstream.py) on a generated or fixture
+database, writing both into a sink that stands in for the socket
+Reports time to first byte, total time and peak traced memory per time
+unit as JSON, and checks that both bodies are byte-identical
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+
+class Sink:
+    """Counts written bytes and remembers when the first ones arrived"""
+
+    def __init__(self, keep=False):
+        self.first_write = None
+        self.size = 0
+        self.parts = [] if keep else None
+
+    def write(self, data):
+        if self.first_write is None:
+            self.first_write = time.perf_counter()
+        self.size += len(data)
+        if self.parts is not None:
+            self.parts.append(data)
+
+
+def buffered(database, params, sink):
+    """The response as serve_query builds it"""
+    body = json.dumps(database.get_trend_data(params)).encode()
+    sink.write(body)
+
+
+def streamed(database, params, sink):
+    """The response as stream_trend_data builds it"""
+    from app import jsonstream
+    columns, rows = database.iter_trend_rows(params)
+    try:
+        for chunk in jsonstream.iter_json_array(rows, jsonstream.RowEncoder(columns)):
+            sink.write(chunk)
+    finally:
+        if hasattr(rows, 'close'):
+            rows.close()
+
+
+def measure(method, database, params, repeat):
+    """
+    Time one encoding method
+
+    Returns:
+        dict: median time to first byte and total time, peak traced
+            memory and body size
+    """
+    first_byte, total = [], []
+    for _ in range(repeat):
+        sink = Sink()
+        start = time.perf_counter()
+        method(database, params, sink)
+        end = time.perf_counter()
+        first_byte.append(sink.first_write - start)
+        total.append(end - start)
+
+    # Traced separately: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    method(database, params, Sink())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'first_byte_ms': round(statistics.median(first_byte) * 1000, 1),
+        'total_ms': round(statistics.median(total) * 1000, 1),
+        'peak_mb': round(peak / 1e6, 2),
+        'bytes': sink.size,
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Compare buffered and streamed encoding of /api/trend")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', help="Fixture database to read (default: generate one)")
+    source.add_argument('--scale', type=float, default=1.0,
+                        help="Scale of the generated database (multiple of production rows)")
+    parser.add_argument('--time-unit', action='append', choices=['daily', 'weekly', 'monthly', 'yearly'],
+                        help="Time unit to benchmark, repeatable (default: daily)")
+    parser.add_argument('--species', default='all', help="Species filter (default: all)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per method (default: 5)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='creel_json_')
+    db_path = args.db
+    if not db_path:
+        from generate_synthetic_data import BASE_ROWS, write_database
+        db_path = os.path.join(workdir, 'creel_data.db')
+        print(f"Generating {args.scale}x synthetic database...", file=sys.stderr)
+        with redirect_stdout(sys.stderr):
+            write_database(db_path, int(BASE_ROWS * args.scale), seed=args.seed)
+
+    # Read the database directly: no column store or season partitions
+    os.environ['DB_PATH'] = db_path
+    os.environ['COLUMN_STORE_PATH'] = os.path.join(workdir, 'creel_records.col')
+    os.environ['PARTITION_DIR'] = os.path.join(workdir, 'partitions')
+    from app import database
+
+    results = {}
+    try:
+        for time_unit in args.time_unit or ['daily']:
+            params = {'time_unit': [time_unit], 'species': [args.species]}
+            print(f"Encoding {time_unit} trend...", file=sys.stderr)
+
+            expected, actual = Sink(keep=True), Sink(keep=True)
+            buffered(database, params, expected)
+            streamed(database, params, actual)
+
+            results[time_unit] = {
+                'identical': b''.join(expected.parts) == b''.join(actual.parts),
+                'buffered': measure(buffered, database, params, args.repeat),
+                'streamed': measure(streamed, database, params, args.repeat),
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'config': {'db': args.db, 'scale': None if args.db else args.scale,
+                   'species': args.species, 'repeat': args.repeat},
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    for time_unit, result in results.items():
+        for method in ('buffered', 'streamed'):
+            stats = result[method]
+            print(f"  {time_unit:8} {method:9} first byte {stats['first_byte_ms']:8.1f}ms  "
+                  f"total {stats['total_ms']:8.1f}ms  peak {stats['peak_mb']:7.2f} MB  "
+                  f"{stats['bytes']:,} bytes", file=sys.stderr)
+        if not result['identical']:
+            print(f"\n❌ {time_unit}: streamed body differs from json.dumps()", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
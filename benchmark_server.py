@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP Load Test and Regression Benchmark
+Starts run_server against a generated or fixture database in a subprocess
+Replays the dashboard traffic mix: /api/filter_options bootstrap plus the
+six-way fan-out from app.js with varied years, species and catch areas
+Reports throughput and p50/p95/p99 per endpoint as JSON, and flags
+regressions against a baseline report
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from urllib.parse import urlencode
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The six requests app.js fires in parallel from loadData()
+FAN_OUT = ['/api/stats', '/api/trend', '/api/species', '/api/areas', '/api/monthly', '/api/map_data']
+SALMON = ['chinook', 'coho', 'chum', 'pink', 'sockeye']
+TREND_MAX_POINTS = 1000  # as sent by app.js
+TIME_UNITS = [('yearly', 50), ('monthly', 20), ('weekly', 15), ('daily', 15)]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint latencies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.recording = False
+
+    def record(self, endpoint, seconds, status):
+        if not self.recording:
+            return
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if status != 200:
+                key = str(status)
+                errors = self.errors.setdefault(endpoint, {})
+                errors[key] = errors.get(key, 0) + 1
+
+
+class DashboardUser:
+    """One simulated visitor: bootstrap, then repeated filter changes"""
+
+    def __init__(self, port, recorder, rnd, session_length):
+        self.port = port
+        self.recorder = recorder
+        self.rnd = rnd
+        self.session_length = session_length
+        self.pool = ThreadPoolExecutor(max_workers=len(FAN_OUT))
+        self.years = []
+        self.areas = []
+
+    def request(self, path, query=''):
+        url = path + ('?' + query if query else '')
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', url, headers={'Accept-Encoding': 'identity'})
+            response = conn.getresponse()
+            body = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            body, status = b'', 'connection_error'
+        finally:
+            conn.close()
+        self.recorder.record(path, time.perf_counter() - start, status)
+        return status, body
+
+    def fan_out(self, query):
+        def fetch(path):
+            if path == '/api/trend':
+                return self.request(path, (query + '&' if query else '') +
+                                    f'max_points={TREND_MAX_POINTS}&format=columns')
+            if path == '/api/monthly':
+                return self.request(path, (query + '&' if query else '') + 'format=columns')
+            return self.request(path, query)
+        list(self.pool.map(fetch, FAN_OUT))
+
+    def random_filters(self):
+        """Filter combination drawn from the dashboard's realistic mix"""
+        rnd = self.rnd
+        params = []
+        if self.years and rnd.random() < 0.6:
+            start = rnd.randrange(len(self.years))
+            end = rnd.randrange(start, len(self.years))
+            params += [('year_start', self.years[start]), ('year_end', self.years[end])]
+
+        roll = rnd.random()
+        if self.areas and roll < 0.4:
+            count = 1 if roll < 0.3 else rnd.randint(2, 3)
+            params += [('catch_area', a) for a in rnd.sample(self.areas, min(count, len(self.areas)))]
+
+        species = SALMON if rnd.random() < 0.6 else sorted(rnd.sample(SALMON, rnd.randint(1, 4)), key=SALMON.index)
+        params += [('species', s) for s in species]
+
+        units, weights = zip(*TIME_UNITS)
+        params.append(('time_unit', rnd.choices(units, weights=weights)[0]))
+        return urlencode(params)
+
+    def session(self):
+        # Page load: filter options and the default view in parallel (init())
+        default_query = urlencode([('species', s) for s in SALMON] + [('time_unit', 'yearly')])
+        options = self.pool.submit(self.request, '/api/filter_options')
+        self.fan_out(default_query)
+        status, body = options.result()
+        if status == 200:
+            data = json.loads(body)
+            self.years, self.areas = data.get('years', []), data.get('areas', [])
+
+        for _ in range(self.session_length):
+            self.fan_out(self.random_filters())
+
+    def run(self, stop_at):
+        try:
+            while time.time() < stop_at:
+                self.session()
+        finally:
+            self.pool.shutdown()
+
+
+def start_server(db_path, port, log_path):
+    """Start run_server in a subprocess and wait until it answers"""
+    env = dict(os.environ)
+    env.update({'PORT': str(port), 'DB_PATH': os.path.abspath(db_path)})
+    env.pop('GCS_BUCKET_NAME', None)  # never touch the real bucket
+
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-c', 'from app.server import run_server; run_server()'],
+        cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited early, see {log_path}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/metrics')
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start within 60s")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(recorder, elapsed, args, db_path):
+    endpoints = {}
+    total_requests = 0
+    total_errors = 0
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        errors = sum(recorder.errors.get(endpoint, {}).values())
+        total_requests += len(values)
+        total_errors += errors
+        endpoints[endpoint] = {
+            'requests': len(values),
+            'errors': errors,
+            'error_statuses': recorder.errors.get(endpoint, {}),
+            'throughput_rps': round(len(values) / elapsed, 2),
+            'mean_ms': round(sum(values) / len(values) * 1000, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2),
+        }
+
+    return {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'database': os.path.abspath(db_path),
+            'database_bytes': os.path.getsize(db_path),
+            'users': args.users,
+            'duration_seconds': args.duration,
+            'warmup_seconds': args.warmup,
+            'session_length': args.session_length,
+            'seed': args.seed,
+        },
+        'totals': {
+            'requests': total_requests,
+            'errors': total_errors,
+            'throughput_rps': round(total_requests / elapsed, 2),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    Compare a report against a baseline report
+
+    An endpoint regresses when its p95 latency grows, or its throughput
+    drops, by more than threshold (a fraction, e.g. 0.15 for 15%).
+
+    Returns:
+        list: Human-readable regression descriptions
+    """
+    regressions = []
+    for endpoint, base in baseline.get('endpoints', {}).items():
+        current = report['endpoints'].get(endpoint)
+        if current is None:
+            regressions.append(f"{endpoint}: missing from this run")
+            continue
+        if base['p95_ms'] and current['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(f"{endpoint}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if base['throughput_rps'] and current['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{endpoint}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current['errors'] > base['errors']:
+            regressions.append(f"{endpoint}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Load test the dashboard API and report latency percentiles")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', help="Fixture database to serve (default: generate one)")
+    source.add_argument('--scale', type=float, default=1.0,
+                        help="Scale of the generated database (multiple of production rows)")
+    parser.add_argument('--users', type=int, default=8, help="Concurrent simulated visitors")
+    parser.add_argument('--duration', type=float, default=30, help="Measured seconds")
+    parser.add_argument('--warmup', type=float, default=5, help="Unmeasured warmup seconds")
+    parser.add_argument('--session-length', type=int, default=4, help="Filter changes per visit")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--output', help="Write the JSON report here (default: stdout)")
+    parser.add_argument('--baseline', help="Baseline JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Allowed fractional regression vs baseline (default: 0.15)")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated database and server log")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='creel_bench_')
+    db_path = args.db
+    if not db_path:
+        from generate_synthetic_data import BASE_ROWS, write_database
+        db_path = os.path.join(workdir, 'creel_data.db')
+        print(f"Generating {args.scale}x synthetic database...", file=sys.stderr)
+        with redirect_stdout(sys.stderr):
+            write_database(db_path, int(BASE_ROWS * args.scale), seed=args.seed)
+
+    log_path = os.path.join(workdir, 'server.log')
+    server = start_server(db_path, args.port, log_path)
+    try:
+        recorder = Recorder()
+        stop_at = time.time() + args.warmup + args.duration
+        master = random.Random(args.seed)
+        users = [DashboardUser(args.port, recorder, random.Random(master.random()), args.session_length)
+                 for _ in range(args.users)]
+        threads = [threading.Thread(target=user.run, args=(stop_at,), daemon=True) for user in users]
+
+        print(f"Running {args.users} users for {args.warmup}s warmup + {args.duration}s...", file=sys.stderr)
+        for thread in threads:
+            thread.start()
+        time.sleep(args.warmup)
+        recorder.recording = True
+        measure_start = time.time()
+        for thread in threads:
+            thread.join()
+        recorder.recording = False
+        elapsed = time.time() - measure_start
+        report = build_report(recorder, elapsed, args, db_path)
+    finally:
+        server.terminate()
+        server.wait()
+        if args.keep:
+            print(f"Kept work directory: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    for endpoint, stats in report['endpoints'].items():
+        print(f"  {endpoint:22} {stats['throughput_rps']:8.1f} req/s  p50 {stats['p50_ms']:8.1f}ms  "
+              f"p95 {stats['p95_ms']:8.1f}ms  p99 {stats['p99_ms']:8.1f}ms  errors {stats['errors']}",
+              file=sys.stderr)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
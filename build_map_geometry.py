@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Build zoom-tiered map geometry for /api/map_geometry
+Reads the WDFW marine areas saved by fetch_wdfw_marine_areas.py and the
+hand-traced polygons in static/js/custom-areas.js, simplifies them at
+each tier's tolerance and writes quantized, gzipped TopoJSON tiers
+"""
+import argparse
+import json
+import os
+
+from app.config import Config
+from app.geometry import write_tiers
+
+MARINE_AREAS_FILE = 'static/data/wdfw_marine_areas.json'
+CUSTOM_AREAS_FILE = 'static/js/custom-areas.js'
+
+
+def load_custom_areas(filename=CUSTOM_AREAS_FILE):
+    """Read the customAreaPolygons object literal out of custom-areas.js"""
+    with open(filename, encoding='utf-8') as f:
+        source = f.read()
+    literal = source[source.index('=') + 1:source.rindex('}') + 1]
+    features = []
+    for name, feature in json.loads(literal).items():
+        properties = dict(feature.get('properties') or {})
+        properties.update({'name': name, 'custom': True})
+        features.append(dict(feature, properties=properties))
+    return features
+
+
+def build(marine_areas_file=MARINE_AREAS_FILE, output_dir=None):
+    """Build and store every tier, printing their sizes"""
+    output_dir = output_dir or Config.MAP_GEOMETRY_DIR
+    with open(marine_areas_file, encoding='utf-8') as f:
+        features = json.load(f).get('features', [])
+    features += load_custom_areas()
+
+    source_bytes = os.path.getsize(marine_areas_file) + os.path.getsize(CUSTOM_AREAS_FILE)
+    print(f"🗺️  {len(features)} areas, {source_bytes / 1024:.1f} KB of source geometry")
+
+    for entry in write_tiers(features, output_dir):
+        zoom = f"zoom <= {entry['max_zoom']}" if entry['max_zoom'] is not None else "higher zoom"
+        print(f"  {zoom:12} tolerance {entry['tolerance']:<8} "
+              f"{entry['bytes'] / 1024:8.1f} KB  ({entry['gzip_bytes'] / 1024:.1f} KB gzipped)")
+    print(f"✅ Saved tiers to {output_dir}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build zoom-tiered map geometry")
+    parser.add_argument('--input', default=MARINE_AREAS_FILE, help="WDFW marine areas GeoJSON")
+    parser.add_argument('--output-dir', help=f"Output directory (default: {Config.MAP_GEOMETRY_DIR})")
+    args = parser.parse_args()
+    build(args.input, args.output_dir)
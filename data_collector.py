@@ -8,14 +8,90 @@ Uses composite keys + data hashing to detect updates vs duplicates
 
 import requests
 import csv
+import gzip
 import json
 import sqlite3
 import os
 import hashlib
+import time
 from io import StringIO
 from datetime import datetime
 
 
+# Columns written by export_records (internal bookkeeping fields are left out)
+EXPORT_FIELDS = [
+    'sample_date', 'ramp_site', 'catch_area', 'interviews', 'anglers',
+    'chinook', 'chinook_per_angler', 'coho', 'chum', 'pink', 'sockeye', 'lingcod', 'halibut'
+]
+EXPORT_FORMATS = ('ndjson', 'csv', 'columnar')
+EXPORT_CHUNK_ROWS = 5000
+
+
+def create_schema(conn):
+    """Create the creel_records table and its indices if they don't exist"""
+    cursor = conn.cursor()
+
+    # Create table with all expected columns
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS creel_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sample_date TEXT,
+            ramp_site TEXT,
+            catch_area TEXT,
+            interviews INTEGER,
+            anglers INTEGER,
+            chinook REAL,
+            chinook_per_angler REAL,
+            coho REAL,
+            chum REAL,
+            pink REAL,
+            sockeye REAL,
+            lingcod REAL,
+            halibut REAL,
+            data_hash TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(sample_date, ramp_site, catch_area, interviews, anglers)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    create_indices(conn)
+
+
+def bump_data_version(conn):
+    """Increment the dataset version that server-side caches are keyed on
+
+    Returns:
+        int: The new data_version
+    """
+    now = datetime.now().isoformat()
+    conn.execute('''
+        INSERT OR REPLACE INTO metadata (key, value, updated_at)
+        VALUES ('data_version',
+                COALESCE((SELECT CAST(value AS INTEGER) FROM metadata WHERE key = 'data_version'), 0) + 1,
+                ?)
+    ''', (now,))
+    conn.commit()
+    return int(conn.execute("SELECT value FROM metadata WHERE key = 'data_version'").fetchone()[0])
+
+
+def create_indices(conn):
+    """Create indices for common queries"""
+    cursor = conn.cursor()
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sample_date ON creel_records(sample_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_catch_area ON creel_records(catch_area)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ramp_site ON creel_records(ramp_site)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_data_hash ON creel_records(data_hash)')
+
+
 class WDFWCreelCollector:
     """Collect all WDFW creel data from CSV exports and store in SQLite"""
 
@@ -24,10 +100,21 @@ class WDFWCreelCollector:
     DB_FILE = "creel_data.db"
 
     def __init__(self):
+        self.db_path = os.path.join(self.DATA_DIR, self.DB_FILE)
+        # Where the snapshots, partitions, columnar copy and warm cache of
+        # this database go (the server's locations if it serves it)
+        from app.config import Config
+        self.derived_paths = Config.derived_paths(self.db_path)
         self.headers = []
         self._ensure_data_directory()
         self.conn = self._init_database()
         self.conflicts = []  # Track data conflicts
+        # Years and catch areas of inserted or updated rows (their preset
+        # view snapshots are rebuilt after the fetch)
+        self.changed_years = set()
+        self.changed_areas = set()
+        # Seconds spent in each stage of fetch_all_data
+        self.phase_timings = {'download': 0.0, 'parse': 0.0, 'upsert': 0.0, 'commit': 0.0}
 
     def _ensure_data_directory(self):
         """Create data directory if it doesn't exist"""
@@ -37,7 +124,7 @@ class WDFWCreelCollector:
 
     def _init_database(self):
         """Initialize SQLite database"""
-        db_path = os.path.join(self.DATA_DIR, self.DB_FILE)
+        db_path = self.db_path
         is_new = not os.path.exists(db_path)
 
         conn = sqlite3.connect(db_path)
@@ -48,37 +135,7 @@ class WDFWCreelCollector:
         else:
             print(f"🗄️ Connected to database: {os.path.abspath(db_path)}")
 
-        # Create table with all expected columns
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS creel_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sample_date TEXT,
-                ramp_site TEXT,
-                catch_area TEXT,
-                interviews INTEGER,
-                anglers INTEGER,
-                chinook REAL,
-                chinook_per_angler REAL,
-                coho REAL,
-                chum REAL,
-                pink REAL,
-                sockeye REAL,
-                lingcod REAL,
-                halibut REAL,
-                data_hash TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(sample_date, ramp_site, catch_area, interviews, anglers)
-            )
-        ''')
-
-        # Create indices for common queries
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sample_date ON creel_records(sample_date)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_catch_area ON creel_records(catch_area)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ramp_site ON creel_records(ramp_site)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_data_hash ON creel_records(data_hash)')
-
+        create_schema(conn)
         conn.commit()
         return conn
 
@@ -170,7 +227,10 @@ class WDFWCreelCollector:
                 data_hash
             ))
 
-            return 'inserted' if cursor.rowcount > 0 else 'duplicate'
+            if cursor.rowcount > 0:
+                self._mark_changed(sample_date, catch_area)
+                return 'inserted'
+            return 'duplicate'
 
         except sqlite3.IntegrityError:
             # Record exists - check if data changed
@@ -217,6 +277,7 @@ class WDFWCreelCollector:
                     interviews,
                     anglers
                 ))
+                self._mark_changed(sample_date, catch_area)
                 return 'updated'
 
             return 'duplicate'
@@ -225,6 +286,11 @@ class WDFWCreelCollector:
             print(f"⚠️ Database error: {e}")
             return 'error'
 
+    def _mark_changed(self, sample_date, catch_area):
+        """Remember the year and catch area of a changed row"""
+        self.changed_years.add(sample_date[-4:])
+        self.changed_areas.add(catch_area)
+
     def fetch_all_data(self, max_years=5):
         """Fetch all available data by iterating through sample_date values
 
@@ -261,6 +327,7 @@ class WDFWCreelCollector:
             print(f"[Sample {sample_date}] Year {data_year}... ", end="", flush=True)
 
             try:
+                phase_start = time.perf_counter()
                 response = requests.get(url, timeout=30)
 
                 # Check if we've reached the end
@@ -269,9 +336,13 @@ class WDFWCreelCollector:
                     break
 
                 response.raise_for_status()
+                csv_text = response.text
+                self.phase_timings['download'] += time.perf_counter() - phase_start
 
                 # Parse CSV
-                data = self._parse_csv(response.text)
+                phase_start = time.perf_counter()
+                data = self._parse_csv(csv_text)
+                self.phase_timings['parse'] += time.perf_counter() - phase_start
 
                 if not data:
                     print("❌ No data returned")
@@ -283,6 +354,7 @@ class WDFWCreelCollector:
                 batch_updated = 0
                 batch_duplicates = 0
 
+                phase_start = time.perf_counter()
                 for record in data:
                     result = self._insert_or_update_record(record)
                     if result == 'inserted':
@@ -291,9 +363,12 @@ class WDFWCreelCollector:
                         batch_updated += 1
                     else:
                         batch_duplicates += 1
+                self.phase_timings['upsert'] += time.perf_counter() - phase_start
 
                 # Commit the batch
+                phase_start = time.perf_counter()
                 self.conn.commit()
+                self.phase_timings['commit'] += time.perf_counter() - phase_start
 
                 new_records_count += batch_new
                 updated_records_count += batch_updated
@@ -334,6 +409,18 @@ class WDFWCreelCollector:
                 print(f"⚠️ Error: {e}")
                 break
 
+        # New or corrected rows change the filter dimensions they touch, and
+        # invalidate server-side caches and the preset view snapshots
+        if new_records_count or updated_records_count:
+            from app.database import refresh_dimensions
+            refresh_dimensions(self.conn, self.changed_years, self.changed_areas)
+            self.conn.commit()
+            version = bump_data_version(self.conn)
+            self.build_partitions(version, self.changed_years)
+            self.build_column_store(version)
+            self.build_snapshots(version, self.changed_years, self.changed_areas)
+            self.build_warm_cache(version)
+
         # Get final count
         final_count = self._get_record_count()
 
@@ -346,6 +433,8 @@ class WDFWCreelCollector:
         print(f"Records updated: {updated_records_count:,}")
         print(f"Duplicates filtered: {duplicate_count:,}")
         print(f"Years fetched: {sample_date - 1} (limit: {max_years})")
+        print("Time per phase: " + ", ".join(
+            f"{phase} {seconds:.2f}s" for phase, seconds in self.phase_timings.items()))
 
         # Show statistics
         self._show_statistics()
@@ -433,36 +522,161 @@ class WDFWCreelCollector:
 
         print("\nNote: This may indicate data quality issues in source CSV files.")
 
-    def export_to_json(self, filename=None):
-        """Export database to JSON file"""
+    def export_records(self, filename=None, fmt='ndjson', compress=False,
+                       year_start=None, year_end=None, catch_areas=None):
+        """Stream records to an NDJSON, CSV or columnar snapshot file
+
+        Rows are read from the cursor in chunks and written as they arrive,
+        so memory use doesn't grow with the table (the columnar snapshot
+        keeps compact per-column arrays until it is written).
+
+        Args:
+            filename: Output file name in DATA_DIR (default: timestamped)
+            fmt: 'ndjson', 'csv' or 'columnar'
+            compress: gzip the output (ndjson and csv only)
+            year_start, year_end: Optional year range, as on the dashboard
+            catch_areas: Optional list of catch areas to include
+        """
+        from app import columnar
+        from app.database import DATE_STRING_SQL, build_where_clause
+
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if compress and fmt == 'columnar':
+            raise ValueError("Columnar snapshots can't be compressed (they are memory-mapped)")
+
         if filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"creel_export_{timestamp}.json"
+            extension = {'ndjson': 'ndjson', 'csv': 'csv', 'columnar': 'col'}[fmt]
+            filename = f"creel_export_{timestamp}.{extension}" + ('.gz' if compress else '')
 
         filepath = os.path.join(self.DATA_DIR, filename)
 
+        # Same filters as the dashboard API
+        params = {}
+        if year_start:
+            params['year_start'] = [str(year_start)]
+        if year_end:
+            params['year_end'] = [str(year_end)]
+        if catch_areas:
+            params['catch_area'] = list(catch_areas)
+        where_clause, query_params = build_where_clause(params)
+
+        if fmt == 'columnar':
+            fields = [f"{DATE_STRING_SQL} as sample_day" if f == 'sample_day' else f for f in columnar.FIELDS]
+        else:
+            fields = EXPORT_FIELDS
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM creel_records')
-
-        # Convert to list of dicts
-        records = []
-        for row in cursor.fetchall():
-            record = dict(row)
-            # Remove internal fields
-            record.pop('id', None)
-            record.pop('data_hash', None)
-            record.pop('created_at', None)
-            record.pop('updated_at', None)
-            records.append(record)
+        cursor.execute(f"SELECT {', '.join(fields)} FROM creel_records {where_clause} ORDER BY id",
+                       query_params)
 
+        count = 0
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(records, f, indent=2)
-            print(f"\n💾 Exported {len(records):,} records to: {os.path.abspath(filepath)}")
+            if fmt == 'columnar':
+                writer = columnar.SnapshotWriter(filepath)
+                for chunk in iter(lambda: cursor.fetchmany(EXPORT_CHUNK_ROWS), []):
+                    for row in chunk:
+                        writer.append(tuple(row))
+                count = writer.close()
+            else:
+                opener = gzip.open if compress else open
+                with opener(filepath, 'wt', encoding='utf-8', newline='') as f:
+                    if fmt == 'csv':
+                        csv_writer = csv.writer(f)
+                        csv_writer.writerow(EXPORT_FIELDS)
+                    for chunk in iter(lambda: cursor.fetchmany(EXPORT_CHUNK_ROWS), []):
+                        if fmt == 'csv':
+                            csv_writer.writerows(chunk)
+                        else:
+                            f.write(''.join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in chunk))
+                        count += len(chunk)
+
+            print(f"\n💾 Exported {count:,} records to: {os.path.abspath(filepath)}")
             return True
         except Exception as e:
             print(f"⚠️ Error exporting: {e}")
             return False
+        finally:
+            cursor.close()
+
+    def build_partitions(self, version, changed_years=None):
+        """Write the per-season partitions of creel_records
+
+        Args:
+            version: Dataset version the database is at
+            changed_years: Years of changed rows; other past seasons keep
+                their existing files. None writes every season.
+        """
+        from app import partitions
+
+        try:
+            start = time.perf_counter()
+            written, kept = partitions.write_partitions(self.db_path, self.derived_paths['partition_dir'],
+                                                        version, changed_years)
+            print(f"🗂️  Season partitions for data version {version}: {written} written, "
+                  f"{kept} unchanged ({time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            # Partitions are an optimization; queries fall back to the full database
+            print(f"⚠️ Could not write season partitions: {e}")
+
+    def build_column_store(self, version):
+        """Write the memory-mapped columnar copy of creel_records the server aggregates
+
+        Args:
+            version: Dataset version the database is at
+        """
+        from app import column_store
+
+        try:
+            start = time.perf_counter()
+            rows = column_store.write_store(self.db_path, self.derived_paths['column_store_path'], version)
+            print(f"🧱 Columnar snapshot for data version {version}: {rows:,} records "
+                  f"({time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            # The server falls back to SQLite without it
+            print(f"⚠️ Could not write columnar snapshot: {e}")
+
+    def build_snapshots(self, version=None, changed_years=None, changed_areas=None):
+        """Render the dashboard's preset views for the current data version
+
+        Args:
+            version: Dataset version (default: the one in the metadata table)
+            changed_years, changed_areas: Years and catch areas of changed
+                rows; only presets they touch are rendered again. None
+                renders every preset.
+        """
+        from app import snapshots
+
+        if version is None:
+            row = self.conn.execute("SELECT value FROM metadata WHERE key = 'data_version'").fetchone()
+            version = int(row[0]) if row else 0
+
+        try:
+            start = time.perf_counter()
+            rendered, reused = snapshots.build_snapshots(self.db_path, self.derived_paths['snapshot_dir'],
+                                                         version, changed_years, changed_areas)
+            print(f"📦 Preset view snapshots for data version {version}: {rendered} rendered, "
+                  f"{reused} unchanged ({time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            # Snapshots are an optimization; the server falls back to live queries
+            print(f"⚠️ Could not build preset view snapshots: {e}")
+
+    def build_warm_cache(self, version):
+        """Render the most requested API queries for the new data version
+
+        Args:
+            version: Dataset version the database is at
+        """
+        from app import warm_cache
+
+        try:
+            start = time.perf_counter()
+            written = warm_cache.build(self.db_path, self.derived_paths['warm_cache_path'], version)
+            print(f"🔥 Warm query cache for data version {version}: {written} results "
+                  f"({time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            # New instances then start with empty caches, as before
+            print(f"⚠️ Could not write warm query cache: {e}")
 
     def inspect_csv(self, sample_date):
         """Fetch and inspect a specific CSV for duplicates"""
@@ -555,6 +769,23 @@ def main():
         if len(sys.argv) > 1 and sys.argv[1] == 'inspect':
             sample_date = int(sys.argv[2]) if len(sys.argv) > 2 else 10
             collector.inspect_csv(sample_date)
+        elif len(sys.argv) > 1 and sys.argv[1] == 'export':
+            import argparse
+            parser = argparse.ArgumentParser(prog='data_collector.py export',
+                                             description="Export creel records from the database")
+            parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+            parser.add_argument('--gzip', action='store_true', help="gzip the output (ndjson/csv)")
+            parser.add_argument('--year-start', type=int)
+            parser.add_argument('--year-end', type=int)
+            parser.add_argument('--catch-area', action='append', help="Repeat for several areas")
+            parser.add_argument('--output', help="File name within the data directory")
+            args = parser.parse_args(sys.argv[2:])
+            if args.gzip and args.format == 'columnar':
+                parser.error("--gzip can't be used with --format columnar")
+            collector.export_records(args.output, args.format, args.gzip,
+                                     args.year_start, args.year_end, args.catch_area)
+        elif len(sys.argv) > 1 and sys.argv[1] == 'snapshots':
+            collector.build_snapshots()
         else:
             # Calculate how many years to fetch from current year back to 2013
             current_year = datetime.now().year
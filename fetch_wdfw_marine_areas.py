@@ -51,6 +51,10 @@ if __name__ == '__main__':
     try:
         geojson_data = fetch_marine_areas()
         save_geojson(geojson_data, 'static/data/wdfw_marine_areas.json')
+
+        # Rebuild the zoom-tiered geometry served by /api/map_geometry
+        from build_map_geometry import build
+        build()
         print("\n🎉 Success! You can now use this static file instead of the API.")
     except Exception as e:
         print(f"\n❌ Error: {e}")
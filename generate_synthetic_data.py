@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Synthetic WDFW Creel Dataset Generator
+Writes realistic creel_records rows for scale testing the server and database
+Uses the collector's exact schema and "Mon D, YYYY" sample_date format
+Seedable, with weighted catch_area/ramp_site mix and seasonal species patterns
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+from data_collector import create_schema, create_indices
+
+
+# Approximate production row count, used as the 1x baseline for --scale
+BASE_ROWS = 60000
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Catch areas with relative survey effort and their ramps/sites
+CATCH_AREAS = [
+    ("Area 5, Sekiu and Pillar Point", 8, ["Olson's Resort", "Van Riper's Resort", "Mason's Olson Resort", "Pillar Point Ramp"]),
+    ("Area 6, East Juan de Fuca Strait", 7, ["Port Angeles Boat Haven", "Ediz Hook Ramp", "John Wayne Marina", "Port Townsend Boat Haven"]),
+    ("Area 7, San Juan Islands", 6, ["Roche Harbor", "Friday Harbor", "Washington Park Ramp", "Squalicum Harbor"]),
+    ("Area 8-1, Deception Pass, Hope and Skagit Islands", 3, ["Cornet Bay Ramp", "Oak Harbor Marina", "La Conner Marina"]),
+    ("Area 8-2, Ports Susan and Gardner", 4, ["Everett Marina Ramp", "Camano Island State Park", "Cavelero Beach Ramp"]),
+    ("Area 9, Admiralty Inlet", 12, ["Port of Edmonds", "Kingston Ramp", "Port Townsend Boat Haven", "Bush Point", "Point No Point"]),
+    ("Area 10, Seattle-Bremerton", 11, ["Shilshole Bay Marina", "Don Armeni Ramp", "Elliott Bay Marina", "Bremerton Marina", "Eagle Harbor Ramp"]),
+    ("Area 11, Tacoma-Vashon", 9, ["Point Defiance Ramp", "Des Moines Marina", "Redondo Ramp", "Quartermaster Harbor"]),
+    ("Area 12, Hood Canal", 4, ["Pleasant Harbor", "Potlatch State Park", "Twanoh State Park", "Hoodsport Ramp"]),
+    ("Area 13, South Puget Sound", 5, ["Luhr Beach Ramp", "Zittel's Marina", "Swantown Marina", "Boston Harbor Marina"]),
+    ("Bellingham Bay", 1, ["Squalicum Harbor", "Fairhaven Ramp"]),
+    ("Commencement Bay", 1, ["Point Defiance Ramp", "Dickman Mill Park"]),
+    ("Dungeness Bay", 1, ["Cline Spit Ramp"]),
+    ("Sinclair Inlet", 1, ["Port Orchard Marina", "Bremerton Marina"]),
+    ("Tulalip Terminal Area", 1, ["Tulalip Marina"]),
+    # Interviews with no recorded catch area (N/A in the export)
+    ("", 1, ["Port Townsend Boat Haven", "Everett Marina Ramp"]),
+]
+
+# Relative survey effort by month (Jan..Dec): summer peak, winter blackmouth season
+MONTH_EFFORT = [4, 4, 5, 4, 3, 6, 14, 20, 15, 8, 5, 4]
+
+# Expected catch per angler by month (Jan..Dec) for each species
+SPECIES_RATES = {
+    'chinook': [0.10, 0.12, 0.12, 0.10, 0.04, 0.06, 0.25, 0.22, 0.08, 0.03, 0.06, 0.08],
+    'coho':    [0.00, 0.00, 0.00, 0.00, 0.00, 0.02, 0.10, 0.30, 0.45, 0.20, 0.02, 0.00],
+    'chum':    [0.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0.02, 0.15, 0.25, 0.08],
+    'pink':    [0.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0.10, 0.80, 0.60, 0.02, 0.00, 0.00],
+    'sockeye': [0.00, 0.00, 0.00, 0.00, 0.00, 0.00, 0.03, 0.02, 0.00, 0.00, 0.00, 0.00],
+    'lingcod': [0.00, 0.00, 0.00, 0.00, 0.12, 0.10, 0.03, 0.01, 0.00, 0.00, 0.00, 0.00],
+    'halibut': [0.00, 0.00, 0.00, 0.00, 0.05, 0.04, 0.00, 0.00, 0.00, 0.00, 0.00, 0.00],
+}
+
+INSERT_SQL = '''
+    INSERT OR IGNORE INTO creel_records (
+        sample_date, ramp_site, catch_area, interviews, anglers,
+        chinook, chinook_per_angler, coho, chum, pink, sockeye, lingcod, halibut,
+        data_hash
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def format_sample_date(day):
+    """Format a date the way the WDFW export does: "Apr 1, 2013" """
+    return f"{MONTH_NAMES[day.month - 1]} {day.day}, {day.year}"
+
+
+_hash_cache = {}
+
+
+def data_hash(values):
+    """Same hash the collector computes over the catch fields"""
+    # Catch combinations repeat constantly (mostly zeros), so memoize
+    key = tuple(values)
+    cached = _hash_cache.get(key)
+    if cached is None:
+        hash_input = '|'.join(str(v) for v in values)
+        cached = hashlib.sha256(hash_input.encode()).hexdigest()[:16]
+        if len(_hash_cache) < 1000000:
+            _hash_cache[key] = cached
+    return cached
+
+
+def plan_days(rows, start_year=2013, end_year=None):
+    """
+    Spread the target row count over days by monthly survey effort
+
+    Returns:
+        list: (date, record_count) pairs in chronological order
+    """
+    end_year = end_year or datetime.now().year
+    # Surveys can't be in the future
+    last_day = min(date(end_year, 12, 31), date.today())
+    days = []
+    day = date(start_year, 1, 1)
+    while day <= last_day:
+        days.append(day)
+        day += timedelta(days=1)
+
+    total_weight = sum(MONTH_EFFORT[d.month - 1] for d in days)
+    rows_per_weight = rows / total_weight
+
+    plan = []
+    carry = 0.0
+    for day in days:
+        carry += MONTH_EFFORT[day.month - 1] * rows_per_weight
+        count = int(carry)
+        carry -= count
+        if count:
+            plan.append((day, count))
+    return plan
+
+
+AREA_WEIGHTS = [weight for _, weight, _ in CATCH_AREAS]
+SPECIES = list(SPECIES_RATES)
+
+# Interviews per ramp/day are roughly log-normal; sampling a fixed table is
+# much cheaper than calling lognormvariate for every row
+_table_rnd = random.Random(0)
+INTERVIEW_TABLE = [max(1, int(_table_rnd.lognormvariate(2.3, 0.8))) for _ in range(4096)]
+
+
+def generate_day(day, count, seed=42):
+    """
+    Generate one day's records
+
+    Each day has its own random stream derived from the seed, so the
+    dataset is identical however days are ordered or split across workers.
+
+    Returns:
+        list: Tuples in INSERT_SQL column order
+    """
+    rnd = random.Random(seed * 1000003 + day.toordinal())
+    random_value = rnd.random
+    month_index = day.month - 1
+
+    # Pink salmon only run in odd years
+    rates = [0.0 if (name == 'pink' and day.year % 2 == 0) else SPECIES_RATES[name][month_index]
+             for name in SPECIES]
+    active = [(i, rate) for i, rate in enumerate(rates) if rate]
+    no_catch = [0.0] * len(rates)
+
+    sample_date = format_sample_date(day)
+    seen = set()
+    records = []
+    for area, _, ramps in rnd.choices(CATCH_AREAS, weights=AREA_WEIGHTS, k=count):
+        ramp = ramps[int(random_value() * len(ramps))]
+        interviews = INTERVIEW_TABLE[int(random_value() * 4096)]
+        anglers = interviews + int(interviews * random_value() * 1.5)
+
+        # Interviews/anglers are part of the unique key; bump interviews if
+        # the same ramp and area already has a record with these counts today
+        key = (ramp, area, interviews, anglers)
+        while key in seen:
+            interviews += 1
+            key = (ramp, area, interviews, anglers)
+        seen.add(key)
+
+        # Catch averages anglers * rate with wide per-interview spread
+        catch = no_catch[:]
+        for i, rate in active:
+            catch[i] = float(int(anglers * rate * random_value() * 2 + 0.5))
+        chinook_per_angler = round(catch[0] / anglers, 2)
+
+        records.append((
+            sample_date, ramp, area, interviews, anglers,
+            catch[0], chinook_per_angler, catch[1], catch[2], catch[3], catch[4],
+            catch[5], catch[6],
+            data_hash([catch[0], chinook_per_angler] + catch[1:]),
+        ))
+    return records
+
+
+def generate_records(rows, seed=42, start_year=2013, end_year=None):
+    """
+    Generate synthetic creel records in chronological order
+
+    Args:
+        rows: Approximate number of records to generate
+        seed: Random seed (same seed gives the same dataset)
+        start_year: First season to generate
+        end_year: Last season to generate (default: current year)
+
+    Yields:
+        tuple: Values in INSERT_SQL column order
+    """
+    for day, count in plan_days(rows, start_year, end_year):
+        yield from generate_day(day, count, seed)
+
+
+def _generate_sorted_chunk(args):
+    """Worker: generate a chunk of days, sorted by the table's unique key"""
+    days, seed = args
+    records = []
+    for day, count in days:
+        records.extend(generate_day(day, count, seed))
+    records.sort(key=lambda r: r[:5])
+    return records
+
+
+def write_database(db_path, rows, seed=42, start_year=2013, end_year=None, workers=None):
+    """
+    Bulk-load synthetic records into a new database
+
+    Days are generated in the order of the UNIQUE(sample_date, ...) key so
+    the unique index is appended to rather than randomly updated, and
+    generation is spread over worker processes when more than one CPU is
+    available. Secondary indices are built once after loading, and
+    journaling is disabled since the file is disposable test data.
+
+    Returns:
+        int: Number of rows in creel_records
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -200000')
+    create_schema(conn)
+
+    # Drop secondary indices during the load; rebuilding once is much faster
+    for index in ('idx_sample_date', 'idx_catch_area', 'idx_ramp_site', 'idx_data_hash'):
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+
+    # Group days sharing a sample_date prefix ("Apr 1, ") so each chunk is
+    # contiguous in key order
+    plan = sorted(plan_days(rows, start_year, end_year), key=lambda item: format_sample_date(item[0]))
+    chunks = []
+    for day, count in plan:
+        prefix = format_sample_date(day)[:-4]
+        if not chunks or chunks[-1][0] != prefix:
+            chunks.append((prefix, []))
+        chunks[-1][1].append((day, count))
+    tasks = [(days, seed) for _, days in chunks]
+
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+        batches = pool.imap(_generate_sorted_chunk, tasks, chunksize=4)
+    else:
+        batches = map(_generate_sorted_chunk, tasks)
+
+    written = 0
+    start = time.time()
+    try:
+        for batch in batches:
+            conn.executemany(INSERT_SQL, batch)
+            written += len(batch)
+            if written % 500000 < len(batch):
+                conn.commit()
+                elapsed = time.time() - start
+                print(f"\r  {written:,} rows ({written / elapsed:,.0f} rows/sec)", end="", flush=True)
+        conn.commit()
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    print()
+
+    print("🔧 Building indices...")
+    create_indices(conn)
+    conn.commit()
+
+    count = conn.execute('SELECT COUNT(*) FROM creel_records').fetchone()[0]
+    conn.close()
+    return count
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic creel_records database")
+    parser.add_argument('--output', default=os.path.join('wdfw_creel_data', 'synthetic_creel_data.db'),
+                        help="Database file to write")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--rows', type=int, help="Approximate number of rows")
+    size.add_argument('--scale', type=float, default=1.0,
+                      help=f"Multiple of the production row count (~{BASE_ROWS:,} rows)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    parser.add_argument('--start-year', type=int, default=2013)
+    parser.add_argument('--end-year', type=int, default=datetime.now().year)
+    parser.add_argument('--workers', type=int, help="Generator processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="Overwrite an existing output file")
+    args = parser.parse_args()
+
+    rows = args.rows if args.rows else int(BASE_ROWS * args.scale)
+
+    if os.path.exists(args.output):
+        if not args.force:
+            parser.error(f"{args.output} already exists (use --force to overwrite)")
+        os.remove(args.output)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    print("=" * 70)
+    print("SYNTHETIC CREEL DATA GENERATOR")
+    print("=" * 70)
+    print(f"Target rows: {rows:,}  Seed: {args.seed}  Seasons: {args.start_year}-{args.end_year}")
+    print(f"Output: {os.path.abspath(args.output)}\n")
+
+    start = time.time()
+    count = write_database(args.output, rows, args.seed, args.start_year, args.end_year, args.workers)
+    elapsed = time.time() - start
+
+    print(f"\n✅ Wrote {count:,} rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/sec)")
+    print(f"📊 File size: {os.path.getsize(args.output) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
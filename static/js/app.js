@@ -5,15 +5,48 @@ let charts = {};
         let selectedAreaLayers = new Set(); // Track all selected areas
         let initialMapLoadComplete = false; // Prevent zoom reset on pan/zoom
         let areaNumberToDbName = {}; // Mapping from area number to database area name
+        // The server downsamples longer trend series (keeping peaks)
+        const TREND_MAX_POINTS = 1000;
+        // Chart series come as one array per key ({period: [...], chinook: [...]})
+        const CHART_FORMAT = 'format=columns';
         let currentFilters = {
             time_unit: 'yearly',
             species: ['chinook', 'coho', 'chum', 'pink', 'sockeye'],
             catch_area: []
         };
 
+        // Filter options and default-view data inlined by the server
+        const bootstrapData = readBootstrapData();
+
+        function readBootstrapData() {
+            const element = document.getElementById('bootstrap-data');
+            if (!element) {
+                return null;
+            }
+            try {
+                return JSON.parse(element.textContent);
+            } catch (err) {
+                console.error('Error reading bootstrap data:', err);
+                return null;
+            }
+        }
+
+        // Inlined responses for the first load, if it is for the default view
+        function takeBootstrapResponses(queryString) {
+            if (!bootstrapData || !bootstrapData.data || queryString !== '?' + bootstrapData.query) {
+                return null;
+            }
+            const data = bootstrapData.data;
+            bootstrapData.data = null; // Later loads always fetch
+            return ['/api/stats', '/api/trend', '/api/species', '/api/areas', '/api/monthly']
+                .map(path => data[path]);
+        }
+
         async function loadFilterOptions() {
             try {
-                const options = await fetch('/api/filter_options').then(r => r.json());
+                const options = bootstrapData
+                    ? bootstrapData.filter_options
+                    : await fetch('/api/filter_options').then(r => r.json());
 
                 // Populate year dropdowns
                 const yearStart = document.getElementById('yearStart');
@@ -206,6 +239,70 @@ let charts = {};
             }
         }
 
+        // Catch area a map feature stands for: the one its totals were
+        // matched to, else the canonical name for its WDFW area number
+        function getDbAreaName(props) {
+            if (props.area) {
+                return props.area;
+            }
+            if (props.custom) {
+                return props.maName;
+            }
+            if (props.maNumber && areaNumberToDbName[props.maNumber]) {
+                return areaNumberToDbName[props.maNumber];
+            }
+            return props.maNumber && props.maName ? `Area ${props.maNumber}, ${props.maName}` : null;
+        }
+
+        // Largest total on the map, for intensity-based coloring
+        function getMaxCatch() {
+            return Math.max(...mapLayers.map(layer => layer.feature.properties.total || 0), 1);
+        }
+
+        function getAreaStyle(feature, isSelected, maxCatch) {
+            if (isSelected) {
+                return {
+                    color: '#f59e0b',
+                    weight: 4,
+                    opacity: 1,
+                    fillColor: '#fbbf24',
+                    fillOpacity: 0.7
+                };
+            }
+
+            const intensity = Math.min((feature.properties.total || 0) / maxCatch, 1);
+            return {
+                color: '#3182ce',
+                weight: 2,
+                opacity: 0.8,
+                fillColor: feature.properties.custom ? '#3182ce' : '#60a5fa',
+                fillOpacity: 0.3 + intensity * 0.5
+            };
+        }
+
+        function getPopupContent(props, dbAreaName) {
+            const displayName = dbAreaName || `${props.maName} (Area ${props.maNumber})`;
+            let note = '';
+            if (props.custom) {
+                note = '<p style="margin: 8px 0 4px 0; font-size: 0.85em; color: #718096;"><em>Custom boundary (not in WDFW GIS)</em></p>';
+            } else if (props.WAC) {
+                note = `<p style="margin: 8px 0 4px 0; font-size: 0.85em; color: #718096;"><strong>WAC:</strong> ${props.WAC}</p>`;
+            }
+
+            return `
+                <div style="font-family: sans-serif;">
+                    <h3 style="margin: 0 0 8px 0; color: #2d3748; font-size: 1.1em;">
+                        ${displayName}
+                    </h3>
+                    <div style="border-top: 1px solid #e2e8f0; padding-top: 8px;">
+                        <p style="margin: 4px 0;"><strong>Total Catch:</strong> ${Math.round(props.total || 0).toLocaleString()}</p>
+                        <p style="margin: 4px 0;"><strong>Surveys:</strong> ${(props.surveys || 0).toLocaleString()}</p>
+                    </div>
+                    ${note}
+                </div>
+            `;
+        }
+
         function updateMapSelection() {
             // Update map layer styling based on currently selected areas in dropdown
             if (!map || !mapLayers || mapLayers.length === 0) {
@@ -223,99 +320,15 @@ let charts = {};
                 // Clear selection tracking
                 selectedAreaLayers.clear();
 
-                // Update WDFW layers
+                const maxCatch = getMaxCatch();
                 mapLayers.forEach(layer => {
-                    const props = layer.feature.properties;
-                    const gisAreaNumber = props.maNumber;
-                    const gisAreaName = props.maName;
-
-                    // Find matching database area name
-                    let dbAreaName = null;
-                    if (window.mapDataLookup && window.mapDataLookup[gisAreaName]) {
-                        dbAreaName = gisAreaName;
-                    } else {
-                        const searchPattern = `Area ${gisAreaNumber},`;
-                        for (const dbName of Object.keys(window.mapDataLookup || {})) {
-                            if (dbName.startsWith(searchPattern)) {
-                                dbAreaName = dbName;
-                                break;
-                            }
-                        }
-                    }
-
-                    // Fallback: use canonical mapping if not found in current data
-                    if (!dbAreaName && gisAreaNumber && areaNumberToDbName[gisAreaNumber]) {
-                        dbAreaName = areaNumberToDbName[gisAreaNumber];
-                    }
-
-                    // Check if selected
-                    const isSelected = dbAreaName && selectedAreas.includes(dbAreaName);
-
-                    // Update styling
+                    const isSelected = Boolean(layer.dbAreaName) && selectedAreas.includes(layer.dbAreaName);
                     if (isSelected) {
                         selectedAreaLayers.add(layer);
-                        layer.setStyle({
-                            color: '#f59e0b',
-                            weight: 4,
-                            opacity: 1,
-                            fillColor: '#fbbf24',
-                            fillOpacity: 0.7
-                        });
-                    } else {
-                        // Get data for intensity-based coloring
-                        let areaData = { total: 0, surveys: 0 };
-                        if (window.mapDataLookup && dbAreaName && window.mapDataLookup[dbAreaName]) {
-                            areaData = window.mapDataLookup[dbAreaName];
-                        }
-                        const maxCatch = Math.max(...Object.values(window.mapDataLookup || {}).map(d => d.total || 0), 1);
-                        const intensity = Math.min(areaData.total / maxCatch, 1);
-                        const fillOpacity = 0.3 + intensity * 0.5;
-
-                        layer.setStyle({
-                            color: '#3182ce',
-                            weight: 2,
-                            opacity: 0.8,
-                            fillColor: '#60a5fa',
-                            fillOpacity: fillOpacity
-                        });
                     }
+                    layer.setStyle(getAreaStyle(layer.feature, isSelected, maxCatch));
                 });
 
-                // Update custom area layers
-                if (window.customAreaLayers) {
-                    Object.entries(window.customAreaLayers).forEach(([areaName, layerGroup]) => {
-                        const isSelected = selectedAreas.includes(areaName);
-
-                        layerGroup.eachLayer(function(layer) {
-                            if (isSelected) {
-                                selectedAreaLayers.add(layer);
-                                layer.setStyle({
-                                    color: '#f59e0b',
-                                    weight: 4,
-                                    fillColor: '#fbbf24',
-                                    fillOpacity: 0.7
-                                });
-                            } else {
-                                // Get data for intensity-based coloring
-                                let areaData = { total: 0, surveys: 0 };
-                                if (window.mapDataLookup && window.mapDataLookup[areaName]) {
-                                    areaData = window.mapDataLookup[areaName];
-                                }
-                                const maxCatch = Math.max(...Object.values(window.mapDataLookup || {}).map(d => d.total || 0), 1);
-                                const intensity = Math.min(areaData.total / maxCatch, 1);
-                                const fillOpacity = 0.3 + intensity * 0.5;
-
-                                layer.setStyle({
-                                    color: '#3182ce',
-                                    weight: 2,
-                                    fillColor: '#3182ce',
-                                    fillOpacity: fillOpacity
-                                });
-                            }
-                        });
-                    });
-                }
-
                 console.log('✅ Map selection updated');
             } catch (error) {
                 console.error('Error updating map selection:', error);
@@ -370,13 +383,14 @@ let charts = {};
         async function loadData() {
             try {
                 const queryString = buildQueryString();
-                const [stats, trendData, species, areas, monthly, mapData] = await Promise.all([
+                const chartQueryString = (queryString ? queryString + '&' : '?') + CHART_FORMAT;
+                const trendQueryString = chartQueryString + '&max_points=' + TREND_MAX_POINTS;
+                const [stats, trendData, species, areas, monthly] = takeBootstrapResponses(queryString) || await Promise.all([
                     fetch('/api/stats' + queryString).then(r => r.json()),
-                    fetch('/api/trend' + queryString).then(r => r.json()),
+                    fetch('/api/trend' + trendQueryString).then(r => r.json()),
                     fetch('/api/species' + queryString).then(r => r.json()),
                     fetch('/api/areas' + queryString).then(r => r.json()),
-                    fetch('/api/monthly' + queryString).then(r => r.json()),
-                    fetch('/api/map_data' + queryString).then(r => r.json())
+                    fetch('/api/monthly' + chartQueryString).then(r => r.json())
                 ]);
 
                 document.getElementById('loading').style.display = 'none';
@@ -384,9 +398,9 @@ let charts = {};
 
                 updateStats(stats);
 
-                // Create map after dashboard is visible
+                // Create map after dashboard is visible (it loads its own totals)
                 setTimeout(() => {
-                    createMap(mapData);
+                    createMap();
                 }, 250);
 
                 createTrendChart(trendData);
@@ -408,7 +422,168 @@ let charts = {};
             document.getElementById('yearRange').textContent = `${stats.min_year}-${stats.max_year}`;
         }
 
-        function createMap(data) {
+        let geometryMaxZoom; // Highest zoom the loaded outlines are simplified for (null = full detail)
+        let refiningMarineAreas = false;
+        let marineAreasRequests = 0; // Loads started, so a superseded one can be dropped
+
+        // Decode a quantized, delta-encoded TopoJSON topology into GeoJSON
+        function topologyToGeoJSON(topology) {
+            const [sx, sy] = topology.transform.scale;
+            const [tx, ty] = topology.transform.translate;
+            const rings = topology.arcs.map(arc => {
+                let x = 0, y = 0;
+                return arc.map(([dx, dy]) => {
+                    x += dx;
+                    y += dy;
+                    return [x * sx + tx, y * sy + ty];
+                });
+            });
+            const polygon = arcs => arcs.map(ring => rings[ring[0]]);
+
+            return {
+                type: 'FeatureCollection',
+                features: topology.objects.areas.geometries.map(g => ({
+                    type: 'Feature',
+                    properties: {
+                        maName: g.properties.name,
+                        maNumber: g.properties.number,
+                        WAC: g.properties.WAC,
+                        custom: g.properties.custom
+                    },
+                    geometry: {
+                        type: g.type,
+                        coordinates: g.type === 'Polygon' ? polygon(g.arcs) : g.arcs.map(polygon)
+                    }
+                }))
+            };
+        }
+
+        // Load the marine areas simplified for a zoom level, each feature
+        // carrying the catch area and totals the server matched to it for
+        // the current filters. Falls back to the full-resolution static
+        // GeoJSON (without the custom areas) joined with /api/map_data.
+        async function loadMarineAreas(zoom) {
+            const queryString = buildQueryString();
+            const response = await fetch('/api/map_geometry' + (queryString ? queryString + '&' : '?') + `zoom=${zoom}`);
+            let geojsonData;
+            if (response.ok) {
+                const result = await response.json();
+                geometryMaxZoom = result.max_zoom;
+                geojsonData = topologyToGeoJSON(result.topology);
+                geojsonData.features.forEach((feature, i) => {
+                    const [area, total, surveys] = result.totals[i];
+                    Object.assign(feature.properties, { area, total, surveys });
+                });
+            } else {
+                const [fallback, mapData] = await Promise.all([
+                    fetch('/static/data/wdfw_marine_areas.json'),
+                    fetch('/api/map_data' + queryString).then(r => r.json())
+                ]);
+                if (!fallback.ok) {
+                    throw new Error('Failed to load marine areas');
+                }
+                geometryMaxZoom = null;
+                geojsonData = await fallback.json();
+                geojsonData.features.forEach(feature => {
+                    const props = feature.properties;
+                    const row = mapData.find(d => d.area === props.maName)
+                        || (props.maNumber && mapData.find(d => d.area.startsWith(`Area ${props.maNumber},`)));
+                    Object.assign(props, row
+                        ? { area: row.area, total: row.total, surveys: row.surveys }
+                        : { area: null, total: 0, surveys: 0 });
+                });
+            }
+
+            // Layers are kept in feature order so later loads can update them
+            geojsonData.features.forEach((feature, i) => {
+                feature.properties.index = i;
+            });
+            return geojsonData;
+        }
+
+        // Put newly loaded outlines and totals on the existing layers (same
+        // areas in the same order), keeping their handlers
+        function updateMarineAreas(geojsonData) {
+            geojsonData.features.forEach((feature, i) => {
+                const layer = mapLayers[i];
+                if (!layer) return;
+                const depth = feature.geometry.type === 'Polygon' ? 1 : 2;
+                layer.feature = feature;
+                layer.dbAreaName = getDbAreaName(feature.properties);
+                layer.setLatLngs(L.GeoJSON.coordsToLatLngs(feature.geometry.coordinates, depth));
+                layer.setPopupContent(getPopupContent(feature.properties, layer.dbAreaName));
+            });
+            updateMapSelection();
+        }
+
+        // Load the areas again for the current zoom and filters; a response
+        // overtaken by a later request is dropped
+        function reloadMarineAreas() {
+            const request = ++marineAreasRequests;
+            return loadMarineAreas(map.getZoom())
+                .then(geojsonData => {
+                    if (request === marineAreasRequests) {
+                        updateMarineAreas(geojsonData);
+                    }
+                });
+        }
+
+        function refineMarineAreas() {
+            if (!marineAreasLayer || refiningMarineAreas || geometryMaxZoom == null || map.getZoom() <= geometryMaxZoom) {
+                return;
+            }
+
+            refiningMarineAreas = true;
+            reloadMarineAreas()
+                .catch(error => console.error('Error loading detailed marine areas:', error))
+                .finally(() => {
+                    refiningMarineAreas = false;
+                });
+        }
+
+        function bindAreaLayer(feature, layer) {
+            const custom = feature.properties.custom;
+            layer.dbAreaName = getDbAreaName(feature.properties);
+            mapLayers[feature.properties.index] = layer;
+
+            // Mouse hover effects
+            layer.on('mouseover', function(e) {
+                if (custom) L.DomEvent.stopPropagation(e);
+                layer.setStyle({
+                    weight: 4,
+                    fillColor: '#facc15',
+                    fillOpacity: 0.6
+                });
+            });
+
+            layer.on('mouseout', function(e) {
+                if (custom) L.DomEvent.stopPropagation(e);
+                layer.setStyle(getAreaStyle(layer.feature, selectedAreaLayers.has(layer), getMaxCatch()));
+            });
+
+            // Click to toggle area selection
+            layer.on('click', function(e) {
+                if (custom) L.DomEvent.stopPropagation(e);
+                if (!layer.dbAreaName) return;
+
+                const catchAreaSelect = document.getElementById('catchArea');
+                const option = Array.from(catchAreaSelect.options).find(opt => opt.value === layer.dbAreaName);
+                if (!option) return;
+
+                option.selected = !option.selected;
+                if (option.selected) {
+                    selectedAreaLayers.add(layer);
+                } else {
+                    selectedAreaLayers.delete(layer);
+                }
+                layer.setStyle(getAreaStyle(layer.feature, option.selected, getMaxCatch()));
+                applyFilters();
+            });
+
+            layer.bindPopup(getPopupContent(feature.properties, layer.dbAreaName));
+        }
+
+        function createMap() {
 
             // Check if Leaflet is loaded
             if (typeof L === 'undefined') {
@@ -450,300 +625,49 @@ let charts = {};
                     map.getPane('wdfwPane').style.pointerEvents = 'auto';  // Enable clicks on WDFW areas
                     map.getPane('customAreasPane').style.pointerEvents = 'auto';
 
-                }
-
-                // Create a map of catch data by area name
-                window.mapDataLookup = {}; const dataMap = window.mapDataLookup;
-                data.forEach(d => {
-                    dataMap[d.area] = d;
-                });
-
-                // Find max catch for color scaling
-                const maxCatch = Math.max(...data.map(d => d.total), 1);
-
-                // Helper function to calculate style
-                function getStyleForFeature(feature, isSelected = false) {
-                    const props = feature.properties;
-                    const gisAreaNumber = props.maNumber;
-                    const gisAreaName = props.maName;
-
-                    // Find matching catch data
-                    let areaData = { total: 0, surveys: 0 };
-                    let matchedDbName = null;
-
-                    // Try exact name match first
-                    if (window.mapDataLookup && window.mapDataLookup[gisAreaName]) {
-                        areaData = window.mapDataLookup[gisAreaName];
-                        matchedDbName = gisAreaName;
-                    } else {
-                        // Try pattern matching
-                        const searchPattern = `Area ${gisAreaNumber},`;
-                        for (const [dbName, dbData] of Object.entries(window.mapDataLookup || {})) {
-                            if (dbName.startsWith(searchPattern)) {
-                                areaData = dbData;
-                                matchedDbName = dbName;
-                                break;
-                            }
-                        }
-                    }
-
-                    const intensity = Math.min(areaData.total / maxCatch, 1);
-                    const fillOpacity = 0.3 + intensity * 0.5;
-
-                    if (isSelected) {
-                        return {
-                            color: '#f59e0b',
-                            weight: 4,
-                            opacity: 1,
-                            fillColor: '#fbbf24',
-                            fillOpacity: 0.7
-                        };
-                    }
+                    // Swap in more detailed outlines when zooming past the loaded tier
+                    map.on('zoomend', refineMarineAreas);
 
-                    return {
-                        color: '#3182ce',
-                        weight: 2,
-                        opacity: 0.8,
-                        fillColor: '#60a5fa',
-                        fillOpacity: fillOpacity
-                    };
                 }
 
-                // If layer already exists, update styling without recreating
+                // If the layers already exist, load the new filter's totals into them
                 if (marineAreasLayer && mapLayers.length > 0) {
-
-                    // Get selected areas from filter dropdown
-                    const catchAreaSelect = document.getElementById('catchArea');
-                    const selectedAreas = Array.from(catchAreaSelect.selectedOptions).map(opt => opt.value);
-
-                    // Clear and rebuild selection tracking
-                    selectedAreaLayers.clear();
-
-                    // Update each existing layer
-                    mapLayers.forEach(layer => {
-                        const props = layer.feature.properties;
-                        const gisAreaNumber = props.maNumber;
-                        const gisAreaName = props.maName;
-
-                        // Find matching database area
-                        let dbAreaName = null;
-                        let areaData = { total: 0, surveys: 0 };
-
-                        // Try exact name match first
-                        if (window.mapDataLookup && window.mapDataLookup[gisAreaName]) {
-                            dbAreaName = gisAreaName;
-                            areaData = window.mapDataLookup[gisAreaName];
-                        } else {
-                            // Try pattern matching
-                            const searchPattern = `Area ${gisAreaNumber},`;
-                            for (const [dbName, dbData] of Object.entries(window.mapDataLookup || {})) {
-                                if (dbName.startsWith(searchPattern)) {
-                                    dbAreaName = dbName;
-                                    areaData = dbData;
-                                    break;
-                                }
-                            }
-                        }
-
-                        // Check if this area is selected
-                        const isSelected = dbAreaName && selectedAreas.includes(dbAreaName);
-
-                        // Update styling
-                        const style = getStyleForFeature(layer.feature, isSelected);
-                        layer.setStyle(style);
-
-                        // Track selected areas
-                        if (isSelected) {
-                            selectedAreaLayers.add(layer);
-                        }
-
-                        // Update popup content
-                        const displayName = dbAreaName || `${props.maName} (Area ${props.maNumber})`;
-                        const wacSection = props.WAC ?
-                            `<p style="margin: 8px 0 4px 0; font-size: 0.85em; color: #718096;"><strong>WAC:</strong> ${props.WAC}</p>` : '';
-
-                        const popupContent = `
-                            <div style="font-family: sans-serif;">
-                                <h3 style="margin: 0 0 8px 0; color: #2d3748; font-size: 1.1em;">
-                                    ${displayName}
-                                </h3>
-                                <div style="border-top: 1px solid #e2e8f0; padding-top: 8px;">
-                                    <p style="margin: 4px 0;"><strong>Total Catch:</strong> ${Math.round(areaData.total).toLocaleString()}</p>
-                                    <p style="margin: 4px 0;"><strong>Surveys:</strong> ${areaData.surveys.toLocaleString()}</p>
-                                </div>
-                                ${wacSection}
-                            </div>
-                        `;
-                        layer.setPopupContent(popupContent);
-                    });
-
-                    // Update custom area layers
-                    if (window.customAreaLayers) {
-                        Object.entries(window.customAreaLayers).forEach(([areaName, layerGroup]) => {
-                            const isSelected = selectedAreas.includes(areaName);
-
-                            layerGroup.eachLayer(function(layer) {
-                                let areaData = { total: 0, surveys: 0 };
-                                if (window.mapDataLookup && window.mapDataLookup[areaName]) {
-                                    areaData = window.mapDataLookup[areaName];
-                                }
-
-                                const intensity = Math.min(areaData.total / maxCatch, 1);
-                                const fillOpacity = 0.3 + intensity * 0.5;
-
-                                if (isSelected) {
-                                    selectedAreaLayers.add(layer);
-                                    layer.setStyle({
-                                        color: '#f59e0b',
-                                        weight: 4,
-                                        fillColor: '#fbbf24',
-                                        fillOpacity: 0.7
-                                    });
-                                } else {
-                                    selectedAreaLayers.delete(layer);
-                                    layer.setStyle({
-                                        color: '#3182ce',
-                                        weight: 2,
-                                        fillColor: '#3182ce',
-                                        fillOpacity: fillOpacity
-                                    });
-                                }
-                            });
-                        });
-                    }
-
-                    return; // Exit - layer updated, no need to recreate
+                    reloadMarineAreas()
+                        .catch(error => console.error('Error loading marine area totals:', error));
+                    return;
                 }
 
-                // Create layer for the first time
+                // Create layers for the first time
                 mapLayers = [];
+                const request = ++marineAreasRequests;
 
-                // Load marine areas from static GeoJSON file
-                fetch('/static/data/wdfw_marine_areas.json')
-                    .then(response => {
-                        if (!response.ok) {
-                            throw new Error('Failed to load marine areas');
-                        }
-                        return response.json();
-                    })
+                // Load marine areas simplified for the current zoom level
+                loadMarineAreas(map.getZoom())
                     .then(geojsonData => {
-                        marineAreasLayer = L.geoJSON(geojsonData, {
+                        if (request !== marineAreasRequests) return;
+
+                        const features = geojsonData.features;
+                        const maxCatch = Math.max(...features.map(f => f.properties.total || 0), 1);
+                        const style = feature => getAreaStyle(feature, false, maxCatch);
+
+                        marineAreasLayer = L.geoJSON(features.filter(f => !f.properties.custom), {
                             pane: 'wdfwPane',
-                            style: getStyleForFeature,
-                            onEachFeature: function(feature, layer) {
-                                const props = feature.properties;
-                                const gisAreaNumber = props.maNumber;
-
-                                // Find matching database area
-                                let dbAreaName = null;
-                                let areaData = { total: 0, surveys: 0 };
-
-                                // First, try exact name match
-                                const gisAreaName = props.maName;
-                                if (window.mapDataLookup && window.mapDataLookup[gisAreaName]) {
-                                    dbAreaName = gisAreaName;
-                                    areaData = window.mapDataLookup[gisAreaName];
-                                } else {
-                                    // If no exact match, try pattern matching
-                                    const searchPattern = `Area ${gisAreaNumber},`;
-                                    for (const [dbName, dbData] of Object.entries(window.mapDataLookup || {})) {
-                                        if (dbName.startsWith(searchPattern)) {
-                                            dbAreaName = dbName;
-                                            areaData = dbData;
-                                            break;
-                                        }
-                                    }
-                                }
-
-                                // Fallback: use canonical mapping from area number to database name
-                                if (!dbAreaName && gisAreaNumber) {
-                                    if (areaNumberToDbName[gisAreaNumber]) {
-                                        // Use exact database name from mapping
-                                        dbAreaName = areaNumberToDbName[gisAreaNumber];
-                                    } else if (gisAreaName) {
-                                        // Last resort: construct from GIS properties
-                                        dbAreaName = `Area ${gisAreaNumber}, ${gisAreaName}`;
-                                    }
-                                }
-
-                                mapLayers.push(layer);
-
-                                // Mouse hover effects
-                                layer.on('mouseover', function(e) {
-                                    layer.setStyle({
-                                        weight: 4,
-                                        fillColor: '#facc15',
-                                        fillOpacity: 0.6
-                                    });
-                                });
-
-                                layer.on('mouseout', function(e) {
-                                    const isSelected = selectedAreaLayers.has(layer);
-                                    const style = getStyleForFeature(feature, isSelected);
-                                    layer.setStyle(style);
-                                });
-
-                                // Click to toggle area selection
-                                layer.on('click', function(e) {
-                                    if (dbAreaName) {
-                                        const catchAreaSelect = document.getElementById('catchArea');
-
-                                        let optionFound = false;
-                                        let isCurrentlySelected = false;
-
-                                        for (let i = 0; i < catchAreaSelect.options.length; i++) {
-                                            if (catchAreaSelect.options[i].value === dbAreaName) {
-                                                optionFound = true;
-                                                isCurrentlySelected = catchAreaSelect.options[i].selected;
-                                                catchAreaSelect.options[i].selected = !isCurrentlySelected;
-                                                break;
-                                            }
-                                        }
-
-                                        if (optionFound) {
-                                            if (!isCurrentlySelected) {
-                                                selectedAreaLayers.add(layer);
-                                                const selectedStyle = getStyleForFeature(feature, true);
-                                                layer.setStyle(selectedStyle);
-                                            } else {
-                                                selectedAreaLayers.delete(layer);
-                                                const unselectedStyle = getStyleForFeature(feature, false);
-                                                layer.setStyle(unselectedStyle);
-                                            }
-
-                                            applyFilters();
-                                        }
-                                    }
-                                });
-
-                                // Popup content
-                                const displayName = dbAreaName || `${props.maName} (Area ${props.maNumber})`;
-
-                                const wacSection = props.WAC ?
-                                    `<p style="margin: 8px 0 4px 0; font-size: 0.85em; color: #718096;"><strong>WAC:</strong> ${props.WAC}</p>` : '';
-
-                                const popupContent = `
-                                    <div style="font-family: sans-serif;">
-                                        <h3 style="margin: 0 0 8px 0; color: #2d3748; font-size: 1.1em;">
-                                            ${displayName}
-                                        </h3>
-                                        <div style="border-top: 1px solid #e2e8f0; padding-top: 8px;">
-                                            <p style="margin: 4px 0;"><strong>Total Catch:</strong> ${Math.round(areaData.total).toLocaleString()}</p>
-                                            <p style="margin: 4px 0;"><strong>Surveys:</strong> ${areaData.surveys.toLocaleString()}</p>
-                                        </div>
-                                        ${wacSection}
-                                    </div>
-                                `;
-                                layer.bindPopup(popupContent);
-                            }
+                            style: style,
+                            onEachFeature: bindAreaLayer
+                        }).addTo(map);
+
+                        // Custom areas (not in the WDFW GIS layer) go on top
+                        L.geoJSON(features.filter(f => f.properties.custom), {
+                            pane: 'customAreasPane',
+                            style: style,
+                            onEachFeature: bindAreaLayer
                         }).addTo(map);
 
-                        console.log('✅ Loaded marine areas from static GeoJSON file');
+                        console.log('✅ Loaded marine areas');
 
                         // After loading marine areas, fit bounds
-                        if (!initialMapLoadComplete && mapLayers.length > 0) {
-                            const group = L.featureGroup(mapLayers);
-                            const bounds = group.getBounds();
+                        if (!initialMapLoadComplete) {
+                            const bounds = marineAreasLayer.getBounds();
                             if (bounds.isValid()) {
                                 map.fitBounds(bounds, { padding: [20, 20] });
                                 initialMapLoadComplete = true;
@@ -758,114 +682,6 @@ let charts = {};
                         document.getElementById('map').innerHTML = '<div style="padding: 20px; text-align: center; color: #e53e3e;">Error loading marine areas. Please refresh the page.</div>';
                     });
 
-                // Add custom area polygons for areas not in WDFW GIS layer
-                Object.entries(customAreaPolygons).forEach(([areaName, geoJson]) => {
-                    let areaData = { total: 0, surveys: 0 };
-                    if ((window.mapDataLookup || {})[areaName]) {
-                        areaData = window.mapDataLookup[areaName];
-                    }
-
-                    const intensity = Math.min(areaData.total / maxCatch, 1);
-                    const fillOpacity = 0.3 + intensity * 0.5;
-
-                    const customLayer = L.geoJSON(geoJson, {
-                        pane: 'customAreasPane',
-                        style: function(feature) {
-                            return {
-                                color: '#3182ce',
-                                weight: 2,
-                                opacity: 0.8,
-                                fillColor: '#3182ce',
-                                fillOpacity: fillOpacity
-                            };
-                        },
-                        onEachFeature: function(feature, layer) {
-                            layer.areaName = areaName;
-
-                            layer.on('mouseover', function(e) {
-                                L.DomEvent.stopPropagation(e);
-                                const isSelected = selectedAreaLayers.has(layer);
-                                if (!isSelected) {
-                                    layer.setStyle({
-                                        fillColor: '#facc15',
-                                        fillOpacity: 0.6
-                                    });
-                                }
-                            });
-
-                            layer.on('mouseout', function(e) {
-                                L.DomEvent.stopPropagation(e);
-                                const isSelected = selectedAreaLayers.has(layer);
-                                if (!isSelected) {
-                                    layer.setStyle({
-                                        fillColor: '#3182ce',
-                                        fillOpacity: fillOpacity
-                                    });
-                                }
-                            });
-
-                            layer.on('click', function(e) {
-                                L.DomEvent.stopPropagation(e);
-                                const catchAreaSelect = document.getElementById('catchArea');
-
-                                let optionFound = false;
-                                let isCurrentlySelected = false;
-
-                                for (let i = 0; i < catchAreaSelect.options.length; i++) {
-                                    if (catchAreaSelect.options[i].value === areaName) {
-                                        optionFound = true;
-                                        isCurrentlySelected = catchAreaSelect.options[i].selected;
-                                        catchAreaSelect.options[i].selected = !isCurrentlySelected;
-                                        break;
-                                    }
-                                }
-
-                                if (optionFound) {
-                                    if (!isCurrentlySelected) {
-                                        selectedAreaLayers.add(layer);
-                                        layer.setStyle({
-                                            color: '#f59e0b',
-                                            weight: 4,
-                                            fillColor: '#fbbf24',
-                                            fillOpacity: 0.7
-                                        });
-                                    } else {
-                                        selectedAreaLayers.delete(layer);
-                                        layer.setStyle({
-                                            color: '#3182ce',
-                                            weight: 2,
-                                            fillColor: '#3182ce',
-                                            fillOpacity: fillOpacity
-                                        });
-                                    }
-                                    applyFilters();
-                                }
-                            });
-
-                            const popupContent = `
-                                <div style="font-family: sans-serif;">
-                                    <h3 style="margin: 0 0 8px 0; color: #2d3748; font-size: 1.1em;">
-                                        ${areaName}
-                                    </h3>
-                                    <div style="border-top: 1px solid #e2e8f0; padding-top: 8px;">
-                                        <p style="margin: 4px 0;"><strong>Total Catch:</strong> ${Math.round(areaData.total).toLocaleString()}</p>
-                                        <p style="margin: 4px 0;"><strong>Surveys:</strong> ${areaData.surveys.toLocaleString()}</p>
-                                    </div>
-                                    <p style="margin: 8px 0 4px 0; font-size: 0.85em; color: #718096;">
-                                        <em>Custom boundary (not in WDFW GIS)</em>
-                                    </p>
-                                </div>
-                            `;
-                            layer.bindPopup(popupContent);
-                        }
-                    }).addTo(map);
-
-                    if (!window.customAreaLayers) {
-                        window.customAreaLayers = {};
-                    }
-                    window.customAreaLayers[areaName] = customLayer;
-                });
-
                 // Force map resize
                 setTimeout(() => {
                     if (map) {
@@ -966,16 +782,16 @@ let charts = {};
                 'halibut': { border: '#dd6b20', bg: 'rgba(221, 107, 32, 0.1)' }
             };
 
+            const periods = data.period || [];
             const datasets = [];
-            if (data.length > 0) {
-                const sampleData = data[0];
-                const availableSpecies = Object.keys(sampleData).filter(key => key !== 'period');
+            if (periods.length > 0) {
+                const availableSpecies = Object.keys(data).filter(key => key !== 'period');
 
                 availableSpecies.forEach(species => {
                     const color = speciesColors[species] || { border: '#667eea', bg: 'rgba(102, 126, 234, 0.1)' };
                     datasets.push({
                         label: species.charAt(0).toUpperCase() + species.slice(1),
-                        data: data.map(d => Math.round(d[species] || 0)),
+                        data: data[species].map(value => Math.round(value || 0)),
                         borderColor: color.border,
                         backgroundColor: color.bg,
                         tension: 0.4
@@ -986,7 +802,7 @@ let charts = {};
             charts.trend = new Chart(ctx, {
                 type: 'line',
                 data: {
-                    labels: data.map(d => formatPeriodLabel(d.period)),
+                    labels: periods.map(formatPeriodLabel),
                     datasets: datasets
                 },
                 options: {
@@ -1081,7 +897,7 @@ let charts = {};
                     labels: months,
                     datasets: [{
                         label: 'Total Salmon Catch',
-                        data: data.map(d => Math.round(d.total)),
+                        data: data.total.map(total => Math.round(total)),
                         backgroundColor: '#764ba2'
                     }]
                 },
@@ -0,0 +1,54 @@
+"""
+Tests for the slow-query log entries of cancelled statements
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app import database, querylog, request_context
+from app.config import Config
+
+
+# Runs until the request's deadline interrupts it
+ENDLESS_QUERY = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+                 "SELECT count(*) FROM n")
+
+
+class CancelledStatementTest(unittest.TestCase):
+    """A statement interrupted by the deadline is logged once, as cancelled"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='creel_querylog_')
+        patcher = mock.patch.object(Config, 'SLOW_QUERY_LOG_MS', 1.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with querylog._lock:
+            querylog._entries.clear()
+
+    def tearDown(self):
+        request_context.end()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_cancelled_statement_logged_once(self):
+        conn = database.get_db_connection(os.path.join(self.workdir, 'test.db'))
+        context = request_context.begin('/api/test')
+        context.deadline = time.monotonic() + 0.05
+        try:
+            cursor = conn.cursor()
+            with self.assertRaises(request_context.QueryCancelled):
+                cursor.execute(ENDLESS_QUERY)
+            cursor.close()
+        finally:
+            conn.close()
+
+        entries = querylog.entries()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['cancelled'], 'timeout')
+        self.assertFalse(any(detail.startswith('EXPLAIN failed') for detail in entries[0]['plan']))
+
+
+if __name__ == '__main__':
+    unittest.main()